@@ -32,6 +32,10 @@ def create_app():
          else "*",
          supports_credentials=True)
     
+    # 请求级数据库会话：同一请求内复用一个连接，请求结束时归还连接池
+    from backend.database import init_app as init_database
+    init_database(app)
+
     # 启动时执行轻量数据库迁移，确保关键列存在
     try:
         from app.db_migration import run as run_db_migration
@@ -41,6 +45,14 @@ def create_app():
         import logging
         logging.getLogger(__name__).error(f"数据库迁移执行失败: {str(e)}")
 
+    # 迁移完成后加载表结构注册表，接口据此判断兼容分支，无需每次查询 INFORMATION_SCHEMA
+    from app.models.schema import schema_registry
+    schema_registry.load()
+
+    # 预约维护调度（自动完成/超时取消），多进程间通过数据库锁选主
+    from app.jobs import start_scheduler
+    start_scheduler()
+
     # 注册蓝图
     from app.api.auth import auth_bp
     from app.api.users import users_bp
@@ -51,6 +63,8 @@ def create_app():
     from app.api.maintenance import maintenance_bp
     from app.api.consumables import consumables_bp
     from app.api.upload import upload_bp
+    from app.api.dashboard import dashboard_bp
+    from app.api.system import system_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -70,6 +84,10 @@ def create_app():
     app.register_blueprint(reservations_bp, url_prefix='/api/reservations')
     app.register_blueprint(courses_bp, url_prefix='/api/courses')
     app.register_blueprint(upload_bp, url_prefix='/api/upload')
+    # 首页看板聚合接口
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    # 系统维护接口（表结构刷新等）
+    app.register_blueprint(system_bp, url_prefix='/api/system')
     
     # 静态文件服务：配置 static 目录
     # 由于 app.py 在 d:\数据库\lab-management-system\backend\app.py (或 root?)
@@ -91,10 +109,19 @@ def create_app():
     @app.route('/health', methods=['GET'])
     def health_check():
         """健康检查接口"""
+        from backend.database import get_pool_stats, get_cache_stats
+        from app.jobs import get_last_report
+        from app.utils import get_single_flight_stats
+        from app.models.schema import schema_registry
         return jsonify({
             'status': 'OK',
             'message': '实验室管理系统运行正常',
-            'version': '2.0.0-python'
+            'version': '2.0.0-python',
+            'db_pool': get_pool_stats(),
+            'db_cache': get_cache_stats(),
+            'reservation_job': get_last_report(),
+            'single_flight': get_single_flight_stats(),
+            'schema': schema_registry.stats()
         })
     
     # 全局错误处理
@@ -2,11 +2,11 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request
-from backend.database import execute_query, execute_update, execute_paginated_query, get_connection
+from backend.database import execute_query, execute_update, execute_paginated_query, get_connection, invalidate_tables, iter_query, execute_parallel
 from app.utils import (
     require_auth, require_role, validate_json_data, validate_query_params,
     success_response, error_response, not_found_response,
-    paginated_response, created_response, updated_response, deleted_response
+    paginated_response, created_response, updated_response, deleted_response, single_flight
 )
 import logging
 
@@ -14,11 +14,15 @@ logger = logging.getLogger(__name__)
 
 consumables_bp = Blueprint('consumables', __name__)
 
+# 使用记录的游标分页排序键（与列表 ORDER BY 一致）
+USAGE_KEYSET = [('created_at', 'DESC'), ('id', 'DESC')]
+
 @consumables_bp.route('', methods=['GET'])
 @require_auth
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'search': {'type': 'string', 'max_length': 100},
     'keyword': {'type': 'string', 'max_length': 100},
     'laboratory_id': {'type': 'integer', 'min_value': 1},
@@ -69,7 +73,7 @@ def list_consumables():
             base_sql += ' WHERE ' + ' AND '.join(where)
         base_sql += ' ORDER BY c.created_at DESC, c.id DESC'
 
-        result = execute_paginated_query(base_sql, tuple(params), page, page_size)
+        result = execute_paginated_query(base_sql, tuple(params), page, page_size, count=p['count'])
         if not result['success']:
             logger.error(f"查询耗材列表失败: {result.get('error')}")
             return error_response('获取耗材列表失败')
@@ -279,6 +283,7 @@ def use_consumable(cid):
                     (cid, d['userId'], qty, d['purpose'])
                 )
             conn.commit()
+            invalidate_tables('consumables', 'consumable_usage')
             return updated_response(None, '使用记录已保存')
         except Exception as e:
             if conn:
@@ -329,20 +334,27 @@ def restock_consumable(cid):
         logger.error(f"补货接口错误: {str(e)}")
         return error_response('补货失败')
 
+def build_consumable_statistics():
+    """耗材统计（/stats 与看板共用）"""
+    total, low, monthly, value = execute_parallel([
+        "SELECT COUNT(*) AS cnt FROM consumables",
+        "SELECT COUNT(*) AS cnt FROM consumables WHERE current_stock <= min_stock",
+        "SELECT COUNT(*) AS cnt FROM consumable_usage WHERE DATE_FORMAT(created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')",
+        "SELECT COALESCE(SUM(current_stock*unit_price),0) AS val FROM consumables"
+    ])
+    return {
+        'total': (total['data'][0]['cnt'] if total['success'] and total['data'] else 0),
+        'lowStock': (low['data'][0]['cnt'] if low['success'] and low['data'] else 0),
+        'monthlyUsage': (monthly['data'][0]['cnt'] if monthly['success'] and monthly['data'] else 0),
+        'totalValue': float(value['data'][0]['val'] if value['success'] and value['data'] else 0),
+    }
+
 @consumables_bp.route('/stats', methods=['GET'])
 @require_auth
+@single_flight()
 def consumable_stats():
     try:
-        total = execute_query("SELECT COUNT(*) AS cnt FROM consumables")
-        low = execute_query("SELECT COUNT(*) AS cnt FROM consumables WHERE current_stock <= min_stock")
-        monthly = execute_query("SELECT COUNT(*) AS cnt FROM consumable_usage WHERE DATE_FORMAT(created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')")
-        value = execute_query("SELECT COALESCE(SUM(current_stock*unit_price),0) AS val FROM consumables")
-        data = {
-            'total': (total['data'][0]['cnt'] if total['success'] and total['data'] else 0),
-            'lowStock': (low['data'][0]['cnt'] if low['success'] and low['data'] else 0),
-            'monthlyUsage': (monthly['data'][0]['cnt'] if monthly['success'] and monthly['data'] else 0),
-            'totalValue': float(value['data'][0]['val'] if value['success'] and value['data'] else 0),
-        }
+        data = build_consumable_statistics()
         return success_response(data, '获取耗材统计成功')
     except Exception as e:
         logger.error(f"耗材统计接口错误: {str(e)}")
@@ -353,6 +365,7 @@ def consumable_stats():
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'consumable_id': {'type': 'integer', 'min_value': 1},
     'consumableId': {'type': 'integer', 'min_value': 1},
     'user_id': {'type': 'integer', 'min_value': 1},
@@ -362,7 +375,9 @@ def consumable_stats():
     'dateFrom': {'type': 'string'},
     'dateTo': {'type': 'string'},
     'search': {'type': 'string', 'max_length': 100},
-    'keyword': {'type': 'string', 'max_length': 100}
+    'keyword': {'type': 'string', 'max_length': 100},
+    'pagination': {'type': 'string', 'choices': ['page', 'cursor'], 'default': 'page'},
+    'cursor': {'type': 'string', 'max_length': 500}
 })
 def list_consumable_usage():
     try:
@@ -408,8 +423,14 @@ def list_consumable_usage():
             base_sql += ' WHERE ' + ' AND '.join(where)
         base_sql += ' ORDER BY u.created_at DESC, u.id DESC'
 
-        result = execute_paginated_query(base_sql, tuple(params), page, page_size)
+        if p.get('cursor') or p.get('pagination') == 'cursor':
+            result = execute_paginated_query(base_sql, tuple(params), page_size=page_size,
+                                             keyset=USAGE_KEYSET, cursor=p.get('cursor'))
+        else:
+            result = execute_paginated_query(base_sql, tuple(params), page, page_size, count=p['count'])
         if not result['success']:
+            if result.get('code') == 'INVALID_CURSOR':
+                return error_response(result['error'], 'INVALID_CURSOR')
             logger.error(f"查询耗材使用记录失败: {result.get('error')}")
             return error_response('获取耗材使用记录失败')
 
@@ -436,23 +457,26 @@ def list_consumable_usage():
         logger.error(f"获取耗材使用记录接口错误: {str(e)}")
         return error_response('获取耗材使用记录失败')
 
+def build_consumable_usage_statistics():
+    """耗材使用统计（/usage/stats 与看板共用）"""
+    by_month, top_consumables, total_usage = execute_parallel([
+        "SELECT DATE_FORMAT(created_at,'%Y-%m') AS ym, COUNT(*) AS cnt FROM consumable_usage GROUP BY ym ORDER BY ym DESC LIMIT 12",
+        "SELECT c.name AS consumable_name, COUNT(u.id) AS cnt FROM consumable_usage u LEFT JOIN consumables c ON u.consumable_id = c.id GROUP BY c.id, c.name ORDER BY cnt DESC LIMIT 10",
+        "SELECT COUNT(*) AS cnt FROM consumable_usage"
+    ])
+    
+    return {
+        'byMonth': [{'month': r['ym'], 'count': r['cnt']} for r in (by_month['data'] or [])],
+        'topConsumables': [{'name': r['consumable_name'], 'count': r['cnt']} for r in (top_consumables['data'] or [])],
+        'totalUsage': (total_usage['data'][0]['cnt'] if total_usage['success'] and total_usage['data'] else 0)
+    }
+
 @consumables_bp.route('/usage/stats', methods=['GET'])
 @require_auth
+@single_flight()
 def consumable_usage_stats():
     try:
-        by_month = execute_query(
-            "SELECT DATE_FORMAT(created_at,'%Y-%m') AS ym, COUNT(*) AS cnt FROM consumable_usage GROUP BY ym ORDER BY ym DESC LIMIT 12"
-        )
-        top_consumables = execute_query(
-            "SELECT c.name AS consumable_name, COUNT(u.id) AS cnt FROM consumable_usage u LEFT JOIN consumables c ON u.consumable_id = c.id GROUP BY c.id, c.name ORDER BY cnt DESC LIMIT 10"
-        )
-        total_usage = execute_query("SELECT COUNT(*) AS cnt FROM consumable_usage")
-        
-        data = {
-            'byMonth': [{'month': r['ym'], 'count': r['cnt']} for r in (by_month['data'] or [])],
-            'topConsumables': [{'name': r['consumable_name'], 'count': r['cnt']} for r in (top_consumables['data'] or [])],
-            'totalUsage': (total_usage['data'][0]['cnt'] if total_usage['success'] and total_usage['data'] else 0)
-        }
+        data = build_consumable_usage_statistics()
         return success_response(data, '获取耗材使用统计成功')
     except Exception as e:
         logger.error(f"获取耗材使用统计接口错误: {str(e)}")
@@ -494,6 +518,7 @@ def delete_consumable_usage(uid):
                     (qty, cid)
                 )
             conn.commit()
+            invalidate_tables('consumables', 'consumable_usage')
             return deleted_response('删除成功')
         except Exception as e:
             if conn: conn.rollback()
@@ -507,8 +532,45 @@ def delete_consumable_usage(uid):
 
 @consumables_bp.route('/usage/export', methods=['GET'])
 @require_auth
+@validate_query_params({
+    'date_from': {'type': 'string'},
+    'date_to': {'type': 'string'},
+    'dateFrom': {'type': 'string'},
+    'dateTo': {'type': 'string'},
+    'startDate': {'type': 'string'},
+    'endDate': {'type': 'string'},
+    'laboratory_id': {'type': 'integer', 'min_value': 1},
+    'labId': {'type': 'integer', 'min_value': 1},
+    'compress': {'type': 'string', 'choices': ['none', 'gzip'], 'default': 'none'},
+    'batch_size': {'type': 'integer', 'min_value': 100, 'max_value': 10000, 'default': 2000}
+})
 def export_consumable_usage():
+    """流式导出耗材使用记录：按批读取、逐块输出 CSV，可选 gzip 压缩"""
     try:
+        import csv
+        import io
+        import zlib
+        from flask import Response
+
+        p = request.validated_params
+        date_from = p.get('date_from') or p.get('dateFrom') or p.get('startDate')
+        date_to = p.get('date_to') or p.get('dateTo') or p.get('endDate')
+        lab_id = p.get('laboratory_id') or p.get('labId')
+        use_gzip = p.get('compress') == 'gzip'
+
+        where = []
+        params = []
+        if date_from:
+            where.append('u.created_at >= %s')
+            params.append(date_from)
+        if date_to:
+            # 截止日期当天整天计入
+            where.append('u.created_at < DATE_ADD(DATE(%s), INTERVAL 1 DAY)')
+            params.append(date_to)
+        if lab_id:
+            where.append('c.laboratory_id = %s')
+            params.append(lab_id)
+
         sql = (
             "SELECT u.id, u.consumable_id, c.name AS consumable_name, c.model AS consumable_model, "
             "u.user_id, users.name AS user_name, u.quantity, c.unit AS unit, c.unit_price AS unit_price, "
@@ -516,36 +578,68 @@ def export_consumable_usage():
             "FROM consumable_usage u "
             "LEFT JOIN consumables c ON u.consumable_id = c.id "
             "LEFT JOIN users ON u.user_id = users.id "
-            "ORDER BY u.created_at DESC, u.id DESC"
         )
-        res = execute_query(sql)
-        if not res['success']:
-            return error_response('导出失败')
-        rows = res['data'] or []
-        import csv
-        import io
-        from flask import make_response
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID','耗材名称','型号','使用者','数量','单位','单价','使用日期'])
-        
-        for r in rows:
-            writer.writerow([
-                r.get('id'),
-                r.get('consumable_name'),
-                r.get('consumable_model'),
-                r.get('user_name'),
-                r.get('quantity'),
-                r.get('unit'),
-                r.get('unit_price'),
-                r.get('created_at').strftime('%Y-%m-%d %H:%M:%S') if r.get('created_at') else ''
-            ])
-            
-        output.seek(0)
-        resp = make_response(output.getvalue())
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY u.created_at DESC, u.id DESC'
+
+        batches = iter_query(sql, tuple(params), batch_size=p['batch_size'], chunks=True)
+        # 先取第一批：查询出错时仍可返回普通错误响应，而不是中断的下载流
+        first_batch = next(batches, None)
+
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if use_gzip else None
+
+            def flush():
+                text = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                data = text.encode('utf-8')
+                return compressor.compress(data) if compressor else data
+
+            writer.writerow(['ID','耗材名称','型号','使用者','数量','单位','单价','使用日期'])
+            try:
+                batch = first_batch
+                while batch:
+                    for r in batch:
+                        writer.writerow([
+                            r.get('id'),
+                            r.get('consumable_name'),
+                            r.get('consumable_model'),
+                            r.get('user_name'),
+                            r.get('quantity'),
+                            r.get('unit'),
+                            r.get('unit_price'),
+                            r.get('created_at').strftime('%Y-%m-%d %H:%M:%S') if r.get('created_at') else ''
+                        ])
+                    chunk = flush()
+                    if chunk:
+                        yield chunk
+                    batch = next(batches, None)
+                chunk = flush()
+                if compressor:
+                    chunk += compressor.flush()
+                if chunk:
+                    yield chunk
+            except Exception as e:
+                logger.error(f"导出耗材使用记录中断: {str(e)}")
+                raise
+            finally:
+                batches.close()
+
+        resp = Response(generate(), mimetype='text/csv')
+        # 响应体未被迭代（客户端在首字节前断开、后续中间件出错）时 generate() 的 finally 不会执行，
+        # 在响应关闭时兜底释放流式游标占用的连接；生成器重复 close 无副作用
+        resp.call_on_close(batches.close)
         resp.headers["Content-Disposition"] = "attachment; filename=consumable_usage.csv"
         resp.headers["Content-Type"] = "text/csv; charset=utf-8"
+        # 关闭反向代理缓冲，保证首字节尽快到达
+        resp.headers["X-Accel-Buffering"] = "no"
+        if use_gzip:
+            resp.headers["Content-Encoding"] = "gzip"
+            resp.headers["Vary"] = "Accept-Encoding"
         return resp
         
     except Exception as e:
@@ -4,12 +4,22 @@
 课程管理API接口
 """
 
+import os
+import json
+import time
+from itertools import chain
 from flask import Blueprint, request
-from backend.database import execute_query, execute_update, execute_paginated_query, execute_transaction
+from backend.database import (
+    execute_query, execute_update, execute_paginated_query, execute_transaction, execute_batch, transaction
+)
+from app.models.schema import schema_registry
+from app.timetable import parse_schedule, materialize_course_sessions
+from app.lab_assignment import propose_lab_assignment
 from app.utils import (
-    require_auth, require_role, validate_json_data, validate_query_params,
+    require_auth, require_role, validate_json_data, validate_query_params, read_optional_json,
     success_response, error_response, not_found_response, conflict_response,
-    paginated_response, created_response, updated_response, deleted_response
+    paginated_response, created_response, updated_response, deleted_response,
+    SpreadsheetError, iter_spreadsheet_rows
 )
 import logging
 
@@ -18,11 +28,16 @@ logger = logging.getLogger(__name__)
 # 创建蓝图
 courses_bp = Blueprint('courses', __name__)
 
+# 名单导入：单次最多行数、批量查询/插入的分块大小
+ROSTER_IMPORT_MAX_ROWS = int(os.getenv('ROSTER_IMPORT_MAX_ROWS', 20000))
+ROSTER_IMPORT_CHUNK = int(os.getenv('ROSTER_IMPORT_CHUNK', 1000))
+
 @courses_bp.route('', methods=['GET'])
 @require_auth
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'teacher_id': {'type': 'integer', 'min_value': 1},
     'semester': {'type': 'string', 'max_length': 20},
     'status': {'type': 'string', 'choices': ['active', 'inactive', 'completed']},
@@ -68,10 +83,8 @@ def get_courses():
         
         # 构建SQL
         # 检查课程表是否有实验室相关字段
-        has_cols = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='courses' AND COLUMN_NAME IN ('requires_lab','laboratory_id') LIMIT 1"
-        )
-        has_lab_fields = has_cols.get('success') and bool(has_cols.get('data'))
+        has_lab_fields = (schema_registry.has_column('courses', 'requires_lab')
+                          or schema_registry.has_column('courses', 'laboratory_id'))
         if has_lab_fields:
             base_sql = """
             SELECT c.id, c.name, c.code, c.description, c.credits, c.semester,
@@ -97,28 +110,35 @@ def get_courses():
         
         base_sql += ' ORDER BY c.semester DESC, c.name ASC'
         
-        # 执行分页查询
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        # 执行分页查询（结果缓存，课程、教师或实验室写入后失效）
+        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'],
+                                         tables=('courses', 'users', 'laboratories'))
         
         if not result['success']:
             logger.error(f"查询课程列表失败: {result.get('error')}")
             return error_response("获取课程列表失败")
         
-        cs_exists = execute_query("SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='course_students'")
-        has_course_students = cs_exists.get('success') and bool(cs_exists.get('data'))
+        # 本页课程的选课人数：一次分组聚合（结果缓存，选课记录写入后失效）
+        cs_cols = set(schema_registry.columns('course_students'))
+        course_col = 'course_id' if 'course_id' in cs_cols else ('courseId' if 'courseId' in cs_cols else None)
+        student_counts = {}
+        page_ids = [course['id'] for course in result['data']]
+        if course_col and page_ids:
+            placeholders = ','.join(['%s'] * len(page_ids))
+            count_result = execute_query(
+                f"SELECT {course_col} AS course_id, COUNT(*) AS count FROM course_students "
+                f"WHERE {course_col} IN ({placeholders}) GROUP BY {course_col}",
+                tuple(page_ids), tables=('course_students',)
+            )
+            if count_result['success']:
+                student_counts = {row['course_id']: row['count'] for row in count_result['data']}
+            else:
+                logger.warning(f"查询课程选课人数失败: {count_result.get('error')}")
 
         # 格式化数据
         courses = []
         for course in result['data']:
-            student_count = 0
-            if has_course_students:
-                cols = {row.get('COLUMN_NAME') for row in cs_exists.get('data')}
-                course_col = 'course_id' if 'course_id' in cols else ('courseId' if 'courseId' in cols else None)
-                if course_col:
-                    student_count_sql = f"SELECT COUNT(*) as count FROM course_students WHERE {course_col} = %s"
-                    student_count_result = execute_query(student_count_sql, (course['id'],))
-                    if student_count_result['success'] and student_count_result['data']:
-                        student_count = student_count_result['data'][0]['count']
+            student_count = student_counts.get(course['id'], 0)
             
             item = {
                 'id': course['id'],
@@ -164,16 +184,16 @@ def get_course(course_id):
             where_condition += " AND c.teacher_id = %s"
             query_params.append(current_user.get('id') or current_user.get('user_id'))
         
-        has_cols = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='courses' AND COLUMN_NAME IN ('requires_lab','laboratory_id') LIMIT 1"
-        )
-        has_lab_fields = has_cols.get('success') and bool(has_cols.get('data'))
+        has_lab_fields = (schema_registry.has_column('courses', 'requires_lab')
+                          or schema_registry.has_column('courses', 'laboratory_id'))
+        has_schedule = schema_registry.has_column('courses', 'schedule')
         if has_lab_fields:
+            schedule_select = ", c.schedule, c.semester_start" if has_schedule else ""
             sql = f"""
             SELECT c.id, c.name, c.code, c.description, c.credits, c.semester,
                    c.status, c.created_at, c.updated_at,
                    c.teacher_id, u.name as teacher_name, u.email as teacher_email,
-                   c.requires_lab, c.laboratory_id, l.name as laboratory_name
+                   c.requires_lab, c.laboratory_id, l.name as laboratory_name{schedule_select}
             FROM courses c
             LEFT JOIN users u ON c.teacher_id = u.id
             LEFT JOIN laboratories l ON c.laboratory_id = l.id
@@ -189,7 +209,7 @@ def get_course(course_id):
             WHERE {where_condition}
             """
         
-        result = execute_query(sql, tuple(query_params))
+        result = execute_query(sql, tuple(query_params), tables=('courses', 'users', 'laboratories'))
         
         if not result['success']:
             logger.error(f"查询课程详情失败: {result.get('error')}")
@@ -201,9 +221,8 @@ def get_course(course_id):
         course = result['data'][0]
         
         students = []
-        cs_exists = execute_query("SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='course_students'")
-        if cs_exists.get('success') and cs_exists.get('data'):
-            cols = {row.get('COLUMN_NAME') for row in cs_exists.get('data')}
+        cols = set(schema_registry.columns('course_students'))
+        if cols:
             course_col = 'course_id' if 'course_id' in cols else ('courseId' if 'courseId' in cols else None)
             student_col = 'student_id' if 'student_id' in cols else ('studentId' if 'studentId' in cols else None)
             enrolled_col = 'enrolled_at' if 'enrolled_at' in cols else ('enrolledAt' if 'enrolledAt' in cols else None)
@@ -214,7 +233,7 @@ def get_course(course_id):
                     f"FROM course_students cs JOIN users u ON cs.{student_col} = u.id "
                     f"WHERE cs.{course_col} = %s ORDER BY u.name ASC"
                 )
-                students_result = execute_query(students_sql, (course_id,))
+                students_result = execute_query(students_sql, (course_id,), tables=('course_students', 'users'))
                 if students_result['success']:
                     for student in students_result['data']:
                         students.append({
@@ -247,6 +266,12 @@ def get_course(course_id):
             course_info['requires_lab'] = bool(course.get('requires_lab'))
             course_info['laboratory_id'] = course.get('laboratory_id')
             course_info['laboratory_name'] = course.get('laboratory_name')
+            if has_schedule:
+                try:
+                    course_info['schedule'] = parse_schedule(course.get('schedule'))
+                except ValueError:
+                    course_info['schedule'] = []
+                course_info['semester_start'] = course['semester_start'].isoformat() if course.get('semester_start') else None
         
         return success_response(course_info, "获取课程详情成功")
         
@@ -266,7 +291,9 @@ def get_course(course_id):
     'teacher_id': {'required': False, 'type': 'integer', 'min_value': 1},
     'status': {'required': False, 'type': 'string', 'choices': ['active', 'inactive', 'completed']},
     'requires_lab': {'required': False, 'type': 'integer', 'min_value': 0, 'max_value': 1},
-    'laboratory_id': {'required': False, 'type': 'integer', 'min_value': 1}
+    'laboratory_id': {'required': False, 'type': 'integer', 'min_value': 1},
+    'schedule': {'required': False, 'type': 'list'},
+    'semester_start': {'required': False, 'type': 'date'}
 })
 def create_course():
     """创建课程"""
@@ -283,6 +310,10 @@ def create_course():
         requires_lab_flag = int(data.get('requires_lab') or 0)
         requires_lab = 1 if requires_lab_flag == 1 else 0
         laboratory_id = data.get('laboratory_id')
+        try:
+            schedule = parse_schedule(data.get('schedule'))
+        except ValueError as e:
+            return error_response(str(e), 'VALIDATION_ERROR', 400)
         
         # 确定教师ID
         if current_user['role'] == 'admin':
@@ -320,18 +351,18 @@ def create_course():
                 return not_found_response("关联实验室不存在")
 
         # 插入新课程（兼容无新列的环境）
-        has_cols = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='courses' AND COLUMN_NAME='requires_lab' LIMIT 1"
-        )
-        has_lab_fields = has_cols.get('success') and bool(has_cols.get('data'))
+        has_lab_fields = schema_registry.has_column('courses', 'requires_lab')
         if has_lab_fields:
-            insert_sql = """
-            INSERT INTO courses (name, code, description, credits, semester, teacher_id, status, requires_lab, laboratory_id, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-            """
-            insert_result = execute_update(insert_sql, (
-                name, code, description, credits, semester, teacher_id, status, requires_lab, laboratory_id
-            ))
+            columns = ['name', 'code', 'description', 'credits', 'semester', 'teacher_id', 'status', 'requires_lab', 'laboratory_id']
+            values = [name, code, description, credits, semester, teacher_id, status, requires_lab, laboratory_id]
+            if schema_registry.has_column('courses', 'schedule'):
+                columns += ['schedule', 'semester_start']
+                values += [json.dumps(schedule, ensure_ascii=False) if schedule else None, data.get('semester_start')]
+            insert_sql = (
+                f"INSERT INTO courses ({', '.join(columns)}, created_at) "
+                f"VALUES ({', '.join(['%s'] * len(values))}, NOW())"
+            )
+            insert_result = execute_update(insert_sql, tuple(values))
         else:
             insert_sql = """
             INSERT INTO courses (name, code, description, credits, semester, teacher_id, status, created_at)
@@ -412,7 +443,9 @@ def create_course():
     'teacher_id': {'required': False, 'type': 'integer', 'min_value': 1},
     'status': {'required': False, 'type': 'string', 'choices': ['active', 'inactive', 'completed']},
     'requires_lab': {'required': False, 'type': 'integer', 'min_value': 0, 'max_value': 1},
-    'laboratory_id': {'required': False, 'type': 'integer', 'min_value': 1}
+    'laboratory_id': {'required': False, 'type': 'integer', 'min_value': 1},
+    'schedule': {'required': False, 'type': 'list'},
+    'semester_start': {'required': False, 'type': 'date'}
 })
 def update_course(course_id):
     """更新课程信息"""
@@ -508,10 +541,7 @@ def update_course(course_id):
             update_values.append(data['status'])
 
         # 课程实验室设置
-        has_cols = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='courses' AND COLUMN_NAME='requires_lab' LIMIT 1"
-        )
-        has_lab_fields = has_cols.get('success') and bool(has_cols.get('data'))
+        has_lab_fields = schema_registry.has_column('courses', 'requires_lab')
         if has_lab_fields:
             if 'requires_lab' in data and data['requires_lab'] is not None:
                 rl = 1 if int(data['requires_lab']) == 1 else 0
@@ -530,6 +560,20 @@ def update_course(course_id):
                         return not_found_response("关联实验室不存在")
                 update_fields.append('laboratory_id = %s')
                 update_values.append(lab_id)
+
+        # 课表（修改后需重新执行课程预约生成，才会同步到预约）
+        if schema_registry.has_column('courses', 'schedule'):
+            # 未传字段校验后为 None；传空列表表示清空课表
+            if data.get('schedule') is not None:
+                try:
+                    schedule = parse_schedule(data.get('schedule'))
+                except ValueError as e:
+                    return error_response(str(e), 'VALIDATION_ERROR', 400)
+                update_fields.append('schedule = %s')
+                update_values.append(json.dumps(schedule, ensure_ascii=False) if schedule else None)
+            if data.get('semester_start') is not None:
+                update_fields.append('semester_start = %s')
+                update_values.append(data.get('semester_start'))
         
         if not update_fields:
             return error_response("没有需要更新的字段")
@@ -660,18 +704,14 @@ def add_students_to_course(course_id):
         if not new_student_ids:
             return error_response("所有学生都已经选了这门课")
         
-        # 批量插入新的选课记录
-        insert_operations = []
-        for student_id in new_student_ids:
-            insert_operations.append((
-                "INSERT INTO course_students (course_id, student_id, enrolled_at) VALUES (%s, %s, NOW())",
-                (course_id, student_id)
-            ))
-        
-        transaction_result = execute_transaction(insert_operations)
+        # 批量插入新的选课记录（enrolled_at 使用列默认值，保证语句可被改写为多行 VALUES）
+        batch_result = execute_batch(
+            "INSERT INTO course_students (course_id, student_id) VALUES (%s, %s)",
+            [(course_id, student_id) for student_id in new_student_ids]
+        )
         
-        if not transaction_result['success']:
-            logger.error(f"添加学生到课程失败: {transaction_result.get('error')}")
+        if not batch_result['success']:
+            logger.error(f"添加学生到课程失败: {batch_result.get('error')}")
             return error_response("添加学生失败，请稍后重试")
         
         result_info = {
@@ -742,6 +782,339 @@ def remove_student_from_course(course_id, student_id):
         logger.error(f"移除学生接口错误: {str(e)}")
         return error_response("移除学生失败，请稍后重试")
 
+# 名单文件表头别名（不区分大小写）
+_ROSTER_STUDENT_HEADERS = ('student_id', 'student_no', '学号')
+_ROSTER_COURSE_CODE_HEADERS = ('course_code', '课程代码')
+_ROSTER_COURSE_ID_HEADERS = ('course_id', '课程id')
+_ROSTER_SEMESTER_HEADERS = ('semester', '学期')
+
+_ROSTER_MESSAGES = {
+    'enrolled': '已选课',
+    'enrolled_unconfirmed': '已在课程中（本次导入或同时进行的其他操作写入，无法逐条区分）',
+    'already_enrolled': '已在课程中，跳过',
+    'duplicate': '文件中重复，跳过',
+    'student_not_found': '学号不存在或不是学生',
+    'course_not_found': '课程不存在',
+    'ambiguous_course': '课程代码对应多个学期的课程，请填写学期列或指定学期',
+    'forbidden': '没有权限操作此课程',
+    'invalid': '学号或课程为空/格式错误'
+}
+
+def _chunks(values, size=None):
+    values = list(values)
+    size = size or ROSTER_IMPORT_CHUNK
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _normalize_student_no(value):
+    # Excel 数值单元格中的学号可能带有 .0 后缀
+    if value.endswith('.0') and value[:-2].isdigit():
+        return value[:-2]
+    return value
+
+def _read_roster(file, course_id=None, semester=None):
+    """解析名单文件，返回 [(行号, 学号, 课程键)]，课程键为 ('id', 课程ID)、('code', 课程代码, 学期或 None) 或 None。
+    指定 course_id 时忽略文件中的课程列，且允许无表头的单列学号名单；学期取学期列，为空时使用 semester。"""
+    rows = iter_spreadsheet_rows(file.stream, file.filename)
+    first = next(rows, None)
+    if first is None:
+        raise SpreadsheetError("文件内容为空")
+    names = [cell.lower() for cell in first[1]]
+
+    def column(aliases):
+        return next((i for i, name in enumerate(names) if name in aliases), None)
+
+    student_col = column(_ROSTER_STUDENT_HEADERS)
+    code_col = column(_ROSTER_COURSE_CODE_HEADERS)
+    id_col = column(_ROSTER_COURSE_ID_HEADERS)
+    semester_col = column(_ROSTER_SEMESTER_HEADERS)
+    leading = []
+    if student_col is None:
+        if course_id is None:
+            raise SpreadsheetError("缺少学号列（student_id / 学号）")
+        student_col, leading = 0, [first]
+    if course_id is None and code_col is None and id_col is None:
+        raise SpreadsheetError("缺少课程列（course_code / 课程代码 或 course_id）")
+
+    def cell(cells, index):
+        return cells[index] if index is not None and index < len(cells) else ''
+
+    entries = []
+    for number, cells in chain(leading, rows):
+        if len(entries) >= ROSTER_IMPORT_MAX_ROWS:
+            raise SpreadsheetError(f"单次最多导入 {ROSTER_IMPORT_MAX_ROWS} 行")
+        course_key = None
+        if course_id is not None:
+            course_key = ('id', course_id)
+        elif cell(cells, code_col):
+            course_key = ('code', cell(cells, code_col), cell(cells, semester_col) or semester)
+        elif cell(cells, id_col).isdigit():
+            course_key = ('id', int(cell(cells, id_col)))
+        entries.append((number, _normalize_student_no(cell(cells, student_col)), course_key))
+    return entries
+
+def _lookup_rows(sql_template, keys):
+    """按分块 IN 查询，返回所有行"""
+    rows = []
+    for chunk in _chunks(sorted(keys)):
+        result = execute_query(sql_template.format(','.join(['%s'] * len(chunk))), tuple(chunk))
+        if not result['success']:
+            raise RuntimeError(result.get('error'))
+        rows.extend(result['data'])
+    return rows
+
+def _lookup(sql_template, keys, key_field):
+    """按分块 IN 查询，返回 {key_field 值: 行}（key_field 需唯一）"""
+    return {row[key_field]: row for row in _lookup_rows(sql_template, keys)}
+
+def _resolve_offering(offerings, semester):
+    """课程代码只在学期内唯一：指定学期时按学期匹配；未指定时只有一条开课记录或只有一条进行中的记录才能确定，
+    否则返回 'ambiguous'。找不到时返回 None"""
+    if semester:
+        offerings = [row for row in offerings if row['semester'] == semester]
+    elif len(offerings) > 1:
+        active = [row for row in offerings if row['status'] == 'active']
+        return active[0] if len(active) == 1 else 'ambiguous'
+    return offerings[0] if offerings else None
+
+def _import_roster(entries, current_user):
+    """批量解析学号与课程并选课：查询按块合并，插入在同一事务中分块 INSERT IGNORE，返回逐行报告"""
+    started = time.monotonic()
+    user_id = current_user.get('id') or current_user.get('user_id')
+
+    codes = {key[1] for _, _, key in entries if key and key[0] == 'code'}
+    ids = {key[1] for _, _, key in entries if key and key[0] == 'id'}
+    courses = {}
+    if codes:
+        offerings = {}
+        for row in _lookup_rows("SELECT id, code, semester, status, teacher_id FROM courses WHERE code IN ({})", codes):
+            offerings.setdefault(row['code'], []).append(row)
+        for key in {key for _, _, key in entries if key and key[0] == 'code'}:
+            courses[key] = _resolve_offering(offerings.get(key[1], []), key[2])
+    if ids:
+        by_id = _lookup("SELECT id, code, teacher_id FROM courses WHERE id IN ({})", ids, 'id')
+        courses.update({('id', course_id): row for course_id, row in by_id.items()})
+    student_nos = {student_no for _, student_no, _ in entries if student_no}
+    students = _lookup(
+        "SELECT id, student_id FROM users WHERE role = 'student' AND student_id IN ({})", student_nos, 'student_id'
+    )
+
+    report_rows = []
+    candidates = {}
+    for number, student_no, course_key in entries:
+        row = {'row': number, 'student_id': student_no, 'course': course_key[1] if course_key else None}
+        if course_key and course_key[0] == 'code' and course_key[2]:
+            row['semester'] = course_key[2]
+        report_rows.append(row)
+        course = courses.get(course_key)
+        if not student_no or course_key is None:
+            row['status'] = 'invalid'
+        elif course is None:
+            row['status'] = 'course_not_found'
+        elif course == 'ambiguous':
+            row['status'] = 'ambiguous_course'
+        elif current_user['role'] == 'teacher' and user_id != course['teacher_id']:
+            row['status'] = 'forbidden'
+        elif student_no not in students:
+            row['status'] = 'student_not_found'
+        else:
+            pair = (course['id'], students[student_no]['id'])
+            if pair in candidates:
+                row['status'] = 'duplicate'
+            else:
+                candidates[pair] = row
+
+    inserted = 0
+    if candidates:
+        course_ids = sorted({course_id for course_id, _ in candidates})
+        course_placeholders = ','.join(['%s'] * len(course_ids))
+        with transaction():
+            existing = set()
+            for chunk in _chunks(sorted({student for _, student in candidates})):
+                result = execute_query(
+                    f"SELECT course_id, student_id FROM course_students "
+                    f"WHERE course_id IN ({course_placeholders}) AND student_id IN ({','.join(['%s'] * len(chunk))})",
+                    tuple(course_ids) + tuple(chunk)
+                )
+                if not result['success']:
+                    raise RuntimeError(result.get('error'))
+                existing.update((row['course_id'], row['student_id']) for row in result['data'])
+            new_pairs = [pair for pair in candidates if pair not in existing]
+            # INSERT IGNORE 兼顾检查与插入之间并发写入的同一选课记录，不会因唯一键冲突中断整批
+            batch = execute_batch(
+                "INSERT IGNORE INTO course_students (course_id, student_id) VALUES (%s, %s)",
+                new_pairs, chunk_size=ROSTER_IMPORT_CHUNK
+            )
+            if not batch['success']:
+                raise RuntimeError(batch.get('error'))
+            inserted = batch['affected_rows']
+        # 检查之后被并发写入的选课记录会被 INSERT IGNORE 跳过，此时无法知道是哪几条，
+        # 这些行不再声称由本次导入写入
+        new_status = 'enrolled' if inserted == len(new_pairs) else 'enrolled_unconfirmed'
+        for pair, row in candidates.items():
+            row['status'] = 'already_enrolled' if pair in existing else new_status
+
+    summary = dict.fromkeys(_ROSTER_MESSAGES, 0)
+    for row in report_rows:
+        summary[row['status']] += 1
+        row['message'] = _ROSTER_MESSAGES[row['status']]
+    summary.update({
+        'total': len(report_rows),
+        'inserted': inserted,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1)
+    })
+    return {'summary': summary, 'rows': report_rows}
+
+def _roster_file():
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return None
+    return file
+
+@courses_bp.route('/<int:course_id>/students/import', methods=['POST'])
+@require_auth
+@require_role(['admin', 'teacher'])
+def import_course_students(course_id):
+    """从 CSV/XLSX 名单（学号列，可无表头）批量导入本课程学生"""
+    try:
+        current_user = request.current_user
+        file = _roster_file()
+        if file is None:
+            return error_response("请上传名单文件（file）", 'VALIDATION_ERROR', 400)
+
+        check_result = execute_query("SELECT id, teacher_id FROM courses WHERE id = %s", (course_id,))
+        if not check_result['success']:
+            return error_response("操作失败，请稍后重试")
+        if not check_result['data']:
+            return not_found_response("课程不存在")
+        if (current_user['role'] == 'teacher' and
+            (current_user.get('id') or current_user.get('user_id')) != check_result['data'][0]['teacher_id']):
+            return error_response("没有权限操作此课程")
+
+        try:
+            entries = _read_roster(file, course_id)
+        except SpreadsheetError as e:
+            return error_response(str(e), 'VALIDATION_ERROR', 400)
+
+        report = _import_roster(entries, current_user)
+        summary = report['summary']
+        logger.info(f"课程 {course_id} 名单导入: {summary['total']} 行, 新增 {summary['inserted']} 条, 耗时 {summary['duration_ms']}ms")
+        return success_response(report, f"导入完成：新增{summary['inserted']}名学生，共{summary['total']}行")
+    except Exception as e:
+        logger.error(f"导入课程名单接口错误: {str(e)}")
+        return error_response("导入名单失败，请稍后重试")
+
+@courses_bp.route('/students/import', methods=['POST'])
+@require_auth
+@require_role(['admin', 'teacher'])
+def import_students():
+    """从 CSV/XLSX 名单批量导入多门课程的学生：需包含学号列与课程列（课程代码或课程ID）。
+    课程代码在不同学期可重复，可用学期列或表单参数 semester 指定学期"""
+    try:
+        current_user = request.current_user
+        file = _roster_file()
+        if file is None:
+            return error_response("请上传名单文件（file）", 'VALIDATION_ERROR', 400)
+
+        try:
+            semester = (request.form.get('semester') or '').strip() or None
+            entries = _read_roster(file, semester=semester)
+        except SpreadsheetError as e:
+            return error_response(str(e), 'VALIDATION_ERROR', 400)
+
+        report = _import_roster(entries, current_user)
+        summary = report['summary']
+        logger.info(f"名单导入: {summary['total']} 行, 新增 {summary['inserted']} 条, 耗时 {summary['duration_ms']}ms")
+        return success_response(report, f"导入完成：新增{summary['inserted']}条选课记录，共{summary['total']}行")
+    except Exception as e:
+        logger.error(f"导入名单接口错误: {str(e)}")
+        return error_response("导入名单失败，请稍后重试")
+
+def _course_id_list(value):
+    """可选的课程ID列表，空值返回 None；格式错误时抛出 ValueError"""
+    if not value:
+        return None
+    if not isinstance(value, list):
+        raise ValueError(value)
+    return [int(course_id) for course_id in value]
+
+@courses_bp.route('/sessions/generate', methods=['POST'])
+@require_auth
+@require_role(['admin'])
+def generate_course_sessions():
+    """按课程课表生成/同步实验室预约：只应用与现有课程预约的差异，冲突场次跳过并在报告中列出。
+    请求体可省略，省略时同步所有课程"""
+    try:
+        data, error = read_optional_json({
+            'semester': {'type': 'string', 'max_length': 20},
+            'course_ids': {},
+            'from_date': {'type': 'date'},
+            'dry_run': {}
+        })
+        if error:
+            return error
+        if not schema_registry.has_column('courses', 'schedule'):
+            return error_response("当前数据库尚未支持课程课表", 'VALIDATION_ERROR', 400)
+        try:
+            course_ids = _course_id_list(data.get('course_ids'))
+        except (TypeError, ValueError):
+            return error_response("course_ids 必须是课程ID列表", 'VALIDATION_ERROR', 400)
+
+        report = materialize_course_sessions(
+            semester=data.get('semester'),
+            course_ids=course_ids,
+            from_date=data.get('from_date'),
+            dry_run=bool(data.get('dry_run'))
+        )
+        if not report['success']:
+            return error_response("生成课程预约失败，请稍后重试", 'INTERNAL_ERROR', 500, report)
+        message = (
+            f"{'试运行完成' if report['dry_run'] else '课程预约已同步'}：新增{report['created']}场，"
+            f"删除{report['removed']}场，冲突{len(report['conflicts'])}场"
+        )
+        return success_response(report, message)
+    except Exception as e:
+        logger.error(f"生成课程预约接口错误: {str(e)}")
+        return error_response("生成课程预约失败，请稍后重试")
+
+@courses_bp.route('/lab-assignment', methods=['POST'])
+@require_auth
+@require_role(['admin'])
+def assign_course_labs():
+    """为需要实验室的课程整体求解实验室分配（同一实验室上课时间不冲突、容量足够，匹配度最大）；
+    apply 为真时把变化的分配写回课程，否则只返回方案。请求体可省略，省略时求解所有课程"""
+    try:
+        data, error = read_optional_json({
+            'semester': {'type': 'string', 'max_length': 20},
+            'course_ids': {},
+            'time_limit': {'type': 'float', 'min_value': 1, 'max_value': 60},
+            'apply': {}
+        })
+        if error:
+            return error
+        try:
+            course_ids = _course_id_list(data.get('course_ids'))
+        except (TypeError, ValueError):
+            return error_response("course_ids 必须是课程ID列表", 'VALIDATION_ERROR', 400)
+
+        report = propose_lab_assignment(
+            semester=data.get('semester'),
+            course_ids=course_ids,
+            time_limit=data.get('time_limit'),
+            apply=bool(data.get('apply'))
+        )
+        if not report['success']:
+            return error_response("课程实验室分配失败，请稍后重试", 'INTERNAL_ERROR', 500)
+        summary = report['summary']
+        message = (
+            f"{'已写回' if report['applied'] else '分配方案'}：已分配{summary['assigned']}门课程，"
+            f"未分配{summary['unassigned']}门，变更{summary['changed']}门"
+        )
+        return success_response(report, message)
+    except Exception as e:
+        logger.error(f"课程实验室分配接口错误: {str(e)}")
+        return error_response("课程实验室分配失败，请稍后重试")
+
 @courses_bp.route('/my-courses', methods=['GET'])
 @require_auth
 @require_role(['student'])
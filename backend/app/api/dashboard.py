@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+首页看板API接口：一次请求并行汇总各模块统计
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Blueprint, request
+from backend.database import TableTaggedCache, register_cache
+from app.utils import require_auth, success_response, error_response, forbidden_response, single_flight
+from app.api.reservations import build_reservation_statistics, build_my_reservation_statistics
+from app.api.equipment import build_equipment_statistics
+from app.api.maintenance import build_maintenance_statistics
+from app.api.consumables import build_consumable_statistics, build_consumable_usage_statistics
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+dashboard_bp = Blueprint('dashboard', __name__)
+
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+DASHBOARD_TIMEOUT = float(os.getenv('DASHBOARD_TIMEOUT', '15'))
+
+STAFF_ROLES = ('admin', 'teacher')
+
+# 看板模块：构建函数、可见角色（None 表示所有登录用户）、是否按用户区分、依赖的表（写入即失效缓存）
+DASHBOARD_SECTIONS = {
+    'reservations': {
+        'builder': lambda user: build_reservation_statistics(),
+        'roles': STAFF_ROLES,
+        'tables': ('reservations', 'reservation_daily_stats', 'laboratories', 'users')
+    },
+    'my_reservations': {
+        'builder': lambda user: build_my_reservation_statistics(user['id']),
+        'roles': None,
+        'per_user': True,
+        'tables': ('reservations', 'reservation_daily_stats')
+    },
+    'equipment': {
+        'builder': lambda user: build_equipment_statistics(),
+        'roles': STAFF_ROLES,
+        'tables': ('equipment', 'laboratories')
+    },
+    'maintenance': {
+        'builder': lambda user: build_maintenance_statistics(),
+        'roles': STAFF_ROLES,
+        'tables': ('equipment_repair',)
+    },
+    'consumables': {
+        'builder': lambda user: build_consumable_statistics(),
+        'roles': None,
+        'tables': ('consumables', 'consumable_usage')
+    },
+    'consumable_usage': {
+        'builder': lambda user: build_consumable_usage_statistics(),
+        'roles': None,
+        'tables': ('consumables', 'consumable_usage')
+    }
+}
+
+# 按角色（按用户的模块按用户）缓存各模块结果，本进程内写入相关表时立即失效
+dashboard_cache = register_cache(TableTaggedCache(max_entries=2000, ttl=DASHBOARD_CACHE_TTL))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _section_executor():
+    # 与 execute_parallel 的数据库线程池分开，避免模块任务占满工作线程后等待自身提交的查询
+    global _executor, _executor_pid
+    with _executor_lock:
+        # fork 出的子进程不继承父进程的线程，需重建线程池
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=len(DASHBOARD_SECTIONS), thread_name_prefix='dashboard')
+            _executor_pid = os.getpid()
+        return _executor
+
+def _allowed_sections(role):
+    return [name for name, spec in DASHBOARD_SECTIONS.items() if spec['roles'] is None or role in spec['roles']]
+
+def _cache_key(name, user):
+    if DASHBOARD_SECTIONS[name].get('per_user'):
+        return ('dashboard', name, 'user', user['id'])
+    return ('dashboard', name, 'role', user['role'])
+
+@dashboard_bp.route('', methods=['GET'])
+@require_auth
+@single_flight(scope='user')
+def get_dashboard():
+    """看板数据：?sections=a,b 只返回指定模块，默认返回当前角色可见的全部模块；
+    各模块并行构建，结果按角色缓存 DASHBOARD_CACHE_TTL 秒，?refresh=1 跳过缓存"""
+    try:
+        current_user = request.current_user
+        user = {
+            'id': current_user.get('id') or current_user.get('user_id'),
+            'role': current_user.get('role')
+        }
+        allowed = _allowed_sections(user['role'])
+
+        raw = request.args.get('sections', '')
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        if requested:
+            unknown = [name for name in requested if name not in DASHBOARD_SECTIONS]
+            if unknown:
+                return error_response(f"未知的看板模块: {', '.join(unknown)}", 'VALIDATION_ERROR', 400,
+                                      {'available': allowed})
+            denied = [name for name in requested if name not in allowed]
+            if denied:
+                return forbidden_response(f"无权查看看板模块: {', '.join(denied)}")
+            sections = list(dict.fromkeys(requested))
+        else:
+            sections = allowed
+
+        refresh = request.args.get('refresh') in ('1', 'true')
+        data, cached, errors = {}, [], {}
+        pending = {}
+        for name in sections:
+            key = _cache_key(name, user)
+            value = dashboard_cache.get(key) if not refresh else TableTaggedCache.MISS
+            if value is not TableTaggedCache.MISS:
+                data[name] = value
+                cached.append(name)
+                continue
+            snapshot = dashboard_cache.snapshot(DASHBOARD_SECTIONS[name]['tables'])
+            pending[name] = (key, snapshot, _section_executor().submit(DASHBOARD_SECTIONS[name]['builder'], user))
+
+        if pending:
+            wait([future for _, _, future in pending.values()], timeout=DASHBOARD_TIMEOUT)
+        for name, (key, snapshot, future) in pending.items():
+            if not future.done():
+                future.cancel()
+                errors[name] = '加载超时'
+                data[name] = None
+                continue
+            try:
+                value = future.result()
+            except Exception as e:
+                logger.error(f"看板模块 {name} 加载失败: {str(e)}")
+                errors[name] = '加载失败'
+                data[name] = None
+                continue
+            dashboard_cache.set(key, value, snapshot)
+            data[name] = value
+
+        payload = {
+            'sections': {name: data[name] for name in sections},
+            'cached': cached
+        }
+        if errors:
+            payload['errors'] = errors
+        return success_response(payload, "获取看板数据成功")
+    except Exception as e:
+        logger.error(f"获取看板数据接口错误: {str(e)}")
+        return error_response("获取看板数据失败")
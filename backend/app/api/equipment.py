@@ -5,11 +5,11 @@
 """
 
 from flask import Blueprint, request
-from backend.database import execute_query, execute_update, execute_paginated_query
+from backend.database import execute_query, execute_update, execute_paginated_query, execute_parallel
 from app.utils import (
     require_auth, require_role, validate_json_data, validate_query_params,
     success_response, error_response, not_found_response, conflict_response,
-    paginated_response, created_response, updated_response, deleted_response
+    paginated_response, created_response, updated_response, deleted_response, single_flight
 )
 import logging
 
@@ -23,6 +23,7 @@ equipment_bp = Blueprint('equipment', __name__)
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'laboratory_id': {'type': 'integer', 'min_value': 1},
     'status': {'type': 'string', 'choices': ['available', 'maintenance', 'damaged', 'retired']},
     'search': {'type': 'string', 'max_length': 100},
@@ -79,8 +80,9 @@ def get_equipment():
         
         base_sql += ' ORDER BY e.name ASC'
         
-        # 执行分页查询
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        # 执行分页查询（结果缓存，设备或实验室写入后失效）
+        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'],
+                                         tables=('equipment', 'laboratories'))
         
         if not result['success']:
             logger.error(f"查询设备列表失败: {result.get('error')}")
@@ -126,7 +128,7 @@ def get_equipment_detail(equipment_id):
         LEFT JOIN laboratories l ON e.laboratory_id = l.id
         WHERE e.id = %s
         """
-        result = execute_query(sql, (equipment_id,))
+        result = execute_query(sql, (equipment_id,), tables=('equipment', 'laboratories'))
         
         if not result['success']:
             logger.error(f"查询设备详情失败: {result.get('error')}")
@@ -474,50 +476,26 @@ def delete_equipment(equipment_id):
         logger.error(f"删除设备接口错误: {str(e)}")
         return error_response("删除失败，请稍后重试")
 
-@equipment_bp.route('/statistics', methods=['GET'])
-@require_auth
-@require_role(['admin', 'teacher'])
-def get_equipment_statistics():
-    """获取设备统计信息"""
-    try:
+def build_equipment_statistics():
+    """设备统计（/statistics 与看板共用）：状态、实验室分布及30天内过保设备"""
+    # 三个统计查询相互独立，并行执行
+    results = execute_parallel({
         # 按状态统计设备数量
-        status_sql = """
+        'status': """
         SELECT status, COUNT(*) as count
         FROM equipment
         GROUP BY status
-        """
-        status_result = execute_query(status_sql, ())
-        
-        if not status_result['success']:
-            logger.error(f"查询设备状态统计失败: {status_result.get('error')}")
-            return error_response("获取统计信息失败")
-        
-        status_stats = {}
-        total_count = 0
-        for row in status_result['data']:
-            status_stats[row['status']] = row['count']
-            total_count += row['count']
-        
+        """,
         # 按实验室统计设备数量
-        lab_sql = """
+        'laboratory': """
         SELECT l.name as laboratory_name, COUNT(e.id) as count
         FROM laboratories l
         LEFT JOIN equipment e ON l.id = e.laboratory_id
         GROUP BY l.id, l.name
         ORDER BY count DESC
-        """
-        lab_result = execute_query(lab_sql, ())
-        
-        lab_stats = []
-        if lab_result['success']:
-            for row in lab_result['data']:
-                lab_stats.append({
-                    'laboratory_name': row['laboratory_name'],
-                    'equipment_count': row['count']
-                })
-        
+        """,
         # 即将过保的设备（30天内）
-        warranty_sql = """
+        'warranty': """
         SELECT id, name, model, warranty_date, DATEDIFF(warranty_date, CURDATE()) as days_left
         FROM equipment
         WHERE warranty_date IS NOT NULL 
@@ -525,25 +503,54 @@ def get_equipment_statistics():
         AND DATEDIFF(warranty_date, CURDATE()) <= 30
         ORDER BY warranty_date ASC
         """
-        warranty_result = execute_query(warranty_sql, ())
-        
-        warranty_expiring = []
-        if warranty_result['success']:
-            for row in warranty_result['data']:
-                warranty_expiring.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'model': row['model'],
-                    'warranty_date': row['warranty_date'].isoformat() if row['warranty_date'] else None,
-                    'days_left': row['days_left']
-                })
-        
-        statistics = {
-            'total_equipment': total_count,
-            'status_distribution': status_stats,
-            'laboratory_distribution': lab_stats,
-            'warranty_expiring_soon': warranty_expiring
-        }
+    })
+    status_result = results['status']
+    
+    if not status_result['success']:
+        raise RuntimeError(f"查询设备状态统计失败: {status_result.get('error')}")
+    
+    status_stats = {}
+    total_count = 0
+    for row in status_result['data']:
+        status_stats[row['status']] = row['count']
+        total_count += row['count']
+    
+    lab_result = results['laboratory']
+    lab_stats = []
+    if lab_result['success']:
+        for row in lab_result['data']:
+            lab_stats.append({
+                'laboratory_name': row['laboratory_name'],
+                'equipment_count': row['count']
+            })
+    
+    warranty_result = results['warranty']
+    warranty_expiring = []
+    if warranty_result['success']:
+        for row in warranty_result['data']:
+            warranty_expiring.append({
+                'id': row['id'],
+                'name': row['name'],
+                'model': row['model'],
+                'warranty_date': row['warranty_date'].isoformat() if row['warranty_date'] else None,
+                'days_left': row['days_left']
+            })
+    
+    return {
+        'total_equipment': total_count,
+        'status_distribution': status_stats,
+        'laboratory_distribution': lab_stats,
+        'warranty_expiring_soon': warranty_expiring
+    }
+
+@equipment_bp.route('/statistics', methods=['GET'])
+@require_auth
+@require_role(['admin', 'teacher'])
+@single_flight()
+def get_equipment_statistics():
+    """获取设备统计信息"""
+    try:
+        statistics = build_equipment_statistics()
         
         return success_response(statistics, "获取设备统计信息成功")
         
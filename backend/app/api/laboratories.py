@@ -6,11 +6,17 @@
 
 from flask import Blueprint, request
 from backend.database import execute_query, execute_update, execute_paginated_query
+from app.models.schedule import (
+    reservation_index, get_availability, find_free_slots, SlotGrid, format_seconds, to_seconds,
+    AVAILABILITY_OPEN_TIME, AVAILABILITY_CLOSE_TIME, AVAILABILITY_SLOT_MINUTES
+)
+from app.models.schema import schema_registry
 from app.utils import (
     require_auth, require_role, validate_json_data, validate_query_params,
     success_response, error_response, not_found_response, conflict_response,
     paginated_response, created_response, updated_response, deleted_response
 )
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,11 +24,15 @@ logger = logging.getLogger(__name__)
 # 创建蓝图
 laboratories_bp = Blueprint('laboratories', __name__)
 
+# 批量可用性查询允许的最大天数
+MAX_AVAILABILITY_DAYS = 62
+
 @laboratories_bp.route('', methods=['GET'])
 @require_auth
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'status': {'type': 'string', 'choices': ['available', 'maintenance', 'occupied']},
     'search': {'type': 'string', 'max_length': 100},
     'min_capacity': {'type': 'integer', 'min_value': 0},
@@ -52,10 +62,7 @@ def get_laboratories():
             where_conditions.append('SEARCH_PLACEHOLDER')
         
         # 构建SQL（兼容未添加 manager_id 字段的旧库）
-        has_manager_col = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='laboratories' AND COLUMN_NAME='manager_id' LIMIT 1"
-        )
-        join_manager = has_manager_col.get('success') and bool(has_manager_col.get('data'))
+        join_manager = schema_registry.has_column('laboratories', 'manager_id')
         if join_manager:
             base_sql = (
                 "SELECT l.id, l.name, l.location, l.capacity, l.description, l.status, "
@@ -101,8 +108,9 @@ def get_laboratories():
         
         base_sql += (' ORDER BY l.name ASC' if join_manager else ' ORDER BY name ASC')
         
-        # 执行分页查询
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        # 执行分页查询（实验室为低频变更的基础数据，结果缓存；“使用中”筛选依赖预约实时状态，不缓存）
+        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'],
+                                         tables=None if status == 'occupied' else ('laboratories', 'users'))
         
         if not result['success']:
             logger.error(f"查询实验室列表失败: {result.get('error')}")
@@ -136,10 +144,7 @@ def get_laboratory(lab_id):
     """获取实验室详情"""
     try:
         # 兼容未添加 manager_id 字段的旧库
-        has_manager_col = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='laboratories' AND COLUMN_NAME='manager_id' LIMIT 1"
-        )
-        join_manager = has_manager_col.get('success') and bool(has_manager_col.get('data'))
+        join_manager = schema_registry.has_column('laboratories', 'manager_id')
         if join_manager:
             sql = (
                 "SELECT l.id, l.name, l.location, l.capacity, l.description, l.status, "
@@ -151,7 +156,7 @@ def get_laboratory(lab_id):
                 "SELECT id, name, location, capacity, description, status, created_at, updated_at "
                 "FROM laboratories WHERE id = %s"
             )
-        result = execute_query(sql, (lab_id,))
+        result = execute_query(sql, (lab_id,), tables=('laboratories', 'users'))
         
         if not result['success']:
             logger.error(f"查询实验室详情失败: {result.get('error')}")
@@ -181,7 +186,7 @@ def get_laboratory(lab_id):
         WHERE laboratory_id = %s
         ORDER BY name ASC
         """
-        equipment_result = execute_query(equipment_sql, (lab_id,))
+        equipment_result = execute_query(equipment_sql, (lab_id,), tables=('equipment',))
         
         if equipment_result['success']:
             equipment_list = []
@@ -243,6 +248,154 @@ def get_laboratory_equipment(lab_id):
         logger.error(f"获取实验室设备接口错误: {str(e)}")
         return error_response("获取设备列表失败")
 
+@laboratories_bp.route('/availability', methods=['GET'])
+@require_auth
+@validate_query_params({
+    'lab_ids': {'type': 'string', 'max_length': 2000},  # 逗号分隔，缺省为全部可用实验室
+    'date_from': {'required': True, 'type': 'date_string'},
+    'date_to': {'type': 'date_string'},
+    'slot_minutes': {'type': 'integer', 'min_value': 5, 'max_value': 240, 'default': AVAILABILITY_SLOT_MINUTES},
+    'open_time': {'type': 'string', 'default': AVAILABILITY_OPEN_TIME},
+    'close_time': {'type': 'string', 'default': AVAILABILITY_CLOSE_TIME}
+})
+def get_laboratories_availability():
+    """多实验室、多日期的占用位图（一次请求返回整周/整月视图）"""
+    try:
+        params = request.validated_params
+        try:
+            date_from = datetime.strptime(params['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(params.get('date_to') or params['date_from'], '%Y-%m-%d').date()
+            grid = SlotGrid(params['open_time'], params['close_time'], params['slot_minutes'])
+        except ValueError:
+            return error_response("日期或时间参数格式错误")
+        if date_to < date_from:
+            return error_response("结束日期不能早于开始日期")
+        if (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+            return error_response(f"查询范围不能超过{MAX_AVAILABILITY_DAYS}天")
+
+        lab_sql = "SELECT id, name, location, capacity, status FROM laboratories"
+        lab_params = []
+        if params.get('lab_ids'):
+            try:
+                lab_ids = sorted({int(x) for x in params['lab_ids'].split(',') if x.strip()})
+            except ValueError:
+                return error_response("lab_ids 格式错误")
+            if not lab_ids:
+                return error_response("lab_ids 格式错误")
+            lab_sql += " WHERE id IN ({})".format(','.join(['%s'] * len(lab_ids)))
+            lab_params = lab_ids
+        else:
+            lab_sql += " WHERE status IN ('active', 'available')"
+        lab_sql += " ORDER BY id"
+        lab_result = execute_query(lab_sql, tuple(lab_params))
+        if not lab_result['success']:
+            logger.error(f"查询实验室失败: {lab_result.get('error')}")
+            return error_response("获取可用性数据失败")
+        labs = lab_result['data']
+
+        dates = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+        bitmaps = get_availability([lab['id'] for lab in labs], dates, grid)
+
+        result = []
+        for lab in labs:
+            days = []
+            for d in dates:
+                bits = bitmaps[(lab['id'], d.isoformat())]
+                days.append({
+                    'date': d.isoformat(),
+                    'occupancy': SlotGrid.encode(bits, grid.size),
+                    'free_slots': grid.size - bin(bits).count('1')
+                })
+            result.append({
+                'laboratory_id': lab['id'],
+                'name': lab['name'],
+                'location': lab.get('location'),
+                'capacity': lab.get('capacity'),
+                'status': lab.get('status'),
+                'days': days
+            })
+
+        return success_response({
+            'slot_minutes': params['slot_minutes'],
+            'open_time': format_seconds(grid.open_seconds),
+            'close_time': format_seconds(grid.close_seconds),
+            'slots': grid.labels(),
+            'laboratories': result
+        }, "获取可用性数据成功")
+    except Exception as e:
+        logger.error(f"批量实验室可用性接口错误: {str(e)}")
+        return error_response("获取可用性数据失败")
+
+@laboratories_bp.route('/free-slots', methods=['GET'])
+@require_auth
+@validate_query_params({
+    'duration': {'required': True, 'type': 'integer', 'min_value': 5, 'max_value': 24 * 60},  # 分钟
+    'date_from': {'type': 'date_string'},
+    'date_to': {'type': 'date_string'},
+    'min_capacity': {'type': 'integer', 'min_value': 1},
+    'equipment': {'type': 'string', 'max_length': 500},  # 所需设备名称，逗号分隔，须全部具备且可用
+    'limit': {'type': 'integer', 'min_value': 1, 'max_value': 100, 'default': 10},
+    'slot_minutes': {'type': 'integer', 'min_value': 5, 'max_value': 240, 'default': AVAILABILITY_SLOT_MINUTES},
+    'open_time': {'type': 'string', 'default': AVAILABILITY_OPEN_TIME},
+    'close_time': {'type': 'string', 'default': AVAILABILITY_CLOSE_TIME}
+})
+def search_free_slots():
+    """跨实验室查找最早的 N 个空闲时段：一次查询筛选实验室，一次查询加载占用区间，位图上单遍扫描"""
+    try:
+        params = request.validated_params
+        now = datetime.now()
+        try:
+            date_from = datetime.strptime(params['date_from'], '%Y-%m-%d').date() if params.get('date_from') else now.date()
+            date_to = datetime.strptime(params['date_to'], '%Y-%m-%d').date() if params.get('date_to') else date_from + timedelta(days=6)
+            grid = SlotGrid(params['open_time'], params['close_time'], params['slot_minutes'])
+        except ValueError:
+            return error_response("日期或时间参数格式错误")
+        if date_to < date_from:
+            return error_response("结束日期不能早于开始日期")
+        if (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+            return error_response(f"查询范围不能超过{MAX_AVAILABILITY_DAYS}天")
+        date_from = max(date_from, now.date())
+
+        where = ["l.status IN ('active', 'available')"]
+        lab_params = []
+        if params.get('min_capacity'):
+            where.append('l.capacity >= %s')
+            lab_params.append(params['min_capacity'])
+        equipment_names = sorted({x.strip() for x in (params.get('equipment') or '').split(',') if x.strip()})
+        if equipment_names:
+            where.append(
+                "l.id IN (SELECT e.laboratory_id FROM equipment e "
+                "WHERE e.status = 'available' AND e.name IN ({}) "
+                "GROUP BY e.laboratory_id HAVING COUNT(DISTINCT e.name) = %s)".format(','.join(['%s'] * len(equipment_names)))
+            )
+            lab_params.extend(equipment_names)
+            lab_params.append(len(equipment_names))
+        lab_sql = (
+            "SELECT l.id, l.name, l.location, l.capacity FROM laboratories l "
+            "WHERE " + ' AND '.join(where) + " ORDER BY l.id"
+        )
+        lab_result = execute_query(lab_sql, tuple(lab_params))
+        if not lab_result['success']:
+            logger.error(f"查询候选实验室失败: {lab_result.get('error')}")
+            return error_response("查找空闲时段失败")
+
+        dates = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+        slots = find_free_slots(lab_result['data'], dates, params['duration'], grid,
+                                limit=params['limit'], not_before=now)
+
+        return success_response([{
+            'laboratory_id': lab['id'],
+            'laboratory_name': lab['name'],
+            'location': lab.get('location'),
+            'capacity': lab.get('capacity'),
+            'date': day,
+            'start_time': format_seconds(start),
+            'end_time': format_seconds(end)
+        } for day, start, end, lab in slots], "查找空闲时段成功")
+    except Exception as e:
+        logger.error(f"查找空闲时段接口错误: {str(e)}")
+        return error_response("查找空闲时段失败")
+
 @laboratories_bp.route('/<int:lab_id>/availability', methods=['GET'])
 @require_auth
 @validate_query_params({
@@ -260,46 +413,22 @@ def get_laboratory_availability(lab_id):
         if not lab_check['data']:
             return not_found_response("实验室不存在")
 
-        res_sql = (
-            "SELECT r.id, r.start_time, r.end_time, r.purpose, r.status, u.name AS user_name "
-            "FROM reservations r JOIN users u ON r.user_id = u.id "
-            "WHERE r.laboratory_id = %s AND r.reservation_date = %s AND r.status IN ('confirmed','pending')"
-        )
-        res_result = execute_query(res_sql, (lab_id, query_date))
-        if not res_result['success']:
-            logger.error(f"查询实验室可用性失败: {res_result.get('error')}")
-            return error_response("获取可用性数据失败")
-
-        reservations = res_result['data'] or []
-
-        def overlaps(slot_min, start_tm, end_tm):
-            try:
-                s = int(str(start_tm).split(":")[0]) * 60 + int(str(start_tm).split(":")[1])
-                e = int(str(end_tm).split(":")[0]) * 60 + int(str(end_tm).split(":")[1])
-                return s <= slot_min < e
-            except Exception:
-                return False
+        # 当天占用情况取自区间索引（缓存失效时自动回源数据库），按时间片位图判断
+        grid = SlotGrid()
+        day = reservation_index.day(lab_id, query_date)
+        bits = day.bitmap(grid)
 
         slots = []
-        start_hour = 8
-        end_hour = 22
-        cur = start_hour * 60
-        end_min = end_hour * 60
-        while cur < end_min:
-            hh = cur // 60
-            mm = cur % 60
-            label = f"{hh:02d}:{mm:02d}"
+        for i, label in enumerate(grid.labels()):
             occ = None
-            for r in reservations:
-                if overlaps(cur, r.get('start_time'), r.get('end_time')):
-                    occ = r
-                    break
+            if bits >> i & 1:
+                overlapping = day.overlapping(grid.slot_start(i), grid.slot_end(i))
+                occ = overlapping[0] if overlapping else None
             slots.append({
                 'time': label,
                 'available': False if occ else True,
-                'reservation_info': None if not occ else f"{occ.get('user_name')} {str(occ.get('start_time'))[:5]}-{str(occ.get('end_time'))[:5]} {occ.get('purpose')}",
+                'reservation_info': None if not occ else f"{occ.get('user_name')} {format_seconds(to_seconds(occ['start_time']))}-{format_seconds(to_seconds(occ['end_time']))} {occ.get('purpose')}",
             })
-            cur += 30
 
         return success_response(slots, "获取可用性数据成功")
     except Exception as e:
@@ -346,10 +475,7 @@ def create_laboratory():
                 return not_found_response("负责人用户不存在")
 
         # 插入新实验室（兼容无 manager_id 列的旧库）
-        has_manager_col = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='laboratories' AND COLUMN_NAME='manager_id' LIMIT 1"
-        )
-        can_set_manager = has_manager_col.get('success') and bool(has_manager_col.get('data'))
+        can_set_manager = schema_registry.has_column('laboratories', 'manager_id')
         if can_set_manager:
             insert_sql = (
                 "INSERT INTO laboratories (name, location, capacity, description, status, manager_id, created_at) "
@@ -475,10 +601,7 @@ def update_laboratory(lab_id):
                 if not (user_check['success'] and user_check['data']):
                     return not_found_response("负责人用户不存在")
             # 检查列存在
-            has_manager_col = execute_query(
-                "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='laboratories' AND COLUMN_NAME='manager_id' LIMIT 1"
-            )
-            if has_manager_col.get('success') and has_manager_col.get('data'):
+            if schema_registry.has_column('laboratories', 'manager_id'):
                 update_fields.append('manager_id = %s')
                 update_values.append(manager_id)
         
@@ -499,10 +622,7 @@ def update_laboratory(lab_id):
         
         # 获取更新后的实验室信息
         # 返回更新后的信息（含负责人名称，若支持）
-        has_manager_col = execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='laboratories' AND COLUMN_NAME='manager_id' LIMIT 1"
-        )
-        join_manager = has_manager_col.get('success') and bool(has_manager_col.get('data'))
+        join_manager = schema_registry.has_column('laboratories', 'manager_id')
         if join_manager:
             lab_sql = (
                 "SELECT l.id, l.name, l.location, l.capacity, l.description, l.status, l.created_at, l.updated_at, l.manager_id, u.name AS manager_name "
@@ -7,11 +7,11 @@
 
 from flask import Blueprint, request
 from datetime import datetime, date
-from backend.database import execute_query, execute_update, execute_paginated_query, execute_transaction
+from backend.database import execute_query, execute_update, execute_paginated_query, execute_transaction, execute_parallel
 from app.utils import (
     require_auth, require_role, validate_json_data, validate_query_params,
     success_response, error_response, not_found_response,
-    paginated_response, created_response, updated_response, deleted_response
+    paginated_response, created_response, updated_response, deleted_response, single_flight
 )
 import logging
 
@@ -64,6 +64,7 @@ def _map_record(row):
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 20},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'keyword': {'type': 'string', 'max_length': 100},
     'equipment_id': {'type': 'integer', 'min_value': 1},
     'type': {'type': 'string', 'choices': ['maintenance', 'repair', 'upgrade']},
@@ -129,7 +130,7 @@ def list_maintenance_records():
 
         base_sql += ' ORDER BY r.start_time DESC, r.id DESC'
 
-        result = execute_paginated_query(base_sql, tuple(qparams), page, page_size)
+        result = execute_paginated_query(base_sql, tuple(qparams), page, page_size, count=params['count'])
         if not result['success']:
             logger.error(f"查询维修记录失败: {result.get('error')}")
             return error_response('获取维修记录失败')
@@ -369,30 +370,35 @@ def delete_maintenance_record(record_id):
         return error_response('删除维修记录失败')
 
 
-@maintenance_bp.route('/stats', methods=['GET'])
-@require_auth
-@require_role(['admin', 'teacher'])
-def maintenance_statistics():
-    try:
+def build_maintenance_statistics():
+    """维修统计（/stats 与看板共用）"""
+    results = execute_parallel({
         # 总数
-        total_res = execute_query("SELECT COUNT(*) AS cnt FROM equipment_repair")
+        'total': "SELECT COUNT(*) AS cnt FROM equipment_repair",
         # 进行中（含 reported）
-        in_progress_res = execute_query(
-            "SELECT COUNT(*) AS cnt FROM equipment_repair WHERE repair_status IN ('reported', 'in_progress')"
-        )
+        'in_progress': "SELECT COUNT(*) AS cnt FROM equipment_repair WHERE repair_status IN ('reported', 'in_progress')",
         # 本月启动数量
-        month_res = execute_query(
-            "SELECT COUNT(*) AS cnt FROM equipment_repair WHERE YEAR(start_time) = YEAR(CURDATE()) AND MONTH(start_time) = MONTH(CURDATE())"
-        )
+        'month': "SELECT COUNT(*) AS cnt FROM equipment_repair WHERE YEAR(start_time) = YEAR(CURDATE()) AND MONTH(start_time) = MONTH(CURDATE())",
         # 总费用
-        cost_res = execute_query("SELECT COALESCE(SUM(repair_cost), 0) AS total_cost FROM equipment_repair")
+        'cost': "SELECT COALESCE(SUM(repair_cost), 0) AS total_cost FROM equipment_repair"
+    })
+    total_res, in_progress_res = results['total'], results['in_progress']
+    month_res, cost_res = results['month'], results['cost']
 
-        stats = {
-            'total': (total_res['data'][0]['cnt'] if total_res['success'] and total_res['data'] else 0),
-            'inProgress': (in_progress_res['data'][0]['cnt'] if in_progress_res['success'] and in_progress_res['data'] else 0),
-            'thisMonth': (month_res['data'][0]['cnt'] if month_res['success'] and month_res['data'] else 0),
-            'totalCost': float(cost_res['data'][0]['total_cost'] if cost_res['success'] and cost_res['data'] else 0)
-        }
+    return {
+        'total': (total_res['data'][0]['cnt'] if total_res['success'] and total_res['data'] else 0),
+        'inProgress': (in_progress_res['data'][0]['cnt'] if in_progress_res['success'] and in_progress_res['data'] else 0),
+        'thisMonth': (month_res['data'][0]['cnt'] if month_res['success'] and month_res['data'] else 0),
+        'totalCost': float(cost_res['data'][0]['total_cost'] if cost_res['success'] and cost_res['data'] else 0)
+    }
+
+@maintenance_bp.route('/stats', methods=['GET'])
+@require_auth
+@require_role(['admin', 'teacher'])
+@single_flight()
+def maintenance_statistics():
+    try:
+        stats = build_maintenance_statistics()
         return success_response(stats, '获取维修统计成功')
     except Exception as e:
         logger.error(f"维修统计接口错误: {str(e)}")
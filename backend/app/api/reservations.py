@@ -5,31 +5,89 @@
 """
 
 from flask import Blueprint, request
-from backend.database import execute_query, execute_update, execute_paginated_query, execute_transaction
+from backend.database import execute_query, execute_update, execute_paginated_query, execute_transaction, execute_batch, execute_parallel, iter_query, transaction
+from app.models.schedule import reservation_index
 from app.utils import (
-    require_auth, require_role, validate_json_data, validate_query_params,
+    require_auth, require_role, validate_json_data, validate_query_params, read_optional_json,
     success_response, error_response, not_found_response, conflict_response,
-    paginated_response, created_response, updated_response, deleted_response
+    paginated_response, created_response, updated_response, deleted_response, single_flight
 )
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 
 logger = logging.getLogger(__name__)
 
 # 创建蓝图
 reservations_bp = Blueprint('reservations', __name__)
 
+# 系列预约单次最多生成的预约数
+MAX_SERIES_OCCURRENCES = 100
+
+# 预约列表的游标分页排序键（与列表 ORDER BY 一致，id 保证唯一）
+RESERVATION_KEYSET = [('reservation_date', 'DESC'), ('start_time', 'DESC'), ('id', 'DESC')]
+
+def _parse_equipment_ids(value):
+    """解析 reservations.equipment_ids（逗号分隔字符串）为整数列表"""
+    if not value:
+        return []
+    return [int(x) for x in str(value).split(',') if x.strip().isdigit()]
+
+def _load_equipment(rows, fields=('id', 'name', 'model')):
+    """一次查询取回一页预约涉及的全部设备，返回 {预约id: [设备信息, ...]}（按 equipment_ids 原顺序）"""
+    ids_by_row = {row['id']: _parse_equipment_ids(row.get('equipment_ids')) for row in rows}
+    all_ids = sorted({eq_id for ids in ids_by_row.values() for eq_id in ids})
+    equipment_map = {}
+    if all_ids:
+        equipment_sql = "SELECT {} FROM equipment WHERE id IN ({})".format(
+            ', '.join(fields), ','.join(['%s'] * len(all_ids))
+        )
+        equipment_result = execute_query(equipment_sql, tuple(all_ids))
+        if equipment_result['success']:
+            equipment_map = {eq['id']: {f: eq[f] for f in fields} for eq in equipment_result['data']}
+        else:
+            logger.error(f"批量查询预约设备失败: {equipment_result.get('error')}")
+    return {
+        row_id: [equipment_map[eq_id] for eq_id in ids if eq_id in equipment_map]
+        for row_id, ids in ids_by_row.items()
+    }
+
+def _lock_laboratory(laboratory_id):
+    """在当前事务中锁定实验室行（SELECT ... FOR UPDATE），串行化同一实验室的预约写入"""
+    return execute_query(
+        "SELECT id, name, status FROM laboratories WHERE id = %s FOR UPDATE",
+        (laboratory_id,)
+    )
+
+def _invalidate_schedule(reservation):
+    """预约写入后让区间索引中该实验室当天的缓存失效"""
+    reservation_index.invalidate(reservation['laboratory_id'], reservation['reservation_date'])
+
+def _sync_reservation_equipment(reservation_id, equipment_ids, replace=True):
+    """以预约的设备列表重建 reservation_equipment 关联（replace=False 时只插入，用于新建预约）"""
+    result = {'success': True}
+    if replace:
+        result = execute_update("DELETE FROM reservation_equipment WHERE reservation_id = %s", (reservation_id,))
+    if not result['success'] or not equipment_ids:
+        return result
+    return execute_batch(
+        "INSERT INTO reservation_equipment (reservation_id, equipment_id) VALUES (%s, %s)",
+        [(reservation_id, eq_id) for eq_id in equipment_ids]
+    )
+
 @reservations_bp.route('', methods=['GET'])
 @require_auth
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'laboratory_id': {'type': 'integer', 'min_value': 1},
     'user_id': {'type': 'integer', 'min_value': 1},
     'status': {'type': 'string', 'choices': ['pending', 'confirmed', 'cancelled', 'completed']},
     'date_from': {'type': 'string'},  # YYYY-MM-DD格式
     'date_to': {'type': 'string'},    # YYYY-MM-DD格式
-    'search': {'type': 'string', 'max_length': 100}
+    'search': {'type': 'string', 'max_length': 100},
+    'pagination': {'type': 'string', 'choices': ['page', 'cursor'], 'default': 'page'},
+    'cursor': {'type': 'string', 'max_length': 500}
 })
 def get_reservations():
     """获取预约列表"""
@@ -92,38 +150,26 @@ def get_reservations():
         if where_conditions:
             base_sql += ' WHERE ' + ' AND '.join(where_conditions)
         
-        base_sql += ' ORDER BY r.reservation_date DESC, r.start_time DESC'
+        base_sql += ' ORDER BY r.reservation_date DESC, r.start_time DESC, r.id DESC'
         
-        # 执行分页查询
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        # 执行分页查询（传入 cursor 或 pagination=cursor 时使用游标分页）
+        if params.get('cursor') or params.get('pagination') == 'cursor':
+            result = execute_paginated_query(base_sql, tuple(query_params), page_size=page_size,
+                                             keyset=RESERVATION_KEYSET, cursor=params.get('cursor'))
+        else:
+            result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'])
         
         if not result['success']:
+            if result.get('code') == 'INVALID_CURSOR':
+                return error_response(result['error'], 'INVALID_CURSOR')
             logger.error(f"查询预约列表失败: {result.get('error')}")
             return error_response("获取预约列表失败")
         
-        # 格式化数据
+        # 格式化数据（整页设备一次批量查询）
+        equipment_by_reservation = _load_equipment(result['data'])
         reservations = []
         for reservation in result['data']:
-            # 获取设备信息
-            equipment_list = []
-            if reservation['equipment_ids']:
-                equipment_ids = reservation['equipment_ids'].split(',')
-                if equipment_ids and equipment_ids[0]:  # 确保不是空字符串
-                    equipment_sql = """
-                    SELECT id, name, model
-                    FROM equipment
-                    WHERE id IN ({})
-                    """.format(','.join(['%s'] * len(equipment_ids)))
-                    
-                    equipment_result = execute_query(equipment_sql, tuple(equipment_ids))
-                    if equipment_result['success']:
-                        for eq in equipment_result['data']:
-                            equipment_list.append({
-                                'id': eq['id'],
-                                'name': eq['name'],
-                                'model': eq['model']
-                            })
-            
+            equipment_list = equipment_by_reservation.get(reservation['id'], [])
             reservations.append({
                 'id': reservation['id'],
                 'reservation_date': reservation['reservation_date'].isoformat() if reservation['reservation_date'] else None,
@@ -157,10 +203,13 @@ def get_reservations():
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'status': {'type': 'string', 'choices': ['pending', 'confirmed', 'cancelled', 'completed']},
     'date_from': {'type': 'string'},
     'date_to': {'type': 'string'},
-    'search': {'type': 'string', 'max_length': 100}
+    'search': {'type': 'string', 'max_length': 100},
+    'pagination': {'type': 'string', 'choices': ['page', 'cursor'], 'default': 'page'},
+    'cursor': {'type': 'string', 'max_length': 500}
 })
 def get_my_reservations():
     """获取当前用户的预约列表（兼容前端 /reservations/my）"""
@@ -204,13 +253,20 @@ def get_my_reservations():
         if where_conditions:
             base_sql += ' WHERE ' + ' AND '.join(where_conditions)
 
-        base_sql += ' ORDER BY r.reservation_date DESC, r.start_time DESC'
+        base_sql += ' ORDER BY r.reservation_date DESC, r.start_time DESC, r.id DESC'
 
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        if params.get('cursor') or params.get('pagination') == 'cursor':
+            result = execute_paginated_query(base_sql, tuple(query_params), page_size=page_size,
+                                             keyset=RESERVATION_KEYSET, cursor=params.get('cursor'))
+        else:
+            result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'])
         if not result['success']:
+            if result.get('code') == 'INVALID_CURSOR':
+                return error_response(result['error'], 'INVALID_CURSOR')
             logger.error(f"查询我的预约失败: {result.get('error')}")
             return error_response("获取预约列表失败")
 
+        equipment_by_reservation = _load_equipment(result['data'])
         reservations = []
         for r in result['data']:
             reservations.append({
@@ -221,6 +277,7 @@ def get_my_reservations():
                 'purpose': r['purpose'],
                 'status': r['status'],
                 'equipment_ids': r['equipment_ids'],
+                'equipment': equipment_by_reservation.get(r['id'], []),
                 'laboratory': {
                     'name': r['laboratory_name'],
                     'location': r['laboratory_location']
@@ -273,25 +330,7 @@ def get_reservation(reservation_id):
         reservation = result['data'][0]
         
         # 获取设备信息
-        equipment_list = []
-        if reservation['equipment_ids']:
-            equipment_ids = reservation['equipment_ids'].split(',')
-            if equipment_ids and equipment_ids[0]:  # 确保不是空字符串
-                equipment_sql = """
-                SELECT id, name, model, status
-                FROM equipment
-                WHERE id IN ({})
-                """.format(','.join(['%s'] * len(equipment_ids)))
-                
-                equipment_result = execute_query(equipment_sql, tuple(equipment_ids))
-                if equipment_result['success']:
-                    for eq in equipment_result['data']:
-                        equipment_list.append({
-                            'id': eq['id'],
-                            'name': eq['name'],
-                            'model': eq['model'],
-                            'status': eq['status']
-                        })
+        equipment_list = _load_equipment([reservation], ('id', 'name', 'model', 'status'))[reservation['id']]
         
         reservation_info = {
             'id': reservation['id'],
@@ -360,15 +399,16 @@ def create_reservation():
         except ValueError:
             return error_response("时间格式错误，请使用HH:MM格式")
         
-        # 检查实验室是否存在且可用
-        lab_check_sql = "SELECT id, name, status FROM laboratories WHERE id = %s"
-        lab_result = execute_query(lab_check_sql, (laboratory_id,))
-        
-        logger.info(f"实验室查询SQL: {lab_check_sql}")
-        logger.info(f"实验室查询参数: {laboratory_id}")
-        logger.info(f"实验室查询结果: {lab_result}")
-        
-        try:
+        # 兼容不同的用户ID字段
+        user_id = current_user.get('id') or current_user.get('user_id')
+        if not user_id:
+            logger.error(f"当前用户信息缺少ID字段: {current_user}")
+            return error_response("用户信息异常，请重新登录")
+
+        # 冲突检查、设备校验与两次插入在同一事务内完成；
+        # 先锁定实验室行，使同一实验室的并发预约串行化，避免同一时段被重复预约
+        with transaction():
+            lab_result = _lock_laboratory(laboratory_id)
             if not lab_result['success']:
                 logger.error(f"实验室查询失败: {lab_result.get('error')}")
                 return error_response("创建预约失败，请稍后重试")
@@ -378,117 +418,66 @@ def create_reservation():
                 return error_response("指定的实验室不存在")
             
             lab = lab_result['data'][0]
-            logger.info(f"实验室数据: {lab}")
-            logger.info(f"实验室数据类型: {type(lab)}")
-            logger.info(f"实验室数据键: {list(lab.keys()) if isinstance(lab, dict) else '不是字典'}")
-            
-            # 检查实验室数据格式
-            if not isinstance(lab, dict):
-                logger.error(f"实验室数据不是字典格式: {lab}")
-                return error_response("实验室数据格式错误")
-                
-            if 'status' not in lab:
-                logger.error(f"实验室数据缺少status字段: {lab}")
-                return error_response("实验室数据格式错误")
-            
             # 兼容两种可用状态：active（后端新定义）与 available（实验室可用性接口使用）
             if lab['status'] != 'active' and lab['status'] != 'available':
                 logger.error(f"实验室状态不可用: {lab['status']}")
                 return error_response(f"实验室当前状态为'{lab['status']}'，无法预约")
+            
+            # 检查时间冲突：持有实验室锁时从数据库重新加载当天区间，再在区间索引中查找重叠
+            conflicts = reservation_index.find_conflicts(laboratory_id, reservation_date, start_time, end_time, fresh=True)
+            if conflicts:
+                logger.info(f"发现时间冲突: {[c['id'] for c in conflicts]}")
+                return conflict_response("该时间段已被预约")
+            
+            # 验证设备
+            equipment_ids_str = ""
+            if equipment_ids:
+                # 检查设备是否存在且属于该实验室（共享锁，防止事务提交前设备状态被修改）
+                equipment_check_sql = """
+                SELECT id FROM equipment
+                WHERE id IN ({}) AND laboratory_id = %s AND status = 'available'
+                LOCK IN SHARE MODE
+                """.format(','.join(['%s'] * len(equipment_ids)))
                 
-        except Exception as e:
-            logger.error(f"检查实验室时发生异常: {str(e)}, 结果: {lab_result}")
-            return error_response("创建预约失败，请稍后重试")
-        
-        # 检查时间冲突
-        conflict_sql = """
-        SELECT id FROM reservations
-        WHERE laboratory_id = %s 
-        AND reservation_date = %s 
-        AND status IN ('confirmed', 'pending')
-        AND ((start_time <= %s AND end_time > %s) 
-             OR (start_time < %s AND end_time >= %s) 
-             OR (start_time >= %s AND end_time <= %s))
-        """
-        conflict_result = execute_query(conflict_sql, (
-            laboratory_id, reservation_date, start_time, start_time,
-            end_time, end_time, start_time, end_time
-        ))
-        
-        logger.info(f"时间冲突检查结果: {conflict_result}")
-        
-        if not conflict_result['success']:
-            logger.error(f"时间冲突查询失败: {conflict_result.get('error')}")
-            return error_response("创建预约失败，请稍后重试")
-        
-        if conflict_result['data']:
-            logger.error(f"发现时间冲突: {conflict_result['data']}")
-            return conflict_response("该时间段已被预约")
-        
-        # 验证设备
-        equipment_ids_str = ""
-        if equipment_ids:
-            # 检查设备是否存在且属于该实验室
-            equipment_check_sql = """
-            SELECT id FROM equipment
-            WHERE id IN ({}) AND laboratory_id = %s AND status = 'available'
-            """.format(','.join(['%s'] * len(equipment_ids)))
+                equipment_params = list(equipment_ids) + [laboratory_id]
+                equipment_result = execute_query(equipment_check_sql, tuple(equipment_params))
+                
+                if not equipment_result['success']:
+                    return error_response("创建预约失败，请稍后重试")
+                
+                if len(equipment_result['data']) != len(equipment_ids):
+                    return error_response("部分设备不存在或不可用")
+                
+                equipment_ids_str = ','.join(map(str, equipment_ids))
             
-            equipment_params = list(equipment_ids) + [laboratory_id]
-            equipment_result = execute_query(equipment_check_sql, tuple(equipment_params))
+            # 创建预约
+            insert_sql = """
+            INSERT INTO reservations (user_id, laboratory_id, reservation_date, start_time, 
+                                    end_time, purpose, participant_count, equipment_ids, status, notes, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            """
+            
+            # 所有预约均需审核，默认状态为待审核
+            status = 'pending'
+
+            insert_result = execute_update(insert_sql, (
+                user_id, laboratory_id, reservation_date, start_time,
+                end_time, purpose, int(data.get('participant_count') or 1), equipment_ids_str, status, (data.get('remarks') or None)
+            ))
             
-            if not equipment_result['success']:
+            if not insert_result['success']:
+                logger.error(f"创建预约失败: {insert_result.get('error')}")
                 return error_response("创建预约失败，请稍后重试")
             
-            if len(equipment_result['data']) != len(equipment_ids):
-                return error_response("部分设备不存在或不可用")
+            reservation_id = insert_result['last_insert_id']
+            reservation_index.invalidate(laboratory_id, reservation_date)
             
-            equipment_ids_str = ','.join(map(str, equipment_ids))
-        
-        # 创建预约
-        insert_sql = """
-        INSERT INTO reservations (user_id, laboratory_id, reservation_date, start_time, 
-                                end_time, purpose, participant_count, equipment_ids, status, notes, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-        """
-        
-        # 所有预约均需审核，默认状态为待审核
-        status = 'pending'
-
-        # 兼容不同的用户ID字段
-        user_id = current_user.get('id') or current_user.get('user_id')
-        if not user_id:
-            logger.error(f"当前用户信息缺少ID字段: {current_user}")
-            return error_response("用户信息异常，请重新登录")
-
-        insert_result = execute_update(insert_sql, (
-            user_id, laboratory_id, reservation_date, start_time,
-            end_time, purpose, int(data.get('participant_count') or 1), equipment_ids_str, status, (data.get('remarks') or None)
-        ))
-        
-        logger.info(f"预约插入结果: {insert_result}")
-        
-        if not insert_result['success']:
-            logger.error(f"创建预约失败: {insert_result.get('error')}")
-            return error_response("创建预约失败，请稍后重试")
-        
-        # 获取新创建的预约信息
-        reservation_id = insert_result['last_insert_id']
-        
-        # 同步插入 reservation_equipment 表
-        if equipment_ids:
-            try:
-                # 构建批量插入SQL
-                vals = []
-                for eq_id in equipment_ids:
-                    vals.append(f"({reservation_id}, {eq_id})")
-                
-                if vals:
-                    eq_insert_sql = f"INSERT INTO reservation_equipment (reservation_id, equipment_id) VALUES {','.join(vals)}"
-                    execute_update(eq_insert_sql)
-            except Exception as e:
-                # 记录错误但不中断流程，因为主预约已创建且 equipment_ids 字段已保存
-                logger.error(f"插入reservation_equipment失败: {str(e)}")
+            # 同步插入 reservation_equipment 表（失败时整个预约回滚）
+            if equipment_ids:
+                eq_result = _sync_reservation_equipment(reservation_id, equipment_ids, replace=False)
+                if not eq_result['success']:
+                    logger.error(f"插入reservation_equipment失败: {eq_result.get('error')}")
+                    return error_response("创建预约失败，请稍后重试")
 
         reservation_sql = """
         SELECT r.id, r.reservation_date, r.start_time, r.end_time, r.purpose, 
@@ -500,28 +489,12 @@ def create_reservation():
         """
         reservation_result = execute_query(reservation_sql, (reservation_id,))
         
+        reservation_info = None
         if reservation_result['success'] and reservation_result['data']:
             reservation = reservation_result['data'][0]
             
             # 获取设备信息
-            equipment_list = []
-            if reservation['equipment_ids']:
-                equipment_ids_list = reservation['equipment_ids'].split(',')
-                if equipment_ids_list and equipment_ids_list[0]:
-                    equipment_sql = """
-                    SELECT id, name, model
-                    FROM equipment
-                    WHERE id IN ({})
-                    """.format(','.join(['%s'] * len(equipment_ids_list)))
-                    
-                    equipment_result = execute_query(equipment_sql, tuple(equipment_ids_list))
-                    if equipment_result['success']:
-                        for eq in equipment_result['data']:
-                            equipment_list.append({
-                                'id': eq['id'],
-                                'name': eq['name'],
-                                'model': eq['model']
-                            })
+            equipment_list = _load_equipment([reservation])[reservation['id']]
             
             reservation_info = {
                 'id': reservation['id'],
@@ -542,13 +515,193 @@ def create_reservation():
         message = "预约创建成功，等待审核"
         return created_response(reservation_info, message)
         
-        message = "预约创建成功，等待审核"
-        return created_response(None, message)
-        
     except Exception as e:
         logger.error(f"创建预约接口错误: {str(e)}")
         return error_response("创建预约失败，请稍后重试")
 
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"日期格式错误: {value}")
+
+def _series_dates(data):
+    """展开系列预约的日期：显式 dates 列表，或按周规则（start_date ~ end_date、weekdays、interval、count）生成"""
+    if data.get('dates'):
+        return sorted({_parse_date(d) for d in data['dates']})
+    if not data.get('start_date') or not data.get('weekdays'):
+        raise ValueError("请提供 dates，或 start_date 与 weekdays")
+    start = _parse_date(data['start_date'])
+    end = _parse_date(data['end_date']) if data.get('end_date') else None
+    count = data.get('count')
+    if end is None and not count:
+        raise ValueError("按周规则预约需提供 end_date 或 count")
+    try:
+        weekdays = {int(w) for w in data['weekdays']}
+    except (TypeError, ValueError):
+        raise ValueError("weekdays 取值应为 1-7（周一至周日）")
+    if not weekdays or not weekdays <= set(range(1, 8)):
+        raise ValueError("weekdays 取值应为 1-7（周一至周日）")
+    interval = data.get('interval') or 1
+    week_start = start - timedelta(days=start.weekday())
+    dates = []
+    current = start
+    while (end is None or current <= end) and (not count or len(dates) < count):
+        if current.isoweekday() in weekdays and ((current - week_start).days // 7) % interval == 0:
+            dates.append(current)
+        if len(dates) > MAX_SERIES_OCCURRENCES:
+            break
+        current += timedelta(days=1)
+    return dates
+
+@reservations_bp.route('/series', methods=['POST'])
+@require_auth
+@require_role(['admin', 'teacher'])
+@validate_json_data({
+    'laboratory_id': {'required': True, 'type': 'integer', 'min_value': 1},
+    'start_time': {'required': True, 'type': 'string'},  # HH:MM格式
+    'end_time': {'required': True, 'type': 'string'},    # HH:MM格式
+    'purpose': {'required': True, 'type': 'string', 'min_length': 1, 'max_length': 500},
+    'participant_count': {'required': False, 'type': 'integer', 'min_value': 1},
+    'remarks': {'required': False, 'type': 'string', 'max_length': 500},
+    'equipment_ids': {'required': False, 'type': 'list'},
+    'dates': {'required': False, 'type': 'list'},          # 显式日期列表 YYYY-MM-DD
+    'start_date': {'required': False, 'type': 'date_string'},
+    'end_date': {'required': False, 'type': 'date_string'},
+    'weekdays': {'required': False, 'type': 'list'},       # 1-7，周一至周日
+    'interval': {'required': False, 'type': 'integer', 'min_value': 1, 'max_value': 4},  # 每隔几周
+    'count': {'required': False, 'type': 'integer', 'min_value': 1, 'max_value': MAX_SERIES_OCCURRENCES},
+    'mode': {'required': False, 'type': 'string', 'choices': ['all_or_nothing', 'best_effort']}
+})
+def create_reservation_series():
+    """系列预约：一次校验实验室与设备，一次查询检查所有日期的冲突，批量插入"""
+    try:
+        data = request.validated_data
+        current_user = request.current_user
+        laboratory_id = data['laboratory_id']
+        start_time = data['start_time']
+        end_time = data['end_time']
+        equipment_ids = data.get('equipment_ids') or []
+        mode = data.get('mode') or 'all_or_nothing'
+
+        user_id = current_user.get('id') or current_user.get('user_id')
+        if not user_id:
+            return error_response("用户信息异常，请重新登录")
+
+        try:
+            start_clock = datetime.strptime(start_time, "%H:%M").time()
+            end_clock = datetime.strptime(end_time, "%H:%M").time()
+        except ValueError:
+            return error_response("时间格式错误，请使用HH:MM格式")
+        try:
+            dates = _series_dates(data)
+        except ValueError as e:
+            return error_response(str(e))
+        if start_clock >= end_clock:
+            return error_response("结束时间必须晚于开始时间")
+        if not dates:
+            return error_response("没有符合规则的预约日期")
+        if len(dates) > MAX_SERIES_OCCURRENCES:
+            return error_response(f"单次系列预约最多{MAX_SERIES_OCCURRENCES}次")
+
+        now = datetime.now()
+        occurrences = {d: {'date': d.isoformat(), 'status': 'pending_check'} for d in dates}
+        for d in dates:
+            if datetime.combine(d, start_clock) <= now:
+                occurrences[d].update(status='rejected', reason='预约时间不能是过去的时间')
+
+        with transaction():
+            lab_result = _lock_laboratory(laboratory_id)
+            if not lab_result['success']:
+                return error_response("创建预约失败，请稍后重试")
+            if not lab_result['data']:
+                return error_response("指定的实验室不存在")
+            lab = lab_result['data'][0]
+            if lab['status'] != 'active' and lab['status'] != 'available':
+                return error_response(f"实验室当前状态为'{lab['status']}'，无法预约")
+
+            equipment_ids_str = ""
+            if equipment_ids:
+                equipment_check_sql = """
+                SELECT id FROM equipment
+                WHERE id IN ({}) AND laboratory_id = %s AND status = 'available'
+                LOCK IN SHARE MODE
+                """.format(','.join(['%s'] * len(equipment_ids)))
+                equipment_result = execute_query(equipment_check_sql, tuple(equipment_ids) + (laboratory_id,))
+                if not equipment_result['success']:
+                    return error_response("创建预约失败，请稍后重试")
+                if len(equipment_result['data']) != len(equipment_ids):
+                    return error_response("部分设备不存在或不可用")
+                equipment_ids_str = ','.join(map(str, equipment_ids))
+
+            # 一次查询加载整个日期范围内该实验室的有效预约，再逐日在区间索引中查找重叠
+            candidates = [d for d in dates if occurrences[d]['status'] == 'pending_check']
+            days = reservation_index.get_days([laboratory_id], candidates, fresh=True)
+            for d in candidates:
+                conflicts = days[(laboratory_id, d.isoformat())].overlapping(start_time, end_time)
+                if conflicts:
+                    occurrences[d].update(status='rejected', reason='该时间段已被预约',
+                                          conflicts=[c['id'] for c in conflicts])
+                else:
+                    occurrences[d]['status'] = 'created'
+
+            to_create = [d for d in dates if occurrences[d]['status'] == 'created']
+            rejected = len(dates) - len(to_create)
+            if rejected and mode == 'all_or_nothing':
+                for d in to_create:
+                    occurrences[d]['status'] = 'not_created'
+                return error_response(f"{rejected}个日期无法预约，未创建任何预约", 'CONFLICT', 409,
+                                      data={'occurrences': list(occurrences.values())})
+            if not to_create:
+                return error_response("所有日期均无法预约", 'CONFLICT', 409,
+                                      data={'occurrences': list(occurrences.values())})
+
+            insert_result = execute_batch(
+                "INSERT INTO reservations (user_id, laboratory_id, reservation_date, start_time, "
+                "end_time, purpose, participant_count, equipment_ids, status, notes) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                [(user_id, laboratory_id, d, start_time, end_time, data['purpose'],
+                  int(data.get('participant_count') or 1), equipment_ids_str, 'pending',
+                  (data.get('remarks') or None)) for d in to_create]
+            )
+            if not insert_result['success']:
+                logger.error(f"批量创建预约失败: {insert_result.get('error')}")
+                return error_response("创建预约失败，请稍后重试")
+
+            # 持有实验室锁且已排除冲突，(实验室, 日期, 开始时间) 在有效预约中唯一，可据此取回新 id
+            id_sql = """
+            SELECT id, reservation_date FROM reservations
+            WHERE laboratory_id = %s AND user_id = %s AND start_time = %s AND status = 'pending'
+            AND reservation_date IN ({})
+            """.format(','.join(['%s'] * len(to_create)))
+            id_result = execute_query(id_sql, (laboratory_id, user_id, start_time) + tuple(to_create))
+            if not id_result['success']:
+                return error_response("创建预约失败，请稍后重试")
+            for row in id_result['data']:
+                occurrences[row['reservation_date']]['reservation_id'] = row['id']
+
+            if equipment_ids:
+                eq_result = execute_batch(
+                    "INSERT INTO reservation_equipment (reservation_id, equipment_id) VALUES (%s, %s)",
+                    [(row['id'], eq_id) for row in id_result['data'] for eq_id in equipment_ids]
+                )
+                if not eq_result['success']:
+                    logger.error(f"插入reservation_equipment失败: {eq_result.get('error')}")
+                    return error_response("创建预约失败，请稍后重试")
+
+            reservation_index.invalidate(laboratory_id)
+
+        return created_response({
+            'requested': len(dates),
+            'created': len(to_create),
+            'rejected': len(dates) - len(to_create),
+            'occurrences': list(occurrences.values())
+        }, f"已创建{len(to_create)}个预约，等待审核")
+
+    except Exception as e:
+        logger.error(f"系列预约接口错误: {str(e)}")
+        return error_response("创建预约失败，请稍后重试")
+
 @reservations_bp.route('/<int:reservation_id>', methods=['PUT'])
 @require_auth
 @validate_json_data({
@@ -613,28 +766,6 @@ def update_reservation(reservation_id):
                     
             except ValueError:
                 return error_response("时间格式错误")
-            
-            # 检查时间冲突（排除当前预约）
-            conflict_sql = """
-            SELECT id FROM reservations
-            WHERE laboratory_id = %s 
-            AND reservation_date = %s 
-            AND status IN ('confirmed', 'pending')
-            AND id != %s
-            AND ((start_time <= %s AND end_time > %s) 
-                 OR (start_time < %s AND end_time >= %s) 
-                 OR (start_time >= %s AND end_time <= %s))
-            """
-            conflict_result = execute_query(conflict_sql, (
-                reservation['laboratory_id'], new_date, reservation_id,
-                new_start, new_start, new_end, new_end, new_start, new_end
-            ))
-            
-            if not conflict_result['success']:
-                return error_response("更新失败，请稍后重试")
-            
-            if conflict_result['data']:
-                return conflict_response("该时间段已被预约")
         
         if 'reservation_date' in data:
             update_fields.append('reservation_date = %s')
@@ -692,33 +823,33 @@ def update_reservation(reservation_id):
         update_fields.append('updated_at = NOW()')
         update_values.append(reservation_id)
         
-        # 执行更新
+        # 执行更新：冲突检查、预约信息与设备关联在同一事务内提交
         update_sql = f"UPDATE reservations SET {', '.join(update_fields)} WHERE id = %s"
-        update_result = execute_update(update_sql, tuple(update_values))
+        with transaction():
+            if 'reservation_date' in data or 'start_time' in data or 'end_time' in data:
+                # 与创建预约相同：锁定实验室后基于最新区间检查冲突（排除当前预约）
+                lab_result = _lock_laboratory(reservation['laboratory_id'])
+                if not lab_result['success']:
+                    return error_response("更新失败，请稍后重试")
+                conflicts = reservation_index.find_conflicts(
+                    reservation['laboratory_id'], new_date, new_start, new_end,
+                    exclude_id=reservation_id, fresh=True
+                )
+                if conflicts:
+                    return conflict_response("该时间段已被预约")
+            
+            update_result = execute_update(update_sql, tuple(update_values))
+            if update_result['success'] and 'equipment_ids' in data:
+                update_result = _sync_reservation_equipment(reservation_id, data['equipment_ids'])
+            if update_result['success']:
+                _invalidate_schedule(reservation)
+                if str(new_date) != str(reservation['reservation_date']):
+                    reservation_index.invalidate(reservation['laboratory_id'], new_date)
         
         if not update_result['success']:
             logger.error(f"更新预约信息失败: {update_result.get('error')}")
             return error_response("更新失败，请稍后重试")
         
-        # 如果更新了设备，同步 reservation_equipment 表
-        if 'equipment_ids' in data:
-            try:
-                # 1. 删除旧关联
-                execute_update("DELETE FROM reservation_equipment WHERE reservation_id = %s", (reservation_id,))
-                
-                # 2. 插入新关联
-                equipment_ids = data['equipment_ids']
-                if equipment_ids:
-                    vals = []
-                    for eq_id in equipment_ids:
-                        vals.append(f"({reservation_id}, {eq_id})")
-                    
-                    if vals:
-                        eq_insert_sql = f"INSERT INTO reservation_equipment (reservation_id, equipment_id) VALUES {','.join(vals)}"
-                        execute_update(eq_insert_sql)
-            except Exception as e:
-                logger.error(f"同步reservation_equipment失败: {str(e)}")
-        
         return updated_response(None, "预约信息更新成功")
         
     except Exception as e:
@@ -734,7 +865,7 @@ def delete_reservation(reservation_id):
         
         # 检查预约是否存在
         check_sql = """
-        SELECT id, user_id, status, reservation_date, start_time
+        SELECT id, user_id, laboratory_id, status, reservation_date, start_time
         FROM reservations 
         WHERE id = %s
         """
@@ -786,6 +917,7 @@ def delete_reservation(reservation_id):
             if not cancel_result['success']:
                 logger.error(f"取消预约失败: {cancel_result.get('error')}")
                 return error_response("取消预约失败，请稍后重试")
+            _invalidate_schedule(reservation)
             
             return updated_response(None, "预约已取消")
         else:
@@ -796,6 +928,7 @@ def delete_reservation(reservation_id):
             if not delete_result['success']:
                 logger.error(f"删除预约失败: {delete_result.get('error')}")
                 return error_response("删除预约失败，请稍后重试")
+            _invalidate_schedule(reservation)
             
             return deleted_response("预约删除成功")
         
@@ -813,7 +946,7 @@ def approve_reservation(reservation_id):
         remarks = data.get('remarks')
         
         # 检查预约是否存在
-        check_sql = "SELECT id, status, notes FROM reservations WHERE id = %s"
+        check_sql = "SELECT id, laboratory_id, reservation_date, status, notes FROM reservations WHERE id = %s"
         check_result = execute_query(check_sql, (reservation_id,))
         
         if not check_result['success'] or not check_result['data']:
@@ -836,6 +969,7 @@ def approve_reservation(reservation_id):
         update_result = execute_update(update_sql, (new_notes, reservation_id))
         
         if update_result['success']:
+            _invalidate_schedule(reservation)
             return success_response(None, "预约已审核通过")
         return error_response("操作失败，请稍后重试")
     except Exception as e:
@@ -851,7 +985,7 @@ def reject_reservation(reservation_id):
         data = request.get_json() or {}
         remarks = data.get('remarks')
         
-        check_sql = "SELECT id, status, notes FROM reservations WHERE id = %s"
+        check_sql = "SELECT id, laboratory_id, reservation_date, status, notes FROM reservations WHERE id = %s"
         check_result = execute_query(check_sql, (reservation_id,))
         
         if not check_result['success'] or not check_result['data']:
@@ -878,19 +1012,129 @@ def reject_reservation(reservation_id):
         update_result = execute_update(update_sql, (new_notes, reservation_id))
         
         if update_result['success']:
+            _invalidate_schedule(reservation)
             return success_response(None, "预约已拒绝")
         return error_response("操作失败，请稍后重试")
     except Exception as e:
         logger.error(f"拒绝预约失败: {str(e)}")
         return error_response("系统错误")
 
+# 批量状态流转规则，与单条审核/拒绝/完成接口保持一致
+BULK_TRANSITIONS = {
+    'approve': {'from': 'pending', 'to': 'confirmed', 'note_tag': '[审核通过]', 'always_note': False, 'message': '批量审核完成'},
+    'reject': {'from': 'pending', 'to': 'cancelled', 'note_tag': '[审核拒绝]', 'always_note': True, 'message': '批量拒绝完成'},
+    'complete': {'from': 'confirmed', 'to': 'completed', 'note_tag': None, 'always_note': False, 'message': '批量完成预约成功'}
+}
+
+MAX_BULK_IDS = 500
+
+@reservations_bp.route('/bulk/<action>', methods=['POST'])
+@require_auth
+@require_role(['admin', 'teacher'])
+def bulk_transition_reservations(action):
+    """批量审核通过 / 拒绝 / 完成：按 ids 或筛选条件选中预约，一条带状态条件的 UPDATE 完成流转，返回逐条结果。
+    请求体可省略，省略 ids 时按筛选条件（默认全部待流转状态的预约，最多 MAX_BULK_IDS 条）处理"""
+    try:
+        rule = BULK_TRANSITIONS.get(action)
+        if rule is None:
+            return not_found_response("不支持的批量操作")
+        data, error = read_optional_json({
+            'ids': {'type': 'integer_list', 'max_length': MAX_BULK_IDS},
+            'laboratory_id': {'type': 'integer', 'min_value': 1},
+            'date_from': {'type': 'date'},
+            'date_to': {'type': 'date'},
+            'limit': {'type': 'integer', 'min_value': 1, 'max_value': MAX_BULK_IDS},
+            'remarks': {'type': 'string', 'max_length': 500}
+        })
+        if error:
+            return error
+        remarks = data.get('remarks')
+
+        ids = data.get('ids')
+        if ids is not None and not ids:
+            return error_response("ids 不能为空")
+
+        with transaction():
+            # 先锁定目标行，保证状态判断与更新之间不被并发修改
+            if ids is not None:
+                select_sql = """
+                SELECT id, status, laboratory_id, reservation_date FROM reservations
+                WHERE id IN ({}) FOR UPDATE
+                """.format(','.join(['%s'] * len(ids)))
+                select_params = tuple(ids)
+            else:
+                where = ['status = %s']
+                select_params = [rule['from']]
+                if data.get('laboratory_id'):
+                    where.append('laboratory_id = %s')
+                    select_params.append(data['laboratory_id'])
+                if data.get('date_from'):
+                    where.append('reservation_date >= %s')
+                    select_params.append(data['date_from'])
+                if data.get('date_to'):
+                    where.append('reservation_date <= %s')
+                    select_params.append(data['date_to'])
+                select_sql = (
+                    "SELECT id, status, laboratory_id, reservation_date FROM reservations WHERE "
+                    + ' AND '.join(where) + " ORDER BY reservation_date, start_time, id LIMIT %s FOR UPDATE"
+                )
+                select_params = tuple(select_params) + (data.get('limit') or MAX_BULK_IDS,)
+            select_result = execute_query(select_sql, select_params)
+            if not select_result['success']:
+                logger.error(f"批量操作查询预约失败: {select_result.get('error')}")
+                return error_response("操作失败，请稍后重试")
+
+            rows = {row['id']: row for row in select_result['data']}
+            if ids is None:
+                ids = list(rows)
+            eligible = [i for i in ids if i in rows and rows[i]['status'] == rule['from']]
+
+            if eligible:
+                set_clause = "status = %s, updated_at = NOW()"
+                params = [rule['to']]
+                note = None
+                if rule['note_tag']:
+                    note = f"{rule['note_tag']} {remarks}" if remarks else (rule['note_tag'] if rule['always_note'] else None)
+                if note:
+                    set_clause += ", notes = CASE WHEN notes IS NULL OR notes = '' THEN %s ELSE CONCAT(notes, '\n', %s) END"
+                    params.extend([note, note])
+                update_sql = "UPDATE reservations SET {} WHERE id IN ({}) AND status = %s".format(
+                    set_clause, ','.join(['%s'] * len(eligible))
+                )
+                update_result = execute_update(update_sql, tuple(params) + tuple(eligible) + (rule['from'],))
+                if not update_result['success']:
+                    logger.error(f"批量更新预约状态失败: {update_result.get('error')}")
+                    return error_response("操作失败，请稍后重试")
+                for lab_id in {rows[i]['laboratory_id'] for i in eligible}:
+                    reservation_index.invalidate(lab_id)
+
+        eligible_set = set(eligible)
+        results = []
+        for i in ids:
+            if i not in rows:
+                results.append({'id': i, 'outcome': 'not_found'})
+            elif i in eligible_set:
+                results.append({'id': i, 'outcome': 'updated', 'status': rule['to']})
+            else:
+                results.append({'id': i, 'outcome': 'invalid_status', 'status': rows[i]['status']})
+
+        return success_response({
+            'action': action,
+            'requested': len(ids),
+            'updated': len(eligible),
+            'results': results
+        }, rule['message'])
+    except Exception as e:
+        logger.error(f"批量预约操作接口错误: {str(e)}")
+        return error_response("操作失败，请稍后重试")
+
 @reservations_bp.route('/<int:reservation_id>/cancel', methods=['POST'])
 @require_auth
 def cancel_reservation(reservation_id):
     """取消预约"""
     try:
         current_user = request.current_user
-        check_sql = "SELECT id, user_id, status FROM reservations WHERE id = %s"
+        check_sql = "SELECT id, user_id, laboratory_id, reservation_date, status FROM reservations WHERE id = %s"
         check_result = execute_query(check_sql, (reservation_id,))
         
         if not check_result['success'] or not check_result['data']:
@@ -910,12 +1154,157 @@ def cancel_reservation(reservation_id):
         update_result = execute_update(update_sql, (reservation_id,))
         
         if update_result['success']:
+            _invalidate_schedule(reservation)
             return success_response(None, "预约已取消")
         return error_response("操作失败，请稍后重试")
     except Exception as e:
         logger.error(f"取消预约失败: {str(e)}")
         return error_response("系统错误")
 
+def _rollup_filters(date_from, date_to, laboratory_id):
+    """预约统计的筛选条件（作用于 reservation_daily_stats）"""
+    conditions, params = [], []
+    if date_from:
+        conditions.append('stat_date >= %s')
+        params.append(date_from)
+    if date_to:
+        conditions.append('stat_date <= %s')
+        params.append(date_to)
+    if laboratory_id:
+        conditions.append('laboratory_id = %s')
+        params.append(laboratory_id)
+    return conditions, params
+
+def _rollup_statistics(where_conditions, query_params, trend_query, include_idle_labs=False, top_n=10):
+    """一次扫描汇总表得到状态、实验室、用户三种分布，再按 id 批量补齐名称。
+    trend_query 为按日期趋势的 (sql, params)，与汇总扫描并行执行；
+    include_idle_labs 为真时附带没有预约的实验室（计数为 0）。"""
+    where_clause = ' WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
+    queries = {
+        'rollup': (f"""
+            SELECT laboratory_id, user_id, status, SUM(reservation_count) AS count
+            FROM reservation_daily_stats
+            {where_clause}
+            GROUP BY laboratory_id, user_id, status
+            HAVING count > 0
+            """, tuple(query_params)),
+        'trend': trend_query
+    }
+    if include_idle_labs:
+        queries['labs'] = "SELECT id, name FROM laboratories"
+    results = execute_parallel(queries)
+    if not results['rollup']['success']:
+        raise RuntimeError(results['rollup'].get('error'))
+
+    status_counts, lab_counts, user_counts = {}, {}, {}
+    for row in results['rollup']['data']:
+        count = int(row['count'])
+        status_counts[row['status']] = status_counts.get(row['status'], 0) + count
+        lab_counts[row['laboratory_id']] = lab_counts.get(row['laboratory_id'], 0) + count
+        user_counts[row['user_id']] = user_counts.get(row['user_id'], 0) + count
+    top_ids = sorted(user_counts, key=lambda uid: (-user_counts[uid], uid))[:top_n]
+
+    # 名称补齐依赖汇总结果，两次 IN 查询同样并行
+    lookups = {}
+    if lab_counts and not include_idle_labs:
+        lookups['labs'] = (
+            "SELECT id, name FROM laboratories WHERE id IN ({})".format(','.join(['%s'] * len(lab_counts))),
+            tuple(lab_counts)
+        )
+    if top_ids:
+        lookups['users'] = (
+            "SELECT id, name FROM users WHERE id IN ({})".format(','.join(['%s'] * len(top_ids))),
+            tuple(top_ids)
+        )
+    results.update(execute_parallel(lookups) if lookups else {})
+
+    labs_result = results.get('labs', {'success': True, 'data': []})
+    lab_names = {row['id']: row['name'] for row in labs_result['data']} if labs_result['success'] else {}
+    lab_ids = set(lab_counts) | (set(lab_names) if include_idle_labs else set())
+    laboratories = sorted(
+        ({'laboratory_id': lab_id, 'laboratory_name': lab_names.get(lab_id), 'count': lab_counts.get(lab_id, 0)}
+         for lab_id in lab_ids),
+        key=lambda item: (-item['count'], item['laboratory_id'])
+    )
+
+    users_result = results.get('users', {'success': True, 'data': []})
+    user_names = {row['id']: row['name'] for row in users_result['data']} if users_result['success'] else {}
+    top_users = [
+        {'user_id': uid, 'user_name': user_names.get(uid), 'count': user_counts[uid]}
+        for uid in top_ids
+    ]
+
+    trend = []
+    if results['trend']['success']:
+        for row in results['trend']['data']:
+            trend.append({
+                'date': row['stat_date'].isoformat() if row['stat_date'] else None,
+                'count': int(row['count'])
+            })
+
+    return {
+        'total': sum(status_counts.values()),
+        'status': status_counts,
+        'laboratories': laboratories,
+        'top_users': top_users,
+        'trend': trend
+    }
+
+def build_reservation_statistics(date_from=None, date_to=None, laboratory_id=None):
+    """预约统计（/statistics 与看板共用）：状态、实验室、用户分布及最近30天趋势"""
+    where_conditions, query_params = _rollup_filters(date_from, date_to, laboratory_id)
+    # 按日期统计（最近30天）
+    trend_query = (f"""
+        SELECT stat_date, SUM(reservation_count) AS count
+        FROM reservation_daily_stats
+        WHERE {' AND '.join(['stat_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)'] + where_conditions)}
+        GROUP BY stat_date
+        HAVING count > 0
+        ORDER BY stat_date ASC
+        """, tuple(query_params))
+    stats = _rollup_statistics(where_conditions, query_params, trend_query,
+                               include_idle_labs=not where_conditions)
+    return {
+        'total_reservations': stats['total'],
+        'status_distribution': stats['status'],
+        'laboratory_distribution': [
+            {'laboratory_name': lab['laboratory_name'], 'reservation_count': lab['count']}
+            for lab in stats['laboratories']
+        ],
+        'top_users': [
+            {'user_name': u['user_name'], 'reservation_count': u['count']}
+            for u in stats['top_users']
+        ],
+        'daily_trend': stats['trend']
+    }
+
+def build_my_reservation_statistics(user_id):
+    """单个用户按状态的预约数（/my-statistics 与看板共用）"""
+    status_res = execute_query(
+        """
+        SELECT status, SUM(reservation_count) AS count
+        FROM reservation_daily_stats
+        WHERE user_id = %s
+        GROUP BY status
+        """,
+        (user_id,)
+    )
+    if not status_res['success']:
+        raise RuntimeError(status_res.get('error'))
+    stats = {
+        'total': 0,
+        'confirmed': 0,
+        'completed': 0,
+        'cancelled': 0,
+        'pending': 0
+    }
+    for row in status_res['data']:
+        c = int(row['count'] or 0)
+        stats['total'] += c
+        if row['status'] in stats:
+            stats[row['status']] = c
+    return stats
+
 @reservations_bp.route('/statistics', methods=['GET'])
 @require_auth
 @require_role(['admin', 'teacher'])
@@ -924,113 +1313,14 @@ def cancel_reservation(reservation_id):
     'date_to': {'type': 'string'},    # YYYY-MM-DD格式
     'laboratory_id': {'type': 'integer', 'min_value': 1}
 })
+@single_flight()
 def get_reservation_statistics():
-    """获取预约统计信息"""
+    """获取预约统计信息（读取预约日汇总表）"""
     try:
         params = request.validated_params
-        date_from = params.get('date_from')
-        date_to = params.get('date_to')
-        laboratory_id = params.get('laboratory_id')
-        
-        # 构建查询条件
-        where_conditions = []
-        query_params = []
-        
-        if date_from:
-            where_conditions.append('reservation_date >= %s')
-            query_params.append(date_from)
-        
-        if date_to:
-            where_conditions.append('reservation_date <= %s')
-            query_params.append(date_to)
-        
-        if laboratory_id:
-            where_conditions.append('laboratory_id = %s')
-            query_params.append(laboratory_id)
-        
-        where_clause = ' WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
-        
-        # 按状态统计
-        status_sql = f"""
-        SELECT status, COUNT(*) as count
-        FROM reservations
-        {where_clause}
-        GROUP BY status
-        """
-        status_result = execute_query(status_sql, tuple(query_params))
-        
-        status_stats = {}
-        total_count = 0
-        if status_result['success']:
-            for row in status_result['data']:
-                status_stats[row['status']] = row['count']
-                total_count += row['count']
-        
-        # 按实验室统计
-        lab_sql = f"""
-        SELECT l.name as laboratory_name, COUNT(r.id) as count
-        FROM laboratories l
-        LEFT JOIN reservations r ON l.id = r.laboratory_id
-        {where_clause.replace('laboratory_id', 'r.laboratory_id') if where_clause else ''}
-        GROUP BY l.id, l.name
-        ORDER BY count DESC
-        """
-        lab_result = execute_query(lab_sql, tuple(query_params))
-        
-        lab_stats = []
-        if lab_result['success']:
-            for row in lab_result['data']:
-                lab_stats.append({
-                    'laboratory_name': row['laboratory_name'],
-                    'reservation_count': row['count']
-                })
-        
-        # 按用户统计（前10名）
-        user_sql = f"""
-        SELECT u.name as user_name, COUNT(r.id) as count
-        FROM users u
-        JOIN reservations r ON u.id = r.user_id
-        {where_clause}
-        GROUP BY u.id, u.name
-        ORDER BY count DESC
-        LIMIT 10
-        """
-        user_result = execute_query(user_sql, tuple(query_params))
-        
-        user_stats = []
-        if user_result['success']:
-            for row in user_result['data']:
-                user_stats.append({
-                    'user_name': row['user_name'],
-                    'reservation_count': row['count']
-                })
-        
-        # 按日期统计（最近30天）
-        daily_sql = f"""
-        SELECT reservation_date, COUNT(*) as count
-        FROM reservations
-        WHERE reservation_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        {' AND ' + ' AND '.join(where_conditions) if where_conditions else ''}
-        GROUP BY reservation_date
-        ORDER BY reservation_date ASC
-        """
-        daily_result = execute_query(daily_sql, tuple(query_params))
-        
-        daily_stats = []
-        if daily_result['success']:
-            for row in daily_result['data']:
-                daily_stats.append({
-                    'date': row['reservation_date'].isoformat() if row['reservation_date'] else None,
-                    'count': row['count']
-                })
-        
-        statistics = {
-            'total_reservations': total_count,
-            'status_distribution': status_stats,
-            'laboratory_distribution': lab_stats,
-            'top_users': user_stats,
-            'daily_trend': daily_stats
-        }
+        statistics = build_reservation_statistics(
+            params.get('date_from'), params.get('date_to'), params.get('laboratory_id')
+        )
         
         return success_response(statistics, "获取预约统计信息成功")
         
@@ -1042,35 +1332,13 @@ def get_reservation_statistics():
 # 日历视图：按日期范围返回预约列表（非分页），支持实验室/状态/用户筛选
 @reservations_bp.route('/my-statistics', methods=['GET'])
 @require_auth
+@single_flight(scope='user')
 def get_my_statistics():
     """获取当前用户的预约统计信息"""
     try:
         user_id = request.current_user.get('id') or request.current_user.get('user_id')
         
-        # 1. Total count
-        total_sql = "SELECT COUNT(*) as count FROM reservations WHERE user_id = %s"
-        total_res = execute_query(total_sql, (user_id,))
-        total_count = total_res['data'][0]['count'] if total_res['success'] and total_res['data'] else 0
-        
-        # 2. Status counts
-        status_sql = "SELECT status, COUNT(*) as count FROM reservations WHERE user_id = %s GROUP BY status"
-        status_res = execute_query(status_sql, (user_id,))
-        
-        stats = {
-            'total': total_count,
-            'confirmed': 0,
-            'completed': 0,
-            'cancelled': 0,
-            'pending': 0
-        }
-        
-        if status_res['success']:
-            for row in status_res['data']:
-                s = row['status']
-                c = row['count']
-                if s in stats:
-                    stats[s] = c
-                    
+        stats = build_my_reservation_statistics(user_id)
         return success_response(stats, "获取个人统计信息成功")
         
     except Exception as e:
@@ -1078,6 +1346,12 @@ def get_my_statistics():
         return error_response("获取统计信息失败")
 
 
+def _calendar_scope(user):
+    """日历的合并范围：管理员/教师按角色共享，其他用户只能看到自己的预约，按用户区分"""
+    if user.get('role') in ('admin', 'teacher'):
+        return ('role', user.get('role'))
+    return ('user', user.get('id') or user.get('user_id'))
+
 @reservations_bp.route('/calendar', methods=['GET'])
 @require_auth
 @validate_query_params({
@@ -1087,6 +1361,7 @@ def get_my_statistics():
     'status': {'type': 'string'},
     'user_id': {'type': 'integer', 'min_value': 1}
 })
+@single_flight(scope=_calendar_scope)
 def get_reservation_calendar():
     """返回日历所需的预约记录列表（不分页）"""
     try:
@@ -1124,7 +1399,7 @@ def get_reservation_calendar():
             query_params.append(user_id)
         elif current_user and current_user.get('role') not in ('admin', 'teacher'):
             where_conditions.append('r.user_id = %s')
-            query_params.append(current_user['id'])
+            query_params.append(current_user.get('id') or current_user.get('user_id'))
 
         where_clause = ' WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
 
@@ -1146,13 +1421,10 @@ def get_reservation_calendar():
             ORDER BY r.reservation_date ASC, r.start_time ASC
         """
 
-        result = execute_query(sql, tuple(query_params))
-        if not result['success']:
-            logger.error(f"获取预约日历数据失败: {result.get('error')}")
-            return error_response("获取预约日历数据失败")
-
+        # 逐行读取并直接格式化，不再额外保留一份原始结果列表；格式化结果与响应体仍整体生成
+        # （single_flight 需把完整响应体共享给并发的相同请求，不能改为流式响应）
         formatted = []
-        for row in result['data']:
+        for row in iter_query(sql, tuple(query_params)):
             res_date = row['reservation_date']
             start_t = row['start_time']
             end_t = row['end_time']
@@ -1190,106 +1462,32 @@ def get_reservation_calendar():
     'date_to': {'type': 'string'},    # YYYY-MM-DD
     'laboratory_id': {'type': 'integer', 'min_value': 1}
 })
+@single_flight()
 def get_reservation_stats_alias():
     try:
         params = request.validated_params
-        date_from = params.get('date_from')
-        date_to = params.get('date_to')
-        laboratory_id = params.get('laboratory_id')
-
-        where_conditions = []
-        query_params = []
-
-        if date_from:
-            where_conditions.append('r.reservation_date >= %s')
-            query_params.append(date_from)
-        if date_to:
-            where_conditions.append('r.reservation_date <= %s')
-            query_params.append(date_to)
-        if laboratory_id:
-            where_conditions.append('r.laboratory_id = %s')
-            query_params.append(laboratory_id)
-
+        where_conditions, query_params = _rollup_filters(
+            params.get('date_from'), params.get('date_to'), params.get('laboratory_id')
+        )
+        # 最近30个有预约的日期
         where_clause = ' WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
-
-        # 状态分布
-        status_sql = f"""
-            SELECT r.status, COUNT(*) AS count
-            FROM reservations r
-            {where_clause}
-            GROUP BY r.status
-        """
-        status_result = execute_query(status_sql, tuple(query_params))
-        status_distribution = {}
-        total_reservations = 0
-        if status_result['success']:
-            for row in status_result['data']:
-                status_distribution[row['status']] = row['count']
-                total_reservations += row['count']
-
-        # 按实验室统计
-        labs_sql = f"""
-            SELECT l.id AS laboratory_id, l.name AS laboratory_name, COUNT(*) AS count
-            FROM reservations r
-            LEFT JOIN laboratories l ON r.laboratory_id = l.id
-            {where_clause}
-            GROUP BY l.id, l.name
-            ORDER BY count DESC
-        """
-        labs_result = execute_query(labs_sql, tuple(query_params))
-        by_laboratory = []
-        if labs_result['success']:
-            for row in labs_result['data']:
-                by_laboratory.append({
-                    'laboratory_id': row['laboratory_id'],
-                    'laboratory_name': row['laboratory_name'],
-                    'count': row['count']
-                })
-
-        # 用户排行榜（前10名）
-        users_sql = f"""
-            SELECT u.id AS user_id, u.name AS user_name, COUNT(*) AS count
-            FROM reservations r
-            LEFT JOIN users u ON r.user_id = u.id
-            {where_clause}
-            GROUP BY u.id, u.name
-            ORDER BY count DESC
-            LIMIT 10
-        """
-        users_result = execute_query(users_sql, tuple(query_params))
-        top_users = []
-        if users_result['success']:
-            for row in users_result['data']:
-                top_users.append({
-                    'user_id': row['user_id'],
-                    'user_name': row['user_name'],
-                    'count': row['count']
-                })
-
-        # 最近30天按日期统计
-        dates_sql = f"""
-            SELECT r.reservation_date AS date, COUNT(*) AS count
-            FROM reservations r
+        trend_query = (f"""
+            SELECT stat_date, SUM(reservation_count) AS count
+            FROM reservation_daily_stats
             {where_clause}
-            GROUP BY r.reservation_date
-            ORDER BY r.reservation_date DESC
+            GROUP BY stat_date
+            HAVING count > 0
+            ORDER BY stat_date DESC
             LIMIT 30
-        """
-        dates_result = execute_query(dates_sql, tuple(query_params))
-        by_date = []
-        if dates_result['success']:
-            for row in dates_result['data']:
-                by_date.append({
-                    'date': row['date'].isoformat() if row['date'] else None,
-                    'count': row['count']
-                })
+            """, tuple(query_params))
+        stats = _rollup_statistics(where_conditions, query_params, trend_query)
 
         response_data = {
-            'total_reservations': total_reservations,
-            'status_distribution': status_distribution,
-            'by_laboratory': by_laboratory,
-            'top_users': top_users,
-            'by_date': by_date
+            'total_reservations': stats['total'],
+            'status_distribution': stats['status'],
+            'by_laboratory': stats['laboratories'],
+            'top_users': stats['top_users'],
+            'by_date': stats['trend']
         }
 
         return success_response(response_data, "获取预约统计信息成功")
@@ -1314,27 +1512,13 @@ def check_reservation_conflict():
         date = data.get('date')
         start_time = data.get('start_time')
         end_time = data.get('end_time')
+        if not (lab_id and date and start_time and end_time):
+            return error_response("缺少必要参数：laboratory_id、date、start_time、end_time")
 
-        conflict_sql = """
-            SELECT r.id, r.reservation_date, r.start_time, r.end_time, r.purpose,
-                   u.name AS user_name
-            FROM reservations r
-            LEFT JOIN users u ON r.user_id = u.id
-            WHERE r.laboratory_id = %s
-              AND r.reservation_date = %s
-              AND r.status IN ('pending', 'confirmed')
-              AND NOT (
-                    r.end_time <= %s OR r.start_time >= %s
-              )
-            ORDER BY r.start_time ASC
-        """
-        conflicts_result = execute_query(conflict_sql, (lab_id, date, start_time, end_time))
-        if not conflicts_result['success']:
-            logger.error(f"预约冲突检查查询失败: {conflicts_result.get('error')}")
-            return error_response("预约冲突检查失败")
+        conflicts = reservation_index.find_conflicts(lab_id, date, start_time, end_time)
 
         conflicting_list = []
-        for c in conflicts_result['data']:
+        for c in conflicts:
             res_date_str = c['reservation_date'].isoformat() if hasattr(c['reservation_date'], 'isoformat') else str(c['reservation_date'])
             start_t_str = c['start_time'].strftime('%H:%M:%S') if hasattr(c['start_time'], 'strftime') else str(c['start_time'])
             end_t_str = c['end_time'].strftime('%H:%M:%S') if hasattr(c['end_time'], 'strftime') else str(c['end_time'])
@@ -1366,7 +1550,7 @@ def complete_reservation(reservation_id):
     """完成预约"""
     try:
         # 检查预约是否存在
-        check_sql = "SELECT id, status FROM reservations WHERE id = %s"
+        check_sql = "SELECT id, laboratory_id, reservation_date, status FROM reservations WHERE id = %s"
         check_result = execute_query(check_sql, (reservation_id,))
         
         if not check_result['success']:
@@ -1387,6 +1571,7 @@ def complete_reservation(reservation_id):
         
         if not update_result['success']:
             return error_response("完成预约失败，请稍后重试")
+        _invalidate_schedule(reservation)
             
         return updated_response(None, "预约已完成")
         
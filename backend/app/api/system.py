@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统维护API接口（仅管理员）
+"""
+
+import logging
+from flask import Blueprint
+from app.utils import require_auth, require_role, success_response, error_response
+from app.models.schema import schema_registry
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/schema', methods=['GET'])
+@require_auth
+@require_role(['admin'])
+def get_schema():
+    """查看表结构注册表状态"""
+    return success_response(schema_registry.stats(), "获取表结构信息成功")
+
+@system_bp.route('/schema/refresh', methods=['POST'])
+@require_auth
+@require_role(['admin'])
+def refresh_schema():
+    """手动变更表结构后重新加载注册表，并通知其他进程刷新"""
+    try:
+        if not schema_registry.refresh():
+            return error_response("重新加载表结构失败")
+        logger.info("管理员已刷新表结构注册表")
+        return success_response(schema_registry.stats(), "表结构已刷新")
+    except Exception as e:
+        logger.error(f"刷新表结构接口错误: {str(e)}")
+        return error_response("重新加载表结构失败")
@@ -24,6 +24,7 @@ users_bp = Blueprint('users', __name__)
 @validate_query_params({
     'page': {'type': 'integer', 'min_value': 1, 'default': 1},
     'page_size': {'type': 'integer', 'min_value': 1, 'max_value': 1000, 'default': 10},
+    'count': {'type': 'string', 'choices': ['exact', 'estimate', 'none'], 'default': 'exact'},
     'role': {'type': 'string', 'choices': ['student', 'teacher', 'admin']},
     'status': {'type': 'string', 'choices': ['active', 'inactive']},
     'search': {'type': 'string', 'max_length': 100}
@@ -67,7 +68,7 @@ def get_users():
         base_sql += ' ORDER BY created_at DESC'
         
         # 执行分页查询
-        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size)
+        result = execute_paginated_query(base_sql, tuple(query_params), page, page_size, count=params['count'])
         
         if not result['success']:
             logger.error(f"查询用户列表失败: {result.get('error')}")
@@ -108,7 +108,11 @@ def run():
         _ensure_reservations_columns()
         _ensure_laboratories_manager()
         _ensure_courses_lab_fields()
+        _ensure_course_schedule_fields()
         _ensure_consumables_tables()
+        _ensure_reservations_indexes()
+        _ensure_cache_versions_table()
+        stats_created = _ensure_reservation_daily_stats_table()
         
         # 始终更新触发器和存储过程，确保逻辑最新
         try:
@@ -117,6 +121,15 @@ def run():
             create_stored_procedures()
         except Exception as e:
             logger.warning(f"触发器/存储过程更新失败: {str(e)}")
+
+        # 汇总表新建时，触发器就绪后回填历史数据
+        if stats_created:
+            from app.jobs import reconcile_reservation_daily_stats
+            reconcile_reservation_daily_stats()
+
+        # 迁移可能改变了表结构，通知各进程的表结构注册表重新加载
+        from backend.database import bump_cache_version
+        bump_cache_version('schema')
             
         logger.info("数据库轻量迁移执行完成")
     except Exception as e:
@@ -373,3 +386,84 @@ def _ensure_courses_lab_fields():
                 logger.warning(f"⚠️ 添加 idx_courses_laboratory_id 失败: {r2.get('error')}")
     except Exception as e:
         logger.error(f"courses 列迁移异常: {str(e)}")
+
+def _ensure_course_schedule_fields():
+    """课程课表字段（courses.schedule、courses.semester_start）与课程生成预约的关联列 reservations.course_id"""
+    try:
+        cols = set(_get_existing_columns('courses'))
+        alters: List[Dict[str, str]] = []
+        if 'schedule' not in cols:
+            alters.append({
+                'sql': "ALTER TABLE courses ADD COLUMN `schedule` TEXT NULL COMMENT '上课规律（JSON）' AFTER `laboratory_id`",
+                'desc': '添加 courses.schedule 字段'
+            })
+        if 'semester_start' not in cols:
+            alters.append({
+                'sql': "ALTER TABLE courses ADD COLUMN `semester_start` DATE NULL COMMENT '学期第1周内日期' AFTER `schedule`",
+                'desc': '添加 courses.semester_start 字段'
+            })
+        if 'course_id' not in set(_get_existing_columns('reservations')):
+            alters.append({
+                'sql': "ALTER TABLE reservations ADD COLUMN `course_id` INT NULL COMMENT '按课表生成时关联的课程ID' AFTER `laboratory_id`, "
+                       "ADD INDEX idx_course_date (course_id, reservation_date)",
+                'desc': '添加 reservations.course_id 字段及索引'
+            })
+
+        for alter in alters:
+            try:
+                r = execute_update(alter['sql'])
+                if r['success']:
+                    logger.info(f"✅ {alter['desc']}")
+                else:
+                    logger.warning(f"⚠️ 执行失败：{alter['desc']} - {r.get('error')}")
+            except Exception as e:
+                logger.error(f"❌ 执行异常：{alter['desc']} - {str(e)}")
+    except Exception as e:
+        logger.error(f"课程课表字段迁移异常: {str(e)}")
+
+def _ensure_reservations_indexes():
+    """按实验室+日期查询预约（冲突检查、可用性）使用的联合索引"""
+    try:
+        exists = execute_query(
+            "SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='reservations' AND INDEX_NAME='idx_lab_date' LIMIT 1"
+        )
+        if exists['success'] and not exists['data']:
+            r = execute_update("ALTER TABLE reservations ADD INDEX idx_lab_date (laboratory_id, reservation_date, start_time)")
+            if r['success']:
+                logger.info("✅ reservations.idx_lab_date 索引已添加")
+            else:
+                logger.warning(f"⚠️ 添加 reservations.idx_lab_date 失败: {r.get('error')}")
+    except Exception as e:
+        logger.error(f"reservations 索引迁移异常: {str(e)}")
+
+def _ensure_cache_versions_table():
+    try:
+        r = execute_update(
+            "CREATE TABLE IF NOT EXISTS cache_versions ("
+            "scope VARCHAR(100) PRIMARY KEY, "
+            "version BIGINT NOT NULL DEFAULT 0, "
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+        )
+        if not r['success']:
+            logger.warning(f"⚠️ 创建 cache_versions 表失败: {r.get('error')}")
+    except Exception as e:
+        logger.error(f"创建 cache_versions 表异常: {str(e)}")
+
+def _ensure_reservation_daily_stats_table():
+    """确保预约日汇总表存在，返回是否为本次新建"""
+    try:
+        from backend.database import RESERVATION_DAILY_STATS_DDL
+        exists = execute_query(
+            "SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='reservation_daily_stats' LIMIT 1"
+        )
+        if not exists['success'] or exists['data']:
+            return False
+        r = execute_update(RESERVATION_DAILY_STATS_DDL)
+        if r['success']:
+            logger.info("✅ reservation_daily_stats 表已创建")
+            return True
+        logger.warning(f"⚠️ 创建 reservation_daily_stats 表失败: {r.get('error')}")
+    except Exception as e:
+        logger.error(f"创建 reservation_daily_stats 表异常: {str(e)}")
+    return False
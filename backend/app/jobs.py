@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台维护任务：自动完成已结束的预约、自动取消超时未审核的预约，并每晚校准预约日汇总表
+
+- 按主键分块处理（先取一批 id，再按 id + 原状态条件更新），每块单独提交，避免长时间持有行锁；
+- 状态条件保证任务幂等，重复执行或与人工审批并发时不会覆盖已变化的记录；
+- 通过 MySQL GET_LOCK 选主，多进程/多实例部署时同一时刻只有一个执行者。
+
+可由应用进程内的调度线程定时执行（RESERVATION_JOB_INTERVAL 秒，0 表示关闭），
+也可通过命令行单独执行：python -m backend.app.jobs [--batch-size N] [--reconcile-stats]
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from backend.database import session, transaction, execute_query, execute_update, get_cache_versions
+from app.models.schedule import reservation_index
+
+logger = logging.getLogger(__name__)
+
+JOB_LOCK_NAME = os.getenv('RESERVATION_JOB_LOCK', 'lab_reservation_maintenance')
+JOB_BATCH_SIZE = int(os.getenv('RESERVATION_JOB_BATCH_SIZE', 500))
+JOB_INTERVAL = int(os.getenv('RESERVATION_JOB_INTERVAL', 300))
+STATS_RECONCILE_HOUR = int(os.getenv('RESERVATION_STATS_RECONCILE_HOUR', 3))
+STATS_RECONCILE_WINDOW_DAYS = 31
+# 记录最近一次校准日期（YYYYMMDD），多进程共享，保证每晚只校准一次
+STATS_RECONCILE_SCOPE = 'reservation_daily_stats:reconciled'
+EXPIRED_PENDING_NOTE = '[系统] 预约开始前未完成审核，已自动取消'
+
+# 预约已结束 / 已开始（基于日期 + 时间比较，可使用 idx_status、idx_datetime 索引）
+_ENDED = "(reservation_date < CURDATE() OR (reservation_date = CURDATE() AND end_time <= CURTIME()))"
+_STARTED = "(reservation_date < CURDATE() OR (reservation_date = CURDATE() AND start_time <= CURTIME()))"
+
+_TRANSITIONS = (
+    # (报告键, 原状态, 时间条件, SET 子句, SET 参数)
+    ('completed', 'confirmed', _ENDED, "status = 'completed'", ()),
+    ('expired', 'pending', _STARTED,
+     "status = 'cancelled', notes = CONCAT_WS('\\n', NULLIF(notes, ''), %s)", (EXPIRED_PENDING_NOTE,)),
+)
+
+_last_report = None
+
+def _acquire_job_lock():
+    result = execute_query("SELECT GET_LOCK(%s, 0) AS locked", (JOB_LOCK_NAME,))
+    return result['success'] and bool(result['data']) and result['data'][0]['locked'] == 1
+
+def _release_job_lock():
+    result = execute_query("SELECT RELEASE_LOCK(%s) AS released", (JOB_LOCK_NAME,))
+    if not result['success']:
+        logger.warning(f"释放维护任务锁失败: {result.get('error')}")
+
+@contextmanager
+def _job_leader():
+    """尝试成为执行者：产出是否抢到锁。锁与连接绑定，块内语句都在同一会话连接上执行"""
+    with session():
+        leader = _acquire_job_lock()
+        try:
+            yield leader
+        finally:
+            if leader:
+                _release_job_lock()
+
+def _apply_transition(from_status, condition, set_clause, set_params, batch_size, labs):
+    """按块执行一种状态迁移，返回 (更新行数, 块数)"""
+    touched = batches = 0
+    while True:
+        result = execute_query(
+            f"SELECT id, laboratory_id FROM reservations WHERE status = %s AND {condition} "
+            f"ORDER BY id LIMIT %s",
+            (from_status, batch_size)
+        )
+        if not result['success']:
+            raise RuntimeError(result.get('error'))
+        rows = result['data']
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+        placeholders = ','.join(['%s'] * len(ids))
+        update = execute_update(
+            f"UPDATE reservations SET {set_clause} WHERE id IN ({placeholders}) AND status = %s",
+            tuple(set_params) + tuple(ids) + (from_status,)
+        )
+        if not update['success']:
+            raise RuntimeError(update.get('error'))
+        touched += update['affected_rows']
+        batches += 1
+        labs.update(row['laboratory_id'] for row in rows)
+        if len(rows) < batch_size:
+            break
+    return touched, batches
+
+def run_reservation_maintenance(batch_size=None):
+    """执行一次预约维护，返回报告；未抢到锁时 leader 为 False 且不做任何修改"""
+    global _last_report
+    batch_size = max(1, int(batch_size or JOB_BATCH_SIZE))
+    started = time.monotonic()
+    report = {'leader': False, 'completed': 0, 'expired': 0, 'batches': 0, 'success': True}
+    labs = set()
+    with _job_leader() as leader:
+        if not leader:
+            logger.info("预约维护任务已由其他进程执行，本次跳过")
+            return report
+        report['leader'] = True
+        try:
+            for key, from_status, condition, set_clause, set_params in _TRANSITIONS:
+                touched, batches = _apply_transition(from_status, condition, set_clause, set_params, batch_size, labs)
+                report[key] = touched
+                report['batches'] += batches
+        except Exception as e:
+            report['success'] = False
+            report['error'] = str(e)
+            logger.error(f"预约维护任务执行失败: {str(e)}")
+    # 状态变化影响占用判断，失效相关实验室的区间索引
+    for lab_id in labs:
+        reservation_index.invalidate(lab_id)
+    report['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+    report['finished_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    logger.info(
+        f"预约维护任务完成: 自动完成 {report['completed']} 条, 超时取消 {report['expired']} 条, "
+        f"共 {report['batches']} 块, 耗时 {report['duration_ms']}ms"
+    )
+    _last_report = report
+    return report
+
+def get_last_report():
+    return _last_report
+
+def reconcile_reservation_daily_stats(date_from=None, date_to=None, window_days=STATS_RECONCILE_WINDOW_DAYS):
+    """按 reservations 重建预约日汇总表（未指定范围时全量），按日期窗口分事务执行以缩短锁持有时间。
+    重建期间源行加共享锁，并发的预约写入会等待窗口事务结束后再由触发器增量更新，结果保持一致。"""
+    started = time.monotonic()
+    report = {'success': True, 'windows': 0, 'rows': 0}
+    try:
+        # 全量校准时范围同时覆盖汇总表，使残留的汇总行也在窗口内被清除
+        bounds = execute_query(
+            """
+            SELECT MIN(lo) AS lo, MAX(hi) AS hi FROM (
+                SELECT MIN(reservation_date) AS lo, MAX(reservation_date) AS hi FROM reservations
+                UNION ALL
+                SELECT MIN(stat_date), MAX(stat_date) FROM reservation_daily_stats
+            ) b
+            """
+        )
+        if not bounds['success']:
+            raise RuntimeError(bounds.get('error'))
+        lo, hi = bounds['data'][0]['lo'], bounds['data'][0]['hi']
+        start = date_from or lo
+        end = date_to or hi
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        if isinstance(end, str):
+            end = date.fromisoformat(end)
+        while start is not None and end is not None and start <= end:
+            window_end = min(start + timedelta(days=window_days - 1), end)
+            with transaction():
+                deleted = execute_update(
+                    "DELETE FROM reservation_daily_stats WHERE stat_date BETWEEN %s AND %s", (start, window_end)
+                )
+                inserted = execute_update(
+                    """
+                    INSERT INTO reservation_daily_stats (stat_date, laboratory_id, user_id, status, reservation_count)
+                    SELECT reservation_date, laboratory_id, user_id, status, COUNT(*)
+                    FROM reservations
+                    WHERE reservation_date BETWEEN %s AND %s
+                    GROUP BY reservation_date, laboratory_id, user_id, status
+                    """,
+                    (start, window_end)
+                )
+                if not (deleted['success'] and inserted['success']):
+                    raise RuntimeError(deleted.get('error') or inserted.get('error'))
+            report['windows'] += 1
+            report['rows'] += inserted['affected_rows']
+            start = window_end + timedelta(days=1)
+    except Exception as e:
+        report['success'] = False
+        report['error'] = str(e)
+        logger.error(f"预约日汇总表校准失败: {str(e)}")
+    report['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+    if report['success']:
+        logger.info(f"预约日汇总表校准完成: {report['windows']} 个窗口, {report['rows']} 行, 耗时 {report['duration_ms']}ms")
+    return report
+
+def run_nightly_reconcile(today=None):
+    """每晚校准一次预约日汇总表：抢到锁且当天尚未校准时执行，返回报告或 None"""
+    today = today or date.today()
+    stamp = int(today.strftime('%Y%m%d'))
+    with _job_leader() as leader:
+        if not leader:
+            return None
+        versions = get_cache_versions([STATS_RECONCILE_SCOPE])
+        if versions is None or versions.get(STATS_RECONCILE_SCOPE, 0) >= stamp:
+            return None
+        report = reconcile_reservation_daily_stats()
+        if report['success']:
+            execute_update(
+                "INSERT INTO cache_versions (scope, version) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE version = VALUES(version)",
+                (STATS_RECONCILE_SCOPE, stamp)
+            )
+        return report
+
+_scheduler_thread = None
+_scheduler_stop = threading.Event()
+
+def _scheduler_loop(interval):
+    # 启动后稍作延迟，避免与迁移/预热争用连接
+    if _scheduler_stop.wait(min(interval, 10)):
+        return
+    while True:
+        try:
+            run_reservation_maintenance()
+            if time.localtime().tm_hour >= STATS_RECONCILE_HOUR:
+                run_nightly_reconcile()
+        except Exception as e:
+            logger.error(f"预约维护调度异常: {str(e)}")
+        if _scheduler_stop.wait(interval):
+            return
+
+def start_scheduler(interval=None):
+    """启动进程内调度线程（守护线程，每个进程至多一个），interval<=0 时不启动"""
+    global _scheduler_thread
+    interval = JOB_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return _scheduler_thread
+    _scheduler_stop.clear()
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop, args=(interval,), name='reservation-maintenance', daemon=True
+    )
+    _scheduler_thread.start()
+    logger.info(f"预约维护调度已启动，间隔 {interval} 秒")
+    return _scheduler_thread
+
+def stop_scheduler():
+    _scheduler_stop.set()
+
+def main():
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='预约维护任务：自动完成已结束预约、取消超时未审核预约')
+    parser.add_argument('--batch-size', type=int, default=JOB_BATCH_SIZE, help='每块处理的预约数')
+    parser.add_argument('--reconcile-stats', action='store_true', help='全量校准预约日汇总表后退出')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.reconcile_stats:
+        report = reconcile_reservation_daily_stats()
+    else:
+        report = run_reservation_maintenance(args.batch_size)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if report['success'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
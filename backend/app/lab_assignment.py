@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学期课程实验室分配求解
+
+为需要实验室的课程整体分配实验室：同一实验室内课程的上课时间（按课表展开到周次与星期）不得重叠，
+实验室容量不小于选课人数；在此基础上最大化匹配度（容量利用率越高越好、设备数足够每人一台加分、
+保持当前实验室加分）。
+
+求解过程：
+1. 贪心：按可选实验室数从少到多、占用时间从多到少的顺序，为每门课程选择匹配度最高且时间不冲突的实验室；
+2. 局部搜索：对未分配课程尝试挤出至多 SOLVER_MAX_EJECT 门冲突课程并为其另找实验室；
+   再反复执行单门课程换实验室、两门课程互换实验室，直到没有改进或达到时间上限。
+
+课程占用时间编码为整数位图（每位代表某周某天的一个时间片，时间片长度取所有上课时间分钟数的最大公约数），
+冲突判断即按位与，无需外部依赖。实验室在学期内已有的有效预约（临时预约、其他课程已生成的场次）
+同样编码为位图，作为该实验室的固定占用；尚未生成场次的其他课程课表不计入。
+
+命令行：python -m backend.app.lab_assignment [--semester S] [--apply] [--time-limit T]
+基准测试：python -m backend.app.lab_assignment --benchmark [--courses 500] [--labs 100] [--seed 1]
+"""
+
+import os
+import json
+import time
+import random
+import logging
+from math import gcd
+from datetime import date, timedelta
+from backend.database import transaction, execute_query, execute_batch
+from app.timetable import parse_schedule, meeting_dates
+from app.models.schedule import to_seconds
+
+logger = logging.getLogger(__name__)
+
+SOLVER_TIME_LIMIT = float(os.getenv('SOLVER_TIME_LIMIT', '30'))
+SOLVER_MAX_EJECT = int(os.getenv('SOLVER_MAX_EJECT', 2))
+# 匹配度加分项：实验室设备数不少于选课人数、保持课程当前实验室
+EQUIPMENT_BONUS = 0.2
+STABILITY_BONUS = 0.1
+_EPS = 1e-9
+
+class CourseDemand:
+    """待分配课程：选课人数与占用时间位图"""
+
+    __slots__ = ('id', 'code', 'size', 'mask', 'current_lab')
+
+    def __init__(self, id, code, size, mask=0, current_lab=None):
+        self.id = id
+        self.code = code
+        self.size = int(size or 0)
+        self.mask = mask
+        self.current_lab = current_lab
+
+class LabSupply:
+    """可分配实验室：容量、可用设备数与已被其他预约占用的时间位图"""
+
+    __slots__ = ('id', 'name', 'capacity', 'equipment', 'booked')
+
+    def __init__(self, id, name, capacity, equipment=0, booked=0):
+        self.id = id
+        self.name = name
+        self.capacity = int(capacity or 0)
+        self.equipment = int(equipment or 0)
+        self.booked = booked
+
+def build_masks(schedules, bookings=()):
+    """{课程ID: (学期第1周内日期或 None, 规范化课表)} → ({课程ID: 占用位图}, {实验室ID: 已预约位图})；
+    不同课程的学期开始日期不同时，按最早一周对齐。bookings 为已有预约 [(实验室ID, 日期, 开始时间, 结束时间)]，
+    没有任何课程给出学期开始日期时无法与日历对齐，忽略"""
+    minutes = [1440]
+    mondays = {}
+    for course_id, (semester_start, meetings) in schedules.items():
+        if semester_start is not None:
+            if isinstance(semester_start, str):
+                semester_start = date.fromisoformat(semester_start)
+            mondays[course_id] = semester_start - timedelta(days=semester_start.weekday())
+        for meeting in meetings:
+            minutes.append(to_seconds(meeting['start_time']) // 60)
+            minutes.append(to_seconds(meeting['end_time']) // 60)
+    bookings = list(bookings) if mondays else []
+    for _, _, start_time, end_time in bookings:
+        minutes.append(to_seconds(start_time) // 60)
+        minutes.append(to_seconds(end_time) // 60)
+    step = 0
+    for m in minutes:
+        step = gcd(step, m)
+    slots_per_day = 1440 // step
+    base = min(mondays.values()) if mondays else date(2000, 1, 3)
+
+    masks = {}
+    for course_id, (semester_start, meetings) in schedules.items():
+        start_monday = mondays.get(course_id, base)
+        mask = 0
+        for meeting in meetings:
+            first = to_seconds(meeting['start_time']) // 60 // step
+            width = to_seconds(meeting['end_time']) // 60 // step - first
+            block = (1 << width) - 1
+            for day in meeting_dates(start_monday, meeting):
+                mask |= block << ((day - base).days * slots_per_day + first)
+        masks[course_id] = mask
+
+    booked = {}
+    for lab_id, day, start_time, end_time in bookings:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        first = to_seconds(start_time) // 60 // step
+        width = to_seconds(end_time) // 60 // step - first
+        if day < base or width <= 0:
+            continue
+        booked[lab_id] = booked.get(lab_id, 0) | (((1 << width) - 1) << ((day - base).days * slots_per_day + first))
+    return masks, booked
+
+class LabAssignmentSolver:
+    """贪心 + 局部搜索的课程—实验室分配"""
+
+    def __init__(self, courses, labs, time_limit=SOLVER_TIME_LIMIT, max_eject=SOLVER_MAX_EJECT):
+        self.courses = list(courses)
+        self.labs = list(labs)
+        self.time_limit = float(time_limit)
+        self.max_eject = max(0, int(max_eject))
+        n = len(self.courses)
+        # 每门课程容量可行、且上课时间不与实验室已有预约重叠的实验室，按匹配度降序：[(匹配度, 实验室下标)]；
+        # 已有预约不参与挤出/换位，排除后位图中的固定占用位永远不会与课程位重叠，异或移除仍然成立
+        self.options = []
+        self.booked_out = []
+        for course in self.courses:
+            options, booked_out = [], False
+            for j, lab in enumerate(self.labs):
+                s = self.fit(course, lab)
+                if s is None:
+                    continue
+                if lab.booked & course.mask:
+                    booked_out = True
+                    continue
+                options.append((s, j))
+            options.sort(key=lambda item: (-item[0], self.labs[item[1]].capacity, item[1]))
+            self.options.append(options)
+            self.booked_out.append(booked_out)
+        self.scores = [dict((j, s) for s, j in options) for options in self.options]
+        self.assign = [None] * n
+        self.lab_mask = [lab.booked for lab in self.labs]
+        self.lab_courses = [set() for _ in self.labs]
+        self.stats = {'greedy': 0, 'repaired': 0, 'relocations': 0, 'swaps': 0, 'passes': 0}
+        self._deadline = None
+
+    @staticmethod
+    def fit(course, lab):
+        """匹配度，容量不足时为 None"""
+        if lab.capacity < course.size or lab.capacity <= 0:
+            return None
+        score = course.size / lab.capacity
+        if lab.equipment >= course.size > 0:
+            score += EQUIPMENT_BONUS
+        if course.current_lab is not None and lab.id == course.current_lab:
+            score += STABILITY_BONUS
+        return score
+
+    def _expired(self):
+        return time.monotonic() > self._deadline
+
+    def _place(self, c, j):
+        self.assign[c] = j
+        self.lab_mask[j] |= self.courses[c].mask
+        self.lab_courses[j].add(c)
+
+    def _remove(self, c):
+        j = self.assign[c]
+        self.assign[c] = None
+        # 同一实验室内课程位图互不相交，异或即可移除
+        self.lab_mask[j] ^= self.courses[c].mask
+        self.lab_courses[j].discard(c)
+        return j
+
+    def _free(self, c, j):
+        return not (self.lab_mask[j] & self.courses[c].mask)
+
+    def _greedy(self):
+        order = sorted(
+            range(len(self.courses)),
+            key=lambda c: (len(self.options[c]), -bin(self.courses[c].mask).count('1'), -self.courses[c].size)
+        )
+        for c in order:
+            for _, j in self.options[c]:
+                if self._free(c, j):
+                    self._place(c, j)
+                    self.stats['greedy'] += 1
+                    break
+
+    def _relocate(self, c, excluded):
+        """为已移出的课程 c 找一个不在 excluded 中、时间空闲的最佳实验室"""
+        for _, j in self.options[c]:
+            if j not in excluded and self._free(c, j):
+                self._place(c, j)
+                return True
+        return False
+
+    def _repair(self):
+        """未分配课程：挤出目标实验室中至多 max_eject 门冲突课程，并为被挤出的课程另找实验室"""
+        progress = True
+        while progress and not self._expired():
+            progress = False
+            for u in range(len(self.courses)):
+                if self.assign[u] is not None or self._expired():
+                    continue
+                mask = self.courses[u].mask
+                for _, j in self.options[u]:
+                    blockers = [c for c in self.lab_courses[j] if self.courses[c].mask & mask]
+                    if not blockers:
+                        # 换位后腾出了空闲实验室
+                        self._place(u, j)
+                        self.stats['repaired'] += 1
+                        progress = True
+                        break
+                    if len(blockers) > self.max_eject:
+                        continue
+                    for b in blockers:
+                        self._remove(b)
+                    self._place(u, j)
+                    moved = []
+                    for b in blockers:
+                        if not self._relocate(b, {j}):
+                            break
+                        moved.append(b)
+                    if len(moved) == len(blockers):
+                        self.stats['repaired'] += 1
+                        progress = True
+                        break
+                    # 回滚
+                    for b in moved:
+                        self._remove(b)
+                    self._remove(u)
+                    for b in blockers:
+                        self._place(b, j)
+
+    def _improve_pass(self):
+        improved = False
+        n = len(self.courses)
+        # 单门课程换到匹配度更高的空闲实验室
+        for c in range(n):
+            j = self.assign[c]
+            if j is None:
+                continue
+            current = self.scores[c][j]
+            for s, k in self.options[c]:
+                if s <= current + _EPS:
+                    break
+                if self._free(c, k):
+                    self._remove(c)
+                    self._place(c, k)
+                    self.stats['relocations'] += 1
+                    improved = True
+                    break
+        # 两门课程互换实验室
+        assigned = [c for c in range(n) if self.assign[c] is not None]
+        for x, a in enumerate(assigned):
+            if self._expired():
+                break
+            for b in assigned[x + 1:]:
+                ja, jb = self.assign[a], self.assign[b]
+                if ja == jb:
+                    continue
+                sa, sb = self.scores[a].get(jb), self.scores[b].get(ja)
+                if sa is None or sb is None:
+                    continue
+                if sa + sb <= self.scores[a][ja] + self.scores[b][jb] + _EPS:
+                    continue
+                ma, mb = self.courses[a].mask, self.courses[b].mask
+                if (self.lab_mask[jb] ^ mb) & ma or (self.lab_mask[ja] ^ ma) & mb:
+                    continue
+                self._remove(a)
+                self._remove(b)
+                self._place(a, jb)
+                self._place(b, ja)
+                self.stats['swaps'] += 1
+                improved = True
+        return improved
+
+    def solve(self):
+        started = time.monotonic()
+        self._deadline = started + self.time_limit
+        self._greedy()
+        self._repair()
+        while not self._expired():
+            self.stats['passes'] += 1
+            if not self._improve_pass():
+                break
+            # 换位腾出的时间可能让未分配课程放得下
+            self._repair()
+        return self.result(round((time.monotonic() - started) * 1000, 1))
+
+    def result(self, duration_ms=None):
+        assignments, unassigned = [], []
+        total = 0.0
+        for c, course in enumerate(self.courses):
+            j = self.assign[c]
+            if j is None:
+                if self.options[c]:
+                    reason = '冲突：容量足够的实验室在其上课时间均已被占用'
+                elif self.booked_out[c]:
+                    reason = '冲突：容量足够的实验室在其上课时间均已有其他预约'
+                else:
+                    reason = '没有容量足够的实验室'
+                unassigned.append({'course_id': course.id, 'code': course.code, 'size': course.size, 'reason': reason})
+                continue
+            lab = self.labs[j]
+            score = self.scores[c][j]
+            total += score
+            assignments.append({
+                'course_id': course.id,
+                'code': course.code,
+                'size': course.size,
+                'laboratory_id': lab.id,
+                'laboratory_name': lab.name,
+                'capacity': lab.capacity,
+                'score': round(score, 4),
+                'changed': lab.id != course.current_lab
+            })
+        return {
+            'assignments': assignments,
+            'unassigned': unassigned,
+            'summary': dict(
+                self.stats,
+                courses=len(self.courses),
+                labs=len(self.labs),
+                assigned=len(assignments),
+                unassigned=len(unassigned),
+                changed=sum(1 for item in assignments if item['changed']),
+                score=round(total, 4),
+                duration_ms=duration_ms
+            )
+        }
+
+def validate_assignment(courses, labs, assignment):
+    """校验分配结果 {课程ID: 实验室ID}：容量足够且同一实验室内时间不重叠，返回问题列表"""
+    by_course = {course.id: course for course in courses}
+    by_lab = {lab.id: lab for lab in labs}
+    occupied = {}
+    problems = []
+    for course_id, lab_id in assignment.items():
+        course, lab = by_course[course_id], by_lab[lab_id]
+        if lab.capacity < course.size:
+            problems.append(f"课程 {course.code} 人数超过实验室 {lab.name} 容量")
+        if occupied.get(lab_id, lab.booked) & course.mask:
+            problems.append(f"课程 {course.code} 在实验室 {lab.name} 时间冲突")
+        occupied[lab_id] = occupied.get(lab_id, lab.booked) | course.mask
+    return problems
+
+def _query(sql, params=None):
+    result = execute_query(sql, params)
+    if not result['success']:
+        raise RuntimeError(result.get('error'))
+    return result['data']
+
+def _schedule_span(schedules):
+    """课表覆盖的日期范围 (首日, 末日)；没有课程给出学期开始日期时为 None"""
+    days = [
+        day for semester_start, meetings in schedules.values() if semester_start is not None
+        for meeting in meetings for day in meeting_dates(semester_start, meeting)
+    ]
+    return (min(days), max(days)) if days else None
+
+def load_problem(semester=None, course_ids=None):
+    """读取需要实验室的有效课程（人数、课表）与可用实验室（容量、设备数、课程上课期间已有的有效预约），
+    返回 (课程, 实验室, 跳过的课程)。待分配课程自身已生成的场次随课程换实验室，不算作占用"""
+    sql = (
+        "SELECT id, code, laboratory_id, schedule, semester_start FROM courses "
+        "WHERE requires_lab = 1 AND status = 'active'"
+    )
+    params = []
+    if semester:
+        sql += " AND semester = %s"
+        params.append(semester)
+    if course_ids:
+        sql += " AND id IN ({})".format(','.join(['%s'] * len(course_ids)))
+        params.extend(course_ids)
+    rows = _query(sql + " ORDER BY id", tuple(params))
+    enrolled = {
+        row['course_id']: row['count'] for row in _query(
+            "SELECT cs.course_id, COUNT(*) AS count FROM course_students cs "
+            "JOIN courses c ON c.id = cs.course_id "
+            "WHERE c.requires_lab = 1 AND c.status = 'active' GROUP BY cs.course_id"
+        )
+    }
+    equipment = {
+        row['laboratory_id']: row['count'] for row in _query(
+            "SELECT laboratory_id, COUNT(*) AS count FROM equipment "
+            "WHERE status IN ('available', 'in_use') GROUP BY laboratory_id"
+        )
+    }
+    lab_rows = _query("SELECT id, name, capacity FROM laboratories WHERE status = 'active' ORDER BY id")
+
+    schedules, skipped = {}, []
+    for row in rows:
+        try:
+            schedules[row['id']] = (row.get('semester_start'), parse_schedule(row.get('schedule')))
+        except ValueError as e:
+            skipped.append({'course_id': row['id'], 'code': row['code'], 'reason': str(e)})
+    bookings = []
+    span = _schedule_span(schedules)
+    if span:
+        bookings = [
+            (row['laboratory_id'], row['reservation_date'], row['start_time'], row['end_time'])
+            for row in _query(
+                "SELECT laboratory_id, course_id, reservation_date, start_time, end_time FROM reservations "
+                "WHERE reservation_date BETWEEN %s AND %s AND status IN ('pending', 'confirmed')",
+                span
+            )
+            if row['course_id'] not in schedules
+        ]
+    masks, booked = build_masks(schedules, bookings)
+    labs = [
+        LabSupply(row['id'], row['name'], row['capacity'], equipment.get(row['id'], 0), booked.get(row['id'], 0))
+        for row in lab_rows
+    ]
+    courses = [
+        CourseDemand(row['id'], row['code'], enrolled.get(row['id'], 0), masks[row['id']], row.get('laboratory_id'))
+        for row in rows if row['id'] in masks
+    ]
+    return courses, labs, skipped
+
+def propose_lab_assignment(semester=None, course_ids=None, time_limit=None, apply=False):
+    """求解课程实验室分配；apply 时在一个事务中把变化的分配写回 courses.laboratory_id"""
+    try:
+        courses, labs, skipped = load_problem(semester, course_ids)
+        solver = LabAssignmentSolver(courses, labs, SOLVER_TIME_LIMIT if time_limit is None else time_limit)
+        report = solver.solve()
+        report['skipped'] = skipped
+        report['success'] = True
+        report['applied'] = 0
+        changes = [(item['laboratory_id'], item['course_id']) for item in report['assignments'] if item['changed']]
+        if apply and changes:
+            with transaction():
+                result = execute_batch("UPDATE courses SET laboratory_id = %s WHERE id = %s", changes)
+                if not result['success']:
+                    raise RuntimeError(result.get('error'))
+            report['applied'] = len(changes)
+        summary = report['summary']
+        logger.info(
+            f"课程实验室分配完成: 课程 {summary['courses']} 门, 实验室 {summary['labs']} 间, 已分配 {summary['assigned']}, "
+            f"未分配 {summary['unassigned']}, 变更 {summary['changed']}, 写回 {report['applied']}, 耗时 {summary['duration_ms']}ms"
+        )
+        return report
+    except Exception as e:
+        logger.error(f"课程实验室分配失败: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+def generate_instance(n_courses=500, n_labs=100, seed=1):
+    """基准测试用的随机实例：工作日白天/晚上的常见节次，前后半学期或全学期、部分单双周"""
+    rng = random.Random(seed)
+    labs = [
+        LabSupply(j + 1, f"实验室{j + 1}", rng.choice((30, 40, 50, 60, 80, 120)), rng.randint(0, 120))
+        for j in range(n_labs)
+    ]
+    periods = (('08:00', '09:40'), ('10:00', '11:40'), ('14:00', '15:40'), ('16:00', '17:40'), ('19:00', '20:40'))
+    week_ranges = ((1, 16), (1, 8), (9, 16))
+    schedules, sizes = {}, {}
+    for c in range(1, n_courses + 1):
+        meetings = []
+        for _ in range(rng.choice((1, 1, 2))):
+            start, end = rng.choice(periods)
+            first, last = rng.choice(week_ranges)
+            meetings.append({
+                'weekday': rng.randint(1, 5), 'start_time': start, 'end_time': end,
+                'start_week': first, 'end_week': last, 'parity': rng.choice(('all', 'all', 'all', 'odd', 'even'))
+            })
+        schedules[c] = ('2026-02-23', meetings)
+        sizes[c] = rng.randint(15, 110)
+    masks, _ = build_masks(schedules)
+    courses = [
+        CourseDemand(c, f"C{c:04d}", sizes[c], masks[c], rng.choice([None, rng.randint(1, n_labs)]))
+        for c in range(1, n_courses + 1)
+    ]
+    return courses, labs
+
+def run_benchmark(n_courses=500, n_labs=100, seed=1, time_limit=SOLVER_TIME_LIMIT):
+    started = time.monotonic()
+    courses, labs = generate_instance(n_courses, n_labs, seed)
+    build_ms = round((time.monotonic() - started) * 1000, 1)
+    solver = LabAssignmentSolver(courses, labs, time_limit)
+    report = solver.solve()
+    assignment = {item['course_id']: item['laboratory_id'] for item in report['assignments']}
+    problems = validate_assignment(courses, labs, assignment)
+    return dict(report['summary'], build_ms=build_ms, valid=not problems, problems=problems[:10])
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='学期课程实验室分配求解')
+    parser.add_argument('--semester', help='只处理指定学期的课程')
+    parser.add_argument('--course-id', type=int, action='append', dest='course_ids', help='只处理指定课程，可重复')
+    parser.add_argument('--time-limit', type=float, default=SOLVER_TIME_LIMIT, help='求解时间上限（秒）')
+    parser.add_argument('--apply', action='store_true', help='把变化的分配写回课程')
+    parser.add_argument('--benchmark', action='store_true', help='在随机实例上运行基准测试（不访问数据库）')
+    parser.add_argument('--courses', type=int, default=500, help='基准测试课程数')
+    parser.add_argument('--labs', type=int, default=100, help='基准测试实验室数')
+    parser.add_argument('--seed', type=int, default=1, help='基准测试随机种子')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.benchmark:
+        report = run_benchmark(args.courses, args.labs, args.seed, args.time_limit)
+        print(json.dumps(report, ensure_ascii=False))
+        return 0 if report['valid'] else 1
+    report = propose_lab_assignment(args.semester, args.course_ids, args.time_limit, args.apply)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if report['success'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -7,4 +7,17 @@
 # 这里可以定义数据模型相关的类和函数
 # 由于使用原生SQL，主要用于数据验证和格式化
 
-__all__ = []
\ No newline at end of file
+from .schedule import LabDaySchedule, ReservationIntervalIndex, SlotGrid, reservation_index, get_availability, find_free_slots
+from .schema import SchemaRegistry, schema_registry, has_column
+
+__all__ = [
+    'LabDaySchedule',
+    'ReservationIntervalIndex',
+    'SlotGrid',
+    'reservation_index',
+    'get_availability',
+    'find_free_slots',
+    'SchemaRegistry',
+    'schema_registry',
+    'has_column'
+]
\ No newline at end of file
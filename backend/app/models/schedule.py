@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预约时间区间索引
+
+按 (实验室, 日期) 在进程内缓存有效预约（pending/confirmed）的有序区间，
+冲突检查与可用性查询在内存中二分完成，无需每次对 reservations 做范围扫描。
+多进程部署时依赖 cache_versions 表中每个实验室的版本戳判断缓存是否已被其他进程写入失效，
+版本戳最多每 SCHEDULE_VERSION_POLL 秒复查一次；需要强一致的写路径应使用 fresh=True 重新加载。
+"""
+
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import timedelta
+from backend.database import execute_query, bump_cache_version, get_cache_versions, on_commit
+
+logger = logging.getLogger(__name__)
+
+# 占用时间段的预约状态
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+SCHEDULE_VERSION_POLL = float(os.getenv('SCHEDULE_VERSION_POLL', '1.0'))
+SCHEDULE_INDEX_MAX_DAYS = int(os.getenv('SCHEDULE_INDEX_MAX_DAYS', '20000'))
+
+# 可用性时间轴默认配置：开放时间与时间片长度
+AVAILABILITY_OPEN_TIME = os.getenv('AVAILABILITY_OPEN_TIME', '08:00')
+AVAILABILITY_CLOSE_TIME = os.getenv('AVAILABILITY_CLOSE_TIME', '22:00')
+AVAILABILITY_SLOT_MINUTES = int(os.getenv('AVAILABILITY_SLOT_MINUTES', '30'))
+
+def to_seconds(value):
+    """TIME 列（timedelta）、time 对象、'HH:MM[:SS]' 字符串或秒数统一为当天秒数"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if hasattr(value, 'hour'):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    parts = str(value).strip().split(':')
+    hours = int(parts[0])
+    minutes = int(parts[1]) if len(parts) > 1 else 0
+    seconds = int(float(parts[2])) if len(parts) > 2 else 0
+    return hours * 3600 + minutes * 60 + seconds
+
+def date_key(value):
+    """日期统一为 YYYY-MM-DD 字符串作为索引键"""
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)[:10]
+
+class LabDaySchedule:
+    """某实验室某天的有效预约，按开始时间排序；ends_max[i] 为前 i+1 个区间结束时间的最大值"""
+
+    __slots__ = ('items', 'starts', 'ends_max', 'version', '_bitmaps')
+
+    def __init__(self, rows, version=None):
+        self.items = sorted(
+            ((to_seconds(r['start_time']), to_seconds(r['end_time']), r) for r in rows),
+            key=lambda item: (item[0], item[1])
+        )
+        self.starts = [item[0] for item in self.items]
+        self.ends_max = []
+        latest = -1
+        for _, end, _ in self.items:
+            latest = max(latest, end)
+            self.ends_max.append(latest)
+        self.version = version
+        self._bitmaps = {}
+
+    def overlapping(self, start, end, exclude_id=None):
+        """返回与 [start, end) 重叠的预约（按开始时间升序），O(log n + k)"""
+        start, end = to_seconds(start), to_seconds(end)
+        found = []
+        i = bisect_left(self.starts, end) - 1
+        # ends_max 单调不减，一旦不超过 start，更早的区间都不可能重叠
+        while i >= 0 and self.ends_max[i] > start:
+            s, e, row = self.items[i]
+            if e > start and row.get('id') != exclude_id:
+                found.append(row)
+            i -= 1
+        found.reverse()
+        return found
+
+    def bitmap(self, grid):
+        """按时间片的占用位图（int，第 i 位为 1 表示第 i 个时间片与某个预约重叠），按网格缓存"""
+        key = (grid.open_seconds, grid.close_seconds, grid.slot_seconds)
+        bits = self._bitmaps.get(key)
+        if bits is None:
+            bits = 0
+            for start, end, _ in self.items:
+                bits |= grid.mask(start, end)
+            self._bitmaps[key] = bits
+        return bits
+
+    def intervals(self):
+        """[(开始秒, 结束秒, 预约行), ...]，按开始时间升序"""
+        return list(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+class SlotGrid:
+    """一天的时间片划分：[open, close) 按 slot_minutes 切分"""
+
+    def __init__(self, open_time=AVAILABILITY_OPEN_TIME, close_time=AVAILABILITY_CLOSE_TIME,
+                 slot_minutes=AVAILABILITY_SLOT_MINUTES):
+        self.open_seconds = to_seconds(open_time)
+        self.close_seconds = to_seconds(close_time)
+        self.slot_seconds = int(slot_minutes) * 60
+        if self.slot_seconds <= 0 or self.close_seconds <= self.open_seconds:
+            raise ValueError('开放时间或时间片长度无效')
+        self.size = -(-(self.close_seconds - self.open_seconds) // self.slot_seconds)
+        self.full = (1 << self.size) - 1
+
+    def mask(self, start, end):
+        """与 [start, end) 重叠的时间片位掩码；先裁剪到开放时间内，与 slot_end 的收尾一致
+        （关门时间不是时间片整数倍时，最后一片在关门时结束，关门后开始的预约不占用它）"""
+        start = max(start, self.open_seconds)
+        end = min(end, self.close_seconds)
+        if end <= start:
+            return 0
+        first = (start - self.open_seconds) // self.slot_seconds
+        last = min(self.size, -(-(end - self.open_seconds) // self.slot_seconds))
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def slot_start(self, i):
+        return self.open_seconds + i * self.slot_seconds
+
+    def slot_end(self, i):
+        return min(self.close_seconds, self.slot_start(i + 1))
+
+    def labels(self):
+        return [format_seconds(self.slot_start(i)) for i in range(self.size)]
+
+    @staticmethod
+    def encode(bits, size):
+        """位图编码为 '0'/'1' 字符串，第 i 个字符对应第 i 个时间片（1 表示已占用）"""
+        return format(bits, f'0{size}b')[::-1] if size else ''
+
+def format_seconds(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+class ReservationIntervalIndex:
+    """进程内预约区间索引：冷数据或失效数据一次查询从数据库加载，写入后通过 invalidate() 保持一致"""
+
+    def __init__(self, poll_interval=SCHEDULE_VERSION_POLL, max_days=SCHEDULE_INDEX_MAX_DAYS):
+        self.poll_interval = float(poll_interval)
+        self.max_days = max(1, int(max_days))
+        self._lock = threading.Lock()
+        self._days = OrderedDict()
+        self._versions = {}
+        self._stats = {'hits': 0, 'loads': 0, 'invalidations': 0}
+
+    @staticmethod
+    def scope(lab_id):
+        return f"reservations:lab:{lab_id}"
+
+    def _current_versions(self, lab_ids, force=False):
+        """实验室当前版本戳；版本表不可用时返回 None，表示不信任也不写入缓存"""
+        now = time.monotonic()
+        versions = {}
+        stale = []
+        with self._lock:
+            for lab_id in lab_ids:
+                cached = self._versions.get(lab_id)
+                if cached is not None and not force and now - cached[1] < self.poll_interval:
+                    versions[lab_id] = cached[0]
+                else:
+                    stale.append(lab_id)
+        if stale:
+            fetched = get_cache_versions([self.scope(lab_id) for lab_id in stale])
+            with self._lock:
+                for lab_id in stale:
+                    version = None if fetched is None else fetched[self.scope(lab_id)]
+                    versions[lab_id] = version
+                    if version is not None:
+                        self._versions[lab_id] = (version, now)
+        return versions
+
+    def get_days(self, lab_ids, dates, fresh=False):
+        """返回 {(lab_id, 'YYYY-MM-DD'): LabDaySchedule}；缺失或失效的部分合并为一次查询加载。
+        fresh=True 时忽略缓存直接读库（写事务内做冲突检查时使用）"""
+        lab_ids = list(dict.fromkeys(lab_ids))
+        keys = [(lab_id, date_key(d)) for lab_id in lab_ids for d in dates]
+        if not keys:
+            return {}
+        versions = self._current_versions(lab_ids, force=fresh)
+        result = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                day = self._days.get(key)
+                version = versions.get(key[0])
+                if not fresh and day is not None and version is not None and day.version == version:
+                    self._days.move_to_end(key)
+                    result[key] = day
+                else:
+                    missing.append(key)
+            self._stats['hits'] += len(result)
+        if missing:
+            result.update(self._load(missing, versions))
+        return result
+
+    def _load(self, keys, versions):
+        lab_ids = sorted({key[0] for key in keys})
+        dates = sorted({key[1] for key in keys})
+        sql = (
+            "SELECT r.id, r.laboratory_id, r.reservation_date, r.start_time, r.end_time, "
+            "r.purpose, r.status, r.user_id, u.name AS user_name "
+            "FROM reservations r LEFT JOIN users u ON r.user_id = u.id "
+            "WHERE r.laboratory_id IN ({}) AND r.reservation_date BETWEEN %s AND %s "
+            "AND r.status IN ('pending', 'confirmed')"
+        ).format(','.join(['%s'] * len(lab_ids)))
+        res = execute_query(sql, tuple(lab_ids) + (dates[0], dates[-1]))
+        if not res['success']:
+            raise RuntimeError(f"加载预约区间失败: {res.get('error')}")
+
+        grouped = {key: [] for key in keys}
+        for row in res['data']:
+            key = (row['laboratory_id'], date_key(row['reservation_date']))
+            if key in grouped:
+                grouped[key].append(row)
+        days = {key: LabDaySchedule(rows, versions.get(key[0])) for key, rows in grouped.items()}
+
+        with self._lock:
+            self._stats['loads'] += 1
+            for key, day in days.items():
+                if day.version is None:
+                    continue
+                self._days[key] = day
+                self._days.move_to_end(key)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return days
+
+    def day(self, lab_id, d, fresh=False):
+        return self.get_days([lab_id], [d], fresh)[(lab_id, date_key(d))]
+
+    def find_conflicts(self, lab_id, d, start, end, exclude_id=None, fresh=False):
+        """与 [start, end) 重叠的有效预约列表"""
+        return self.day(lab_id, d, fresh).overlapping(start, end, exclude_id)
+
+    def invalidate(self, lab_id, d=None):
+        """预约写入后调用：递增该实验室的版本戳（处于事务中时随事务提交），提交后丢弃本进程缓存。
+        提交前丢弃的话，同进程的并发读取会把未提交前的数据以旧版本戳重新缓存，直到下次轮询版本戳"""
+        result = bump_cache_version(self.scope(lab_id))
+        if not result['success']:
+            logger.warning(f"更新预约索引版本失败: {result.get('error')}")
+        on_commit(lambda: self._drop(lab_id, d))
+
+    def _drop(self, lab_id, d=None):
+        with self._lock:
+            self._versions.pop(lab_id, None)
+            if d is None:
+                for key in [k for k in self._days if k[0] == lab_id]:
+                    del self._days[key]
+            else:
+                self._days.pop((lab_id, date_key(d)), None)
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, days=len(self._days))
+
+reservation_index = ReservationIntervalIndex()
+
+def get_availability(lab_ids, dates, grid=None):
+    """多实验室、多日期的占用位图：{(lab_id, 'YYYY-MM-DD'): 位图}，缓存缺失部分一次查询加载"""
+    grid = grid or SlotGrid()
+    days = reservation_index.get_days(lab_ids, dates)
+    return {key: day.bitmap(grid) for key, day in days.items()}
+
+def _run_starts(free, length):
+    """free 中连续 length 个 1 的起始位（移位相与）"""
+    starts = free
+    shift = 1
+    # 倍增：每轮把已确认的连续长度翻倍，O(log length) 次大整数运算
+    while shift < length and starts:
+        step = min(shift, length - shift)
+        starts &= starts >> step
+        shift += step
+    return starts
+
+def find_free_slots(labs, dates, duration_minutes, grid=None, limit=10, not_before=None):
+    """在多个实验室、多个日期中查找最早的 limit 个可容纳 duration_minutes 的空闲时段。
+    labs 为实验室行（需含 id），dates 按升序；not_before 为 datetime 时跳过此前开始的时段。
+    返回 [(date, 开始秒, 结束秒, lab), ...]，按日期、开始时间、实验室 id 排序"""
+    grid = grid or SlotGrid()
+    length = -(-int(duration_minutes) * 60 // grid.slot_seconds)
+    if not labs or length > grid.size:
+        return []
+    lab_ids = [lab['id'] for lab in labs]
+    bitmaps = get_availability(lab_ids, dates, grid)
+    found = []
+    for d in dates:
+        day = date_key(d)
+        allowed = grid.full
+        if not_before is not None and date_key(not_before.date()) == day:
+            now_seconds = not_before.hour * 3600 + not_before.minute * 60 + not_before.second
+            skip = max(0, -(-(now_seconds - grid.open_seconds) // grid.slot_seconds))
+            allowed &= ~((1 << skip) - 1)
+        elif not_before is not None and day < date_key(not_before.date()):
+            continue
+        candidates = []
+        for lab in labs:
+            starts = _run_starts(~bitmaps[(lab['id'], day)] & grid.full, length) & allowed
+            while starts:
+                low = starts & -starts
+                candidates.append((low.bit_length() - 1, lab['id'], lab))
+                starts ^= low
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        for i, _, lab in candidates:
+            start = grid.slot_start(i)
+            end = start + int(duration_minutes) * 60
+            if end > grid.close_seconds:
+                continue
+            found.append((day, start, end, lab))
+            if len(found) >= limit:
+                return found
+    return found
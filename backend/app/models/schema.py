@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表结构注册表
+
+启动时（迁移完成后）一次性读取当前库所有表的列，业务接口通过 has_column / columns 在内存中判断
+兼容分支，不再每个请求查询 INFORMATION_SCHEMA。
+迁移或管理员刷新后递增 cache_versions 中的 schema 版本戳，其他进程最多每 SCHEMA_REGISTRY_POLL 秒
+复查一次版本戳，发现变化时重新加载。
+"""
+
+import os
+import time
+import logging
+import threading
+from backend.database import execute_query, bump_cache_version, get_cache_versions
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_SCOPE = 'schema'
+SCHEMA_REGISTRY_POLL = float(os.getenv('SCHEMA_REGISTRY_POLL', '30'))
+# 加载失败后的重试间隔，避免数据库不可用时每个请求都去查询
+SCHEMA_REGISTRY_RETRY = float(os.getenv('SCHEMA_REGISTRY_RETRY', '5'))
+
+class SchemaRegistry:
+    """当前库的 {表名: [列名...]}（按列序），按版本戳跨进程刷新"""
+
+    def __init__(self, poll_interval=SCHEMA_REGISTRY_POLL):
+        self.poll_interval = float(poll_interval)
+        self._lock = threading.Lock()
+        self._tables = None
+        self._version = None
+        self._checked = 0.0
+        self._failed_at = None
+        self._loaded_at = None
+        self._loads = 0
+
+    def load(self):
+        """读取所有表的列并替换内存中的结构，返回是否成功"""
+        versions = get_cache_versions([SCHEMA_VERSION_SCOPE])
+        result = execute_query(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        )
+        with self._lock:
+            self._checked = time.monotonic()
+            if not result['success']:
+                self._failed_at = self._checked
+                logger.warning(f"加载表结构失败: {result.get('error')}")
+                return False
+            tables = {}
+            for row in result['data']:
+                tables.setdefault(row['TABLE_NAME'], []).append(row['COLUMN_NAME'])
+            self._tables = {name: (cols, frozenset(cols)) for name, cols in tables.items()}
+            # 版本戳读取失败时保留旧值，下次轮询再对比
+            if versions is not None:
+                self._version = versions[SCHEMA_VERSION_SCOPE]
+            self._failed_at = None
+            self._loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._loads += 1
+        logger.info(f"表结构已加载: {len(tables)} 张表")
+        return True
+
+    def refresh(self, publish=True):
+        """重新加载；publish 时递增版本戳，通知其他进程一并刷新"""
+        if publish:
+            bump_cache_version(SCHEMA_VERSION_SCOPE)
+        return self.load()
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._tables is None:
+            if self._failed_at is not None and now - self._failed_at < SCHEMA_REGISTRY_RETRY:
+                return
+            self.load()
+            return
+        if now - self._checked < self.poll_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.poll_interval:
+                return
+            self._checked = now
+        versions = get_cache_versions([SCHEMA_VERSION_SCOPE])
+        if versions is not None and versions[SCHEMA_VERSION_SCOPE] != self._version:
+            logger.info("表结构版本已变化，重新加载")
+            self.load()
+
+    def columns(self, table):
+        """表的列名列表（按列序）；表不存在或结构未能加载时为空列表"""
+        self._ensure_current()
+        entry = (self._tables or {}).get(table)
+        return list(entry[0]) if entry else []
+
+    def has_table(self, table):
+        self._ensure_current()
+        return table in (self._tables or {})
+
+    def has_column(self, table, column):
+        self._ensure_current()
+        entry = (self._tables or {}).get(table)
+        return entry is not None and column in entry[1]
+
+    def stats(self):
+        tables = self._tables or {}
+        return {
+            'loaded': self._tables is not None,
+            'tables': len(tables),
+            'columns': sum(len(cols) for cols, _ in tables.values()),
+            'version': self._version,
+            'loads': self._loads,
+            'loaded_at': self._loaded_at
+        }
+
+schema_registry = SchemaRegistry()
+
+def has_column(table, column):
+    return schema_registry.has_column(table, column)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预约并发压测：验证同一实验室同一时段被并发预约时只有一条成功
+
+同时发起 N 个相同时段的创建预约请求（Flask 测试客户端，经过完整的认证、校验与事务流程），
+检查恰好一个请求成功、数据库中该时段恰好一条有效预约。会真实写库，请在测试库上执行
+（通过 DB_* 环境变量指定），所选时段必须事先没有有效预约。
+自动化测试见 backend/tests/test_reservation_concurrency.py（自建实验室与账号，RUN_DB_TESTS=1 时执行）。
+
+命令行：python -m backend.app.reservation_stress --laboratory-id L --user-id U
+        [--date YYYY-MM-DD] [--start HH:MM] [--end HH:MM] [--requests 200] [--cleanup]
+"""
+
+import os
+import json
+import logging
+import threading
+import importlib.util
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from backend.database import execute_query, execute_update
+
+logger = logging.getLogger(__name__)
+
+def _load_app():
+    # 包目录 app/ 与模块 app.py 同名，与 run.py 一样按路径加载 app.py
+    module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    spec = importlib.util.spec_from_file_location('backend_app', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.create_app()
+
+def _count_active(laboratory_id, reservation_date, start_time, end_time):
+    result = execute_query(
+        "SELECT COUNT(*) AS total FROM reservations "
+        "WHERE laboratory_id = %s AND reservation_date = %s AND start_time < %s AND end_time > %s "
+        "AND status IN ('pending', 'confirmed')",
+        (laboratory_id, reservation_date, end_time, start_time)
+    )
+    if not result['success']:
+        raise RuntimeError(f"查询预约失败: {result.get('error')}")
+    return result['data'][0]['total']
+
+def run_stress(laboratory_id, user_id, reservation_date, start_time, end_time, requests=200, cleanup=False):
+    """并发提交 requests 个相同时段的预约，返回报告；passed 为真表示恰好一条成功且只写入一条"""
+    before = _count_active(laboratory_id, reservation_date, start_time, end_time)
+    if before:
+        return {'success': False, 'error': f"所选时段已有 {before} 条有效预约，请换一个时段"}
+
+    app = _load_app()
+    with app.app_context():
+        from app.utils.auth import AuthUtils
+        token = AuthUtils.generate_token({'id': user_id, 'username': 'stress', 'role': 'student'})
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = {
+        'laboratory_id': laboratory_id,
+        'reservation_date': reservation_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'purpose': '并发预约压测'
+    }
+    # 所有线程就绪后同时发出请求，尽量让事务在实验室行锁上竞争
+    barrier = threading.Barrier(requests)
+
+    def book(_):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/reservations', json=payload, headers=headers)
+        body = response.get_json(silent=True) or {}
+        return response.status_code, body
+
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        responses = list(pool.map(book, range(requests)))
+
+    succeeded = [body for status, body in responses if status in (200, 201) and body.get('success')]
+    statuses = {}
+    for status, _ in responses:
+        statuses[status] = statuses.get(status, 0) + 1
+    inserted = _count_active(laboratory_id, reservation_date, start_time, end_time)
+    report = {
+        'success': True,
+        'passed': len(succeeded) == 1 and inserted == 1,
+        'requests': requests,
+        'succeeded': len(succeeded),
+        'inserted': inserted,
+        'status_codes': statuses
+    }
+    if cleanup:
+        ids = [body['data']['id'] for body in succeeded if body.get('data')]
+        if ids:
+            result = execute_update(
+                "DELETE FROM reservations WHERE id IN ({})".format(','.join(['%s'] * len(ids))), tuple(ids)
+            )
+            report['cleaned'] = result.get('affected_rows', 0)
+    return report
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='预约并发压测：同一时段并发预约只能成功一条')
+    parser.add_argument('--laboratory-id', type=int, required=True, help='可预约的实验室 ID')
+    parser.add_argument('--user-id', type=int, required=True, help='发起预约的用户 ID（需存在）')
+    parser.add_argument('--date', default=(date.today() + timedelta(days=30)).isoformat(), help='预约日期，默认 30 天后')
+    parser.add_argument('--start', default='10:00', help='开始时间 HH:MM')
+    parser.add_argument('--end', default='11:00', help='结束时间 HH:MM')
+    parser.add_argument('--requests', type=int, default=200, help='并发请求数')
+    parser.add_argument('--cleanup', action='store_true', help='结束后删除压测写入的预约')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = run_stress(args.laboratory_id, args.user_id, args.date, args.start, args.end, args.requests, args.cleanup)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if report['success'] and report['passed'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程课表 → 实验室预约生成任务
+
+课程在 courses.schedule 中保存上课规律（星期、起止时间、起止周次、单双周），结合 semester_start
+（第 1 周内任一日期）展开为具体日期，为需要实验室的课程生成 reservations（course_id 关联课程）。
+
+- 增量：只比较从 from_date（默认今天）起的课程预约，新增缺少的场次、删除课表中已不存在且仍有效的场次，
+  未变化的场次不动；被人工取消的场次视为已处理，不会重新生成；
+- 冲突检测按集合进行：一次范围查询取出相关实验室在整个日期范围内的有效预约，在内存区间索引中批量判断重叠，
+  冲突场次跳过并写入报告，不影响其他场次；
+- 整批在一个事务中执行，先按实验室 id 顺序锁定实验室行，与单条预约创建互斥。
+
+可通过管理员接口或命令行执行：python -m backend.app.timetable [--semester S] [--course-id N ...] [--from-date D] [--dry-run]
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import date, timedelta
+from backend.database import transaction, execute_query, execute_update, execute_batch
+from app.models.schedule import LabDaySchedule, ACTIVE_STATUSES, to_seconds, format_seconds, reservation_index
+
+logger = logging.getLogger(__name__)
+
+COURSE_SEMESTER_WEEKS = int(os.getenv('COURSE_SEMESTER_WEEKS', 16))
+TIMETABLE_CHUNK = int(os.getenv('TIMETABLE_CHUNK', 500))
+COURSE_SESSION_NOTE = '[系统] 按课程课表生成'
+
+PARITIES = ('all', 'odd', 'even')
+
+def parse_schedule(value):
+    """校验并规范化课表：[{weekday 1-7, start_time, end_time, start_week, end_week, parity}]，格式错误抛出 ValueError"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError("课表不是有效的 JSON")
+    if not isinstance(value, list):
+        raise ValueError("课表应为上课规律列表")
+    meetings = []
+    for i, item in enumerate(value, start=1):
+        if not isinstance(item, dict):
+            raise ValueError(f"第{i}条上课规律格式错误")
+        try:
+            weekday = int(item.get('weekday'))
+            start = to_seconds(item.get('start_time'))
+            end = to_seconds(item.get('end_time'))
+            start_week = int(item.get('start_week') or 1)
+            end_week = int(item.get('end_week') or COURSE_SEMESTER_WEEKS)
+        except (TypeError, ValueError):
+            raise ValueError(f"第{i}条上课规律的星期、时间或周次格式错误")
+        parity = item.get('parity') or 'all'
+        if not 1 <= weekday <= 7:
+            raise ValueError(f"第{i}条上课规律的星期应为 1-7")
+        if start is None or end is None or not 0 <= start < end <= 24 * 3600:
+            raise ValueError(f"第{i}条上课规律的开始时间必须早于结束时间")
+        if not 1 <= start_week <= end_week:
+            raise ValueError(f"第{i}条上课规律的周次范围无效")
+        if parity not in PARITIES:
+            raise ValueError(f"第{i}条上课规律的单双周应为 {'/'.join(PARITIES)}")
+        meetings.append({
+            'weekday': weekday,
+            'start_time': format_seconds(start),
+            'end_time': format_seconds(end),
+            'start_week': start_week,
+            'end_week': end_week,
+            'parity': parity
+        })
+    return meetings
+
+def meeting_dates(semester_start, meeting):
+    """按上课规律展开日期；semester_start 为第 1 周内任一日期"""
+    if isinstance(semester_start, str):
+        semester_start = date.fromisoformat(semester_start)
+    monday = semester_start - timedelta(days=semester_start.weekday())
+    for week in range(meeting['start_week'], meeting['end_week'] + 1):
+        if (meeting['parity'] == 'odd' and week % 2 == 0) or (meeting['parity'] == 'even' and week % 2 == 1):
+            continue
+        yield monday + timedelta(weeks=week - 1, days=meeting['weekday'] - 1)
+
+def _chunks(values, size=TIMETABLE_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _query(sql, params=None):
+    result = execute_query(sql, params)
+    if not result['success']:
+        raise RuntimeError(result.get('error'))
+    return result['data']
+
+def _query_in(sql_template, values, extra_params=()):
+    """按分块 IN 查询并合并结果；sql_template 中 {} 为 IN 列表占位"""
+    rows = []
+    for chunk in _chunks(values):
+        rows.extend(_query(sql_template.format(','.join(['%s'] * len(chunk))), tuple(chunk) + tuple(extra_params)))
+    return rows
+
+def _load_courses(semester, course_ids):
+    sql = (
+        "SELECT id, code, name, teacher_id, status, requires_lab, laboratory_id, schedule, semester_start "
+        "FROM courses WHERE 1=1"
+    )
+    params = []
+    if semester:
+        sql += " AND semester = %s"
+        params.append(semester)
+    if course_ids:
+        sql += " AND id IN ({})".format(','.join(['%s'] * len(course_ids)))
+        params.extend(course_ids)
+    return _query(sql + " ORDER BY id", tuple(params))
+
+def _desired_sessions(courses, from_date, report):
+    """课程 → 期望场次 {(course_id, lab_id, 日期, 开始秒, 结束秒): 课程行}；不具备生成条件的课程计入 skipped"""
+    desired = {}
+    for course in courses:
+        if not course.get('schedule'):
+            continue
+        reason = None
+        try:
+            meetings = parse_schedule(course['schedule'])
+        except ValueError as e:
+            meetings, reason = [], str(e)
+        if reason is None:
+            if course['status'] != 'active' or not course.get('requires_lab'):
+                continue
+            if not course.get('laboratory_id'):
+                reason = '未关联实验室'
+            elif not course.get('semester_start'):
+                reason = '未设置学期开始日期'
+            elif not course.get('teacher_id'):
+                reason = '未设置授课教师'
+        if reason:
+            report['skipped'].append({'course_id': course['id'], 'code': course['code'], 'reason': reason})
+            continue
+        for meeting in meetings:
+            start, end = to_seconds(meeting['start_time']), to_seconds(meeting['end_time'])
+            for day in meeting_dates(course['semester_start'], meeting):
+                if day >= from_date:
+                    desired[(course['id'], course['laboratory_id'], day, start, end)] = course
+    return desired
+
+def _session_key(row):
+    return (row['course_id'], row['laboratory_id'], row['reservation_date'],
+            to_seconds(row['start_time']), to_seconds(row['end_time']))
+
+def _find_conflicts(candidates, removed_ids):
+    """批量冲突检测：一次查询取出候选场次所在实验室、日期范围内的有效预约，按 (实验室, 日期) 建区间索引；
+    候选场次之间也互相检查（按日期、时间顺序先到先得）。返回 (可插入键列表, 冲突列表)"""
+    if not candidates:
+        return [], []
+    lab_ids = sorted({key[1] for key in candidates})
+    days = [key[2] for key in candidates]
+    booked = _query_in(
+        "SELECT id, course_id, laboratory_id, reservation_date, start_time, end_time FROM reservations "
+        "WHERE laboratory_id IN ({}) AND reservation_date BETWEEN %s AND %s "
+        "AND status IN (" + ','.join(['%s'] * len(ACTIVE_STATUSES)) + ")",
+        lab_ids, (min(days), max(days)) + ACTIVE_STATUSES
+    )
+    by_day = {}
+    for row in booked:
+        if row['id'] not in removed_ids:
+            by_day.setdefault((row['laboratory_id'], row['reservation_date']), []).append(row)
+    indexes = {key: LabDaySchedule(rows) for key, rows in by_day.items()}
+
+    accepted, conflicts, planned = [], [], {}
+    for key in sorted(candidates, key=lambda k: (k[2], k[3], k[1], k[0])):
+        course_id, lab_id, day, start, end = key
+        index = indexes.get((lab_id, day))
+        clashes = [
+            {'id': row['id'], 'course_id': row.get('course_id'),
+             'start_time': format_seconds(to_seconds(row['start_time'])),
+             'end_time': format_seconds(to_seconds(row['end_time']))}
+            for row in (index.overlapping(start, end) if index else [])
+        ]
+        clashes.extend(
+            {'id': None, 'course_id': other, 'start_time': format_seconds(s), 'end_time': format_seconds(e)}
+            for s, e, other in planned.get((lab_id, day), ()) if s < end and e > start
+        )
+        if clashes:
+            conflicts.append({
+                'course_id': course_id,
+                'code': candidates[key]['code'],
+                'laboratory_id': lab_id,
+                'date': day.isoformat(),
+                'start_time': format_seconds(start),
+                'end_time': format_seconds(end),
+                'conflicts_with': clashes
+            })
+            continue
+        planned.setdefault((lab_id, day), []).append((start, end, course_id))
+        accepted.append(key)
+    return accepted, conflicts
+
+def _lock_labs(courses, desired, from_date):
+    """锁定本次可能写入的实验室行（按 id 顺序），必须是事务内的第一批语句：
+    InnoDB 在事务的第一条普通 SELECT 时建立一致性快照，先加锁再读，才能看到加锁前已提交的单条预约"""
+    lab_ids = {key[1] for key in desired}
+    lab_ids.update(course['laboratory_id'] for course in courses if course.get('laboratory_id'))
+    # 已生成场次所在的实验室（课程换过实验室时与当前不同）；加锁读取最新数据，不建立快照
+    lab_ids.update(row['laboratory_id'] for row in _query_in(
+        "SELECT DISTINCT laboratory_id FROM reservations WHERE course_id IN ({}) AND reservation_date >= %s "
+        "LOCK IN SHARE MODE",
+        [course['id'] for course in courses], (from_date,)
+    ))
+    if lab_ids:
+        _query_in("SELECT id FROM laboratories WHERE id IN ({}) ORDER BY id FOR UPDATE", sorted(lab_ids))
+
+def _apply(courses, desired, from_date, dry_run, report):
+    if not dry_run:
+        # 与单条预约创建（同样先锁实验室行）互斥，冲突检测结果在提交前保持有效
+        _lock_labs(courses, desired, from_date)
+    course_ids = [course['id'] for course in courses]
+    existing = _query_in(
+        "SELECT id, course_id, laboratory_id, reservation_date, start_time, end_time, status FROM reservations "
+        "WHERE course_id IN ({}) AND reservation_date >= %s",
+        course_ids, (from_date,)
+    )
+    existing_keys = {_session_key(row) for row in existing}
+    # 课表中已不存在的有效场次删除；已取消/已完成的保留作为记录
+    removed = [row for row in existing if row['status'] in ACTIVE_STATUSES and _session_key(row) not in desired]
+    removed_ids = {row['id'] for row in removed}
+    candidates = {key: course for key, course in desired.items() if key not in existing_keys}
+    accepted, conflicts = _find_conflicts(candidates, removed_ids)
+
+    report['unchanged'] = len(desired) - len(candidates)
+    report['created'] = len(accepted)
+    report['removed'] = len(removed)
+    report['conflicts'] = conflicts
+    if dry_run or not (removed or accepted):
+        return set()
+
+    enrolled = {
+        row['course_id']: row['count'] for row in _query_in(
+            "SELECT course_id, COUNT(*) AS count FROM course_students WHERE course_id IN ({}) GROUP BY course_id",
+            sorted({key[0] for key in accepted})
+        )
+    } if accepted else {}
+    for chunk in _chunks(sorted(removed_ids)):
+        result = execute_update(
+            "DELETE FROM reservations WHERE id IN ({}) AND status IN ({})".format(
+                ','.join(['%s'] * len(chunk)), ','.join(['%s'] * len(ACTIVE_STATUSES))),
+            tuple(chunk) + ACTIVE_STATUSES
+        )
+        if not result['success']:
+            raise RuntimeError(result.get('error'))
+    rows = []
+    for key in accepted:
+        course_id, lab_id, day, start, end = key
+        course = candidates[key]
+        rows.append((
+            course['teacher_id'], lab_id, course_id, day, format_seconds(start), format_seconds(end),
+            f"课程实验：{course['code']} {course['name']}"[:200], max(1, enrolled.get(course_id, 0)),
+            'confirmed', COURSE_SESSION_NOTE
+        ))
+    batch = execute_batch(
+        "INSERT INTO reservations (user_id, laboratory_id, course_id, reservation_date, start_time, end_time, "
+        "purpose, participant_count, status, notes) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        rows, chunk_size=TIMETABLE_CHUNK
+    )
+    if not batch['success']:
+        raise RuntimeError(batch.get('error'))
+    return {row['laboratory_id'] for row in removed} | {key[1] for key in accepted}
+
+def materialize_course_sessions(semester=None, course_ids=None, from_date=None, dry_run=False):
+    """按课表生成/同步课程的实验室预约，返回报告（created/removed/unchanged/conflicts/skipped）；
+    dry_run 时只计算差异与冲突，不写入"""
+    started = time.monotonic()
+    from_date = from_date or date.today()
+    if isinstance(from_date, str):
+        from_date = date.fromisoformat(from_date)
+    report = {
+        'success': True, 'dry_run': bool(dry_run), 'from_date': from_date.isoformat(), 'courses': 0,
+        'created': 0, 'removed': 0, 'unchanged': 0, 'conflicts': [], 'skipped': []
+    }
+    labs = set()
+    try:
+        courses = _load_courses(semester, course_ids)
+        report['courses'] = len(courses)
+        if courses:
+            desired = _desired_sessions(courses, from_date, report)
+            if dry_run:
+                _apply(courses, desired, from_date, True, report)
+            else:
+                with transaction():
+                    labs = _apply(courses, desired, from_date, False, report)
+    except Exception as e:
+        report['success'] = False
+        report['error'] = str(e)
+        logger.error(f"课程预约生成失败: {str(e)}")
+    # 预约变化影响占用判断，失效相关实验室的区间索引
+    for lab_id in labs:
+        reservation_index.invalidate(lab_id)
+    report['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+    if report['success']:
+        logger.info(
+            f"课程预约生成完成{'（试运行）' if dry_run else ''}: 课程 {report['courses']} 门, 新增 {report['created']}, "
+            f"删除 {report['removed']}, 未变 {report['unchanged']}, 冲突 {len(report['conflicts'])}, "
+            f"跳过课程 {len(report['skipped'])}, 耗时 {report['duration_ms']}ms"
+        )
+    return report
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='按课程课表生成/同步实验室预约')
+    parser.add_argument('--semester', help='只处理指定学期的课程')
+    parser.add_argument('--course-id', type=int, action='append', dest='course_ids', help='只处理指定课程，可重复')
+    parser.add_argument('--from-date', help='从该日期（YYYY-MM-DD）起同步，默认今天')
+    parser.add_argument('--dry-run', action='store_true', help='只输出差异与冲突报告，不写入')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = materialize_course_sessions(args.semester, args.course_ids, args.from_date, args.dry_run)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if report['success'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,7 +5,7 @@
 """
 
 from .auth import AuthUtils, require_auth, require_role, optional_auth, get_current_user, is_authenticated, has_role, has_any_role
-from .validation import Validator, ValidationError, validate_json_data, validate_query_params
+from .validation import Validator, ValidationError, validate_json_data, validate_query_params, read_optional_json
 from .response import (
     ResponseHelper, 
     success_response, 
@@ -21,6 +21,8 @@ from .response import (
     updated_response,
     deleted_response
 )
+from .singleflight import SingleFlight, single_flight, get_single_flight_stats
+from .spreadsheet import SpreadsheetError, iter_spreadsheet_rows
 
 __all__ = [
     # 认证相关
@@ -38,6 +40,7 @@ __all__ = [
     'ValidationError',
     'validate_json_data',
     'validate_query_params',
+    'read_optional_json',
     
     # 响应相关
     'ResponseHelper',
@@ -52,5 +55,14 @@ __all__ = [
     'internal_error_response',
     'created_response',
     'updated_response',
-    'deleted_response'
+    'deleted_response',
+
+    # 请求合并
+    'SingleFlight',
+    'single_flight',
+    'get_single_flight_stats',
+
+    # 表格文件读取
+    'SpreadsheetError',
+    'iter_spreadsheet_rows'
 ]
\ No newline at end of file
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并（single-flight）工具
+
+同一进程内，参数与权限范围完全相同的并发 GET 请求只执行一次视图函数，
+其余请求等待首个请求完成后复用其响应，避免高峰期重复执行同一重查询。
+"""
+
+import os
+import time
+import logging
+import threading
+from functools import wraps
+from flask import request, current_app
+
+logger = logging.getLogger(__name__)
+
+# 跟随请求等待首个请求的最长秒数，超时后自行执行
+SINGLE_FLIGHT_WAIT = float(os.getenv('SINGLE_FLIGHT_WAIT', '30'))
+
+class _Call:
+    __slots__ = ('event', 'response')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+class SingleFlight:
+    """按键合并并发调用：首个调用者执行，其余调用者等待并共享结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def _count(self, name, field):
+        stats = self._stats.setdefault(name, {'leaders': 0, 'hits': 0, 'fallbacks': 0})
+        stats[field] += 1
+
+    def do(self, name, key, fn, timeout=None):
+        """执行 fn 或等待进行中的同键调用；返回 (结果, 是否为共享结果)。
+        首个调用者抛出异常或未产出结果时，跟随者各自执行 fn。"""
+        timeout = SINGLE_FLIGHT_WAIT if timeout is None else timeout
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._count(name, 'leaders')
+        if leader:
+            try:
+                call.response = fn()
+                return call.response, False
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.event.set()
+        if call.event.wait(timeout) and call.response is not None:
+            with self._lock:
+                self._count(name, 'hits')
+            return call.response, True
+        with self._lock:
+            self._count(name, 'fallbacks')
+        return fn(), False
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+            per_endpoint = {name: dict(s) for name, s in self._stats.items()}
+        totals = {'leaders': 0, 'hits': 0, 'fallbacks': 0}
+        for s in per_endpoint.values():
+            for field in totals:
+                totals[field] += s[field]
+        return dict(totals, in_flight=in_flight, endpoints=per_endpoint)
+
+single_flight_group = SingleFlight()
+
+def _scope_of(scope):
+    user = getattr(request, 'current_user', None) or {}
+    if callable(scope):
+        return scope(user)
+    if scope == 'user':
+        return ('user', user.get('id') or user.get('user_id'))
+    return ('role', user.get('role'))
+
+def single_flight(scope='role', timeout=None):
+    """视图装饰器（置于认证/参数校验装饰器之后）：按 端点 + 规范化查询参数 + 权限范围 合并并发的相同请求。
+    scope 为 'role'（同角色共享）、'user'（同用户共享）或接收当前用户返回范围键的函数。"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+            params = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if v != ''))
+            key = (request.endpoint, tuple(sorted(kwargs.items())), params, _scope_of(scope))
+
+            def run():
+                response = current_app.make_response(f(*args, **kwargs))
+                # 只共享响应体与状态，各请求各自构造响应对象，互不影响后续的 after_request 处理
+                return response.get_data(), response.status_code, list(response.headers.items())
+
+            started = time.monotonic()
+            (body, status, headers), shared = single_flight_group.do(request.endpoint, key, run, timeout)
+            if shared:
+                logger.debug(f"请求已合并: {request.endpoint}，等待 {round((time.monotonic() - started) * 1000, 1)}ms")
+            return current_app.response_class(body, status=status, headers=headers)
+        return decorated_function
+    return decorator
+
+def get_single_flight_stats():
+    return single_flight_group.stats()
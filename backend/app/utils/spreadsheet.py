@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格文件逐行读取工具（CSV / XLSX）
+
+只依赖标准库：CSV 按行流式解码；XLSX 是 zip 包内的 XML，逐个元素解析第一个工作表，
+不把整张表构建为对象树。单元格统一返回去除首尾空白的字符串。
+"""
+
+import io
+import csv
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+SPREADSHEET_EXTENSIONS = ('csv', 'xlsx')
+
+class SpreadsheetError(ValueError):
+    """文件格式不支持或内容无法解析"""
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+def iter_spreadsheet_rows(stream, filename):
+    """按扩展名读取 CSV/XLSX，逐行产出 (行号, 单元格字符串列表)；行号从 1 开始，空行跳过"""
+    ext = _extension(filename)
+    if ext == 'csv':
+        rows = _iter_csv(stream)
+    elif ext == 'xlsx':
+        rows = _iter_xlsx(stream)
+    else:
+        raise SpreadsheetError(f"不支持的文件类型，仅支持: {', '.join(SPREADSHEET_EXTENSIONS)}")
+    for number, row in rows:
+        if any(row):
+            yield number, row
+
+def _iter_csv(stream):
+    # utf-8-sig 兼容 Excel 导出带 BOM 的 CSV
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        for number, row in enumerate(csv.reader(text), start=1):
+            yield number, [cell.strip() for cell in row]
+    except UnicodeDecodeError:
+        raise SpreadsheetError("CSV 文件需为 UTF-8 编码")
+    except csv.Error as e:
+        raise SpreadsheetError(f"CSV 解析失败: {str(e)}")
+    finally:
+        text.detach()
+
+def _column_index(ref):
+    """单元格引用（如 'AB12'）转为从 0 开始的列号"""
+    index = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + (ord(ch.upper()) - ord('A') + 1)
+    return index - 1
+
+def _first_sheet_path(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    sheet = workbook.find(f'{_NS}sheets/{_NS}sheet')
+    if sheet is None:
+        raise SpreadsheetError("XLSX 文件中没有工作表")
+    rel_id = sheet.get(f'{_REL_NS}id')
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{_PKG_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    raise SpreadsheetError("XLSX 文件结构不完整")
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f'{_NS}si':
+                strings.append(''.join(t.text or '' for t in elem.iter(f'{_NS}t')))
+                elem.clear()
+    return strings
+
+def _cell_value(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f'{_NS}t'))
+    value = cell.findtext(f'{_NS}v')
+    if value is None:
+        return ''
+    if kind == 's':
+        return strings[int(value)]
+    return value
+
+def _iter_xlsx(stream):
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise SpreadsheetError("XLSX 文件已损坏或格式不正确")
+    with archive:
+        try:
+            sheet_path = _first_sheet_path(archive)
+            strings = _shared_strings(archive)
+            number = 0
+            with archive.open(sheet_path) as f:
+                for _, elem in ET.iterparse(f):
+                    if elem.tag != f'{_NS}row':
+                        continue
+                    number = int(elem.get('r') or number + 1)
+                    row = []
+                    for cell in elem.iter(f'{_NS}c'):
+                        ref = cell.get('r')
+                        if ref:
+                            row.extend([''] * (_column_index(ref) - len(row)))
+                        row.append(_cell_value(cell, strings).strip())
+                    elem.clear()
+                    yield number, row
+        except (KeyError, ET.ParseError, IndexError, ValueError) as e:
+            if isinstance(e, SpreadsheetError):
+                raise
+            raise SpreadsheetError(f"XLSX 解析失败: {str(e)}")
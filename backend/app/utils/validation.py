@@ -126,6 +126,18 @@ class Validator:
         """日期字符串验证"""
         return Validator.is_datetime_string(value, field_name, format)
     
+    @staticmethod
+    def is_integer_list(value: Any, field_name: str = "字段", max_length: int = None) -> List[int]:
+        """整数列表验证（去重并保持顺序）"""
+        if not isinstance(value, list) or any(isinstance(v, bool) or not isinstance(v, int) for v in value):
+            raise ValidationError(f"{field_name}必须是整数列表", field_name)
+        
+        value = list(dict.fromkeys(value))
+        if max_length and len(value) > max_length:
+            raise ValidationError(f"{field_name}最多包含{max_length}项", field_name)
+        
+        return value
+    
     @staticmethod
     def is_password(value: str, field_name: str = "密码", min_length: int = 8) -> str:
         """密码验证"""
@@ -312,4 +324,39 @@ def validate_query_params(validation_rules: Dict[str, Dict[str, Any]]):
                 }), 500
         
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
+
+_OPTIONAL_FIELD_CHECKS = {
+    'string': lambda value, field, rules: Validator.is_string(value, field, rules.get('min_length', 0), rules.get('max_length')),
+    'integer': lambda value, field, rules: Validator.is_integer(value, field, rules.get('min_value'), rules.get('max_value')),
+    'float': lambda value, field, rules: Validator.is_float(value, field, rules.get('min_value'), rules.get('max_value')),
+    'date': lambda value, field, rules: Validator.is_date_string(value, field, rules.get('format', '%Y-%m-%d')),
+    'integer_list': lambda value, field, rules: Validator.is_integer_list(value, field, rules.get('max_length')),
+}
+
+def read_optional_json(validation_rules: Dict[str, Dict[str, Any]]):
+    """读取字段全部可选的 JSON 请求体：没有请求体或为空对象时按全部缺省处理（validate_json_data 会拒绝空请求体），
+    有值的字段按规则校验。返回 (数据, 错误响应)，校验通过时错误响应为 None"""
+    body = {}
+    if request.get_data(cache=True).strip():
+        body = request.get_json(silent=True, force=True)
+        if not isinstance(body, dict):
+            return None, (jsonify({
+                'success': False,
+                'message': '请求数据必须是JSON对象',
+                'code': 'INVALID_JSON'
+            }), 400)
+    data = {}
+    try:
+        for field, rules in validation_rules.items():
+            value = body.get(field)
+            check = _OPTIONAL_FIELD_CHECKS.get(rules.get('type'))
+            data[field] = check(value, field, rules) if value is not None and check else value
+    except ValidationError as e:
+        return None, (jsonify({
+            'success': False,
+            'message': e.message,
+            'field': e.field,
+            'code': 'VALIDATION_ERROR'
+        }), 400)
+    return data, None
@@ -5,9 +5,21 @@
 """
 
 import os
+import re
 import sys
+import json
+import time
+import base64
 import logging
+import threading
 import pymysql
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from pymysql.constants import SERVER_STATUS
+from flask import g, current_app, has_app_context
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -39,108 +51,1000 @@ DB_DSN = {
     'autocommit': True
 }
 
+# ===== 连接池配置 =====
+# 每个 gunicorn worker 进程各自持有一个连接池，max_size * worker 数不应超过数据库 max_connections。
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),              # 空闲回收时至少保留的连接数
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),             # 单进程最大连接数
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),  # 空闲超过该秒数的连接被关闭
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')), # 连接最长存活秒数
+    'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', '30')), # 借出前若空闲超过该秒数则 ping（0 表示每次都 ping）
+    'acquire_timeout': float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10'))  # 连接耗尽时的最长等待秒数
+}
+
+# ===== 并行只读查询 =====
+# 工作线程各自从连接池借出连接，线程数应小于连接池上限，给请求会话留出余量
+PARALLEL_QUERY_WORKERS = int(os.getenv('DB_PARALLEL_WORKERS', str(max(1, DB_POOL_CONFIG['max_size'] // 2))))
+PARALLEL_QUERY_TIMEOUT = float(os.getenv('DB_PARALLEL_TIMEOUT', '10'))
+_SELECT_HEAD_RE = re.compile(r'^\s*SELECT\b', re.I)
+
+def _with_execution_limit(sql, timeout):
+    """为 SELECT 加上 MAX_EXECUTION_TIME 优化器提示，超时后由服务端中止，不支持的服务端视为注释"""
+    if not timeout:
+        return sql
+    return _SELECT_HEAD_RE.sub(f'SELECT /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */', sql, count=1)
+
+# ===== 游标（keyset）分页 =====
+_KEYSET_COLUMN_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def _cursor_value(value):
+    """将排序键值转换为可 JSON 序列化、且可直接与列比较的字面量"""
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def encode_cursor(values):
+    """将最后一行的排序键编码为不透明的游标字符串"""
+    raw = json.dumps([_cursor_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    """解码游标，格式不合法时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('无效的分页游标')
+    return values
+
+def _keyset_condition(keyset, values):
+    """按排序键生成 seek 条件：(a < x) OR (a = x AND b < y) OR ...，支持混合升降序"""
+    conditions = []
+    params = []
+    for i, (column, direction) in enumerate(keyset):
+        op = '<' if direction.upper() == 'DESC' else '>'
+        parts = [f"`keyset_page`.`{c}` = %s" for c, _ in keyset[:i]]
+        parts.append(f"`keyset_page`.`{column}` {op} %s")
+        conditions.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:i + 1])
+    return '(' + ' OR '.join(conditions) + ')', params
+
+# ===== 分页总数缓存 =====
+COUNT_CACHE_TTL = float(os.getenv('DB_COUNT_CACHE_TTL', '30'))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv('DB_COUNT_CACHE_MAX_ENTRIES', '1000'))
+# count=estimate 时，EXPLAIN 估算行数不低于该值才直接返回估算值，否则仍精确计数
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv('DB_COUNT_ESTIMATE_THRESHOLD', '100000'))
+
+_READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+`?([A-Za-z_][A-Za-z0-9_]*)`?', re.I)
+_WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+`?([A-Za-z_][A-Za-z0-9_]*)`?',
+    re.I
+)
+# 触发器带来的级联写入（见 create_triggers）
+_CASCADE_WRITES = {
+    'equipment_repair': ('equipment',),
+    'reservations': ('reservation_daily_stats',)
+}
+
+def tables_read_by(sql):
+    """粗略提取 SQL 中 FROM/JOIN 引用的表名"""
+    return {name.lower() for name in _READ_TABLES_RE.findall(sql or '')}
+
+def tables_written_by(sql):
+    """提取写语句的目标表（含触发器级联的表）"""
+    m = _WRITE_TABLE_RE.match(sql or '')
+    if not m:
+        return set()
+    table = m.group(1).lower()
+    return {table, *_CASCADE_WRITES.get(table, ())}
+
+def _cache_key(sql, params):
+    return ' '.join((sql or '').split()) + '\x00' + repr(tuple(params or ()))
+
+_MISS = object()
+
+# ===== 查询结果缓存 =====
+QUERY_CACHE_TTL = float(os.getenv('DB_QUERY_CACHE_TTL', '60'))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('DB_QUERY_CACHE_MAX_ENTRIES', '2000'))
+# 这些表被写入时递增 cache_versions 中的 table:<表名> 版本戳，其他进程按 DB_QUERY_CACHE_POLL 秒轮询后失效本地缓存；
+# 未列出的表只在本进程内失效，跨进程依赖 TTL
+QUERY_CACHE_TABLES = frozenset(
+    t.strip().lower() for t in os.getenv('DB_QUERY_CACHE_TABLES', 'laboratories,equipment,courses,course_students,users').split(',')
+    if t.strip()
+)
+QUERY_CACHE_POLL = float(os.getenv('DB_QUERY_CACHE_POLL', '2'))
+TABLE_VERSION_PREFIX = 'table:'
+
+def _copy_rows(rows):
+    """缓存中的行与返回给调用方的行互不共享，调用方可自由修改"""
+    return [dict(row) for row in rows]
+
+class TableTaggedCache:
+    """按表打标签的 LRU + TTL 缓存：条目记录所依赖表的版本号，任一表被写入即失效"""
+
+    MISS = _MISS  # get() 未命中时的返回值
+
+    def __init__(self, max_entries=1000, ttl=30.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._versions = {}
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def snapshot(self, tables):
+        """计算前先取版本快照，避免把写入前算出的结果以写入后的版本存入"""
+        tables = tuple(sorted(tables))
+        with self._lock:
+            return tables, tuple(self._versions.get(t, 0) for t in tables)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, tables, versions, value = item
+                if expires_at > now and versions == tuple(self._versions.get(t, 0) for t in tables):
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._data[key]
+            self._stats['misses'] += 1
+            return _MISS
+
+    def set(self, key, value, snapshot, ttl=None):
+        tables, versions = snapshot
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, tables, versions, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, tables):
+        if not tables:
+            return
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._data))
+
+class PoolExhaustedError(Exception):
+    """连接池已满且等待超时"""
+    pass
+
+class _PoolEntry:
+    """连接池内部记录：原始连接及其创建/最近使用时间"""
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class PooledConnection:
+    """借出的连接代理：用法与 pymysql 连接一致，close() 时归还连接池而非断开"""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get('_entry')
+        if entry is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还连接池')
+        return getattr(entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry)
+
+    def discard(self):
+        """断开底层连接后归还（连接池会将其淘汰），用于连接状态不可复用的场景"""
+        entry = self._entry
+        if entry is not None:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
+        self.close()
+
+class ConnectionPool:
+    """线程安全的有界连接池（LIFO 复用，借出时按需 ping，超龄/超时连接自动淘汰）"""
+
+    def __init__(self, dsn: dict, min_size=1, max_size=10, idle_timeout=300.0,
+                 max_lifetime=3600.0, ping_interval=30.0, acquire_timeout=10.0):
+        self._dsn = dict(dsn or {})
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.idle_timeout = float(idle_timeout)
+        self.max_lifetime = float(max_lifetime)
+        self.ping_interval = float(ping_interval)
+        self.acquire_timeout = float(acquire_timeout)
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []   # 栈顶为最近归还的连接
+        self._size = 0    # 已创建且未关闭的连接数（空闲 + 使用中）
+        self._stats = {'created': 0, 'closed': 0, 'borrowed': 0, 'waits': 0, 'wait_time': 0.0, 'timeouts': 0}
+
+    def _check_fork(self):
+        # gunicorn --preload 场景下 fork 出的子进程不能复用父进程的 socket
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime > 0 and now - entry.created_at > self.max_lifetime
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _discard(self, entry):
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+        self._close_raw(entry.raw)
+
+    def acquire(self, timeout=None):
+        """借出一个连接，池满时最多等待 timeout 秒"""
+        self._check_fork()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        while True:
+            entry = None
+            with self._cond:
+                wait_start = None
+                while not self._idle and self._size >= self.max_size:
+                    now = time.monotonic()
+                    if wait_start is None:
+                        wait_start = now
+                        self._stats['waits'] += 1
+                    remaining = wait_start + timeout - now
+                    if remaining <= 0:
+                        self._stats['wait_time'] += now - wait_start
+                        self._stats['timeouts'] += 1
+                        raise PoolExhaustedError(f"数据库连接池已满（max_size={self.max_size}），等待 {timeout} 秒超时")
+                    self._cond.wait(remaining)
+                if wait_start is not None:
+                    self._stats['wait_time'] += time.monotonic() - wait_start
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if entry is None:
+                try:
+                    entry = _PoolEntry(pymysql.connect(**self._dsn))
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                    self._stats['borrowed'] += 1
+                return PooledConnection(self, entry)
+
+            now = time.monotonic()
+            if self._expired(entry, now):
+                self._discard(entry)
+                continue
+            if now - entry.last_used >= self.ping_interval:
+                try:
+                    entry.raw.ping(reconnect=False)
+                except Exception:
+                    self._discard(entry)
+                    continue
+            with self._cond:
+                self._stats['borrowed'] += 1
+            return PooledConnection(self, entry)
+
+    def release(self, entry):
+        """归还连接：回滚未结束的事务，断开或超龄的连接直接关闭"""
+        raw = entry.raw
+        discard = not raw.open or self._expired(entry, time.monotonic())
+        if not discard:
+            try:
+                if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    raw.rollback()
+                autocommit = bool(self._dsn.get('autocommit', False))
+                if raw.get_autocommit() != autocommit:
+                    raw.autocommit(autocommit)
+            except Exception:
+                discard = True
+
+        to_close = []
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            now = time.monotonic()
+            if discard:
+                self._size -= 1
+                self._stats['closed'] += 1
+                to_close.append(raw)
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+            # 回收空闲过久的连接（栈底最久未用），保留 min_size 个
+            while (len(self._idle) > self.min_size and self.idle_timeout > 0
+                   and now - self._idle[0].last_used > self.idle_timeout):
+                to_close.append(self._idle.pop(0).raw)
+                self._size -= 1
+                self._stats['closed'] += 1
+            self._cond.notify()
+        for r in to_close:
+            self._close_raw(r)
+
+    def close(self):
+        """关闭所有空闲连接（使用中的连接归还时再关闭）"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._stats['closed'] += len(idle)
+        for entry in idle:
+            self._close_raw(entry.raw)
+
+    def stats(self):
+        """连接池运行统计"""
+        self._check_fork()
+        with self._cond:
+            s = dict(self._stats)
+            s.update({
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle)
+            })
+        s['wait_time'] = round(s['wait_time'], 4)
+        s['avg_wait_time'] = round(s['wait_time'] / s['waits'], 4) if s['waits'] else 0.0
+        return s
+
+class DbSession:
+    """数据库会话：首次使用时借出连接，结束时归还；可承载一个（可嵌套的）事务"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+        self.depth = 0
+        self.rollback_only = False
+        self.written_tables = set()
+        self.after_commit = []
+
+    @property
+    def in_transaction(self):
+        return self.depth > 0
+
+    def connection(self):
+        if self._conn is not None and not self.depth and not self._conn.open:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            self._conn = self._pool.acquire()
+        return self._conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            # 归还时连接池会回滚未提交的事务
+            conn.close()
+
 class Database:
-    def __init__(self, dsn: dict):
+    def __init__(self, dsn: dict, pool_config: dict = None):
         self._dsn = dict(dsn or {})
+        self._pool = ConnectionPool(self._dsn, **(pool_config or {}))
+        self._local = threading.local()
+        self.count_cache = TableTaggedCache(COUNT_CACHE_MAX_ENTRIES, COUNT_CACHE_TTL)
+        self.query_cache = TableTaggedCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL)
+        self._tagged_caches = [self.count_cache, self.query_cache]
+        self._table_versions = None
+        self._table_versions_polled = 0.0
+        self._poll_lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def init_app(self, app):
+        """注册请求级会话：同一请求内的查询复用一个连接，请求结束时归还"""
+        app.extensions['database'] = self
+        app.teardown_appcontext(self._teardown_session)
+
+    def _teardown_session(self, exc=None):
+        session = g.pop('_db_session', None)
+        if session is not None:
+            session.close()
+
+    def _current_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            return session
+        if has_app_context() and current_app.extensions.get('database') is self:
+            session = g.get('_db_session')
+            if session is None:
+                session = g._db_session = DbSession(self._pool)
+            return session
+        return None
+
     def get_connection(self):
-        return pymysql.connect(**self._dsn)
-    def execute_update(self, sql, params=None):
-        conn = None
+        """从连接池借出连接，调用方 close() 即归还"""
+        return self._pool.acquire()
+
+    def pool_stats(self):
+        return self._pool.stats()
+
+    def close_pool(self):
+        self._pool.close()
+
+    @contextmanager
+    def connection(self):
+        """获取当前可用连接：请求/事务内复用会话连接，否则临时借出"""
+        session = self._current_session()
+        if session is not None:
+            yield session.connection()
+            return
+        conn = self._pool.acquire()
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                affected_rows = cursor.execute(sql, params) if params is not None else cursor.execute(sql)
-            conn.commit()
-            return { 'success': True, 'affected_rows': affected_rows, 'last_insert_id': cursor.lastrowid }
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def session(self):
+        """会话：块内所有 execute_* 调用共用一个连接但不开启事务（逐条自动提交），
+        用于依赖连接级状态（如 GET_LOCK）的后台任务。已处于会话中时直接复用。"""
+        session = self._current_session()
+        if session is not None:
+            yield session.connection()
+            return
+        session = self._local.session = DbSession(self._pool)
+        try:
+            yield session.connection()
+        finally:
+            self._local.session = None
+            session.close()
+
+    @contextmanager
+    def transaction(self):
+        """显式事务：块内所有 execute_* 调用共用一个连接，正常退出提交，异常或语句失败回滚。
+        可嵌套，内层并入外层事务。"""
+        session = self._current_session()
+        owned = session is None
+        if owned:
+            session = self._local.session = DbSession(self._pool)
+        outer = session.depth == 0
+        try:
+            conn = session.connection()
+            if outer:
+                conn.begin()
+                session.rollback_only = False
+                session.written_tables = set()
+                session.after_commit = []
+            session.depth += 1
+        except Exception:
+            if owned:
+                self._local.session = None
+                session.close()
+            raise
+        try:
+            yield conn
+        except BaseException:
+            session.rollback_only = True
+            raise
+        finally:
+            session.depth -= 1
+            if outer:
+                try:
+                    if session.rollback_only:
+                        logger.warning("事务中存在失败的语句，已回滚")
+                        conn.rollback()
+                    else:
+                        conn.commit()
+                        # 提交后再次失效，防止事务期间被其他请求以旧数据回填缓存；
+                        # 版本戳也在提交后单独发布，不占用事务连接、不在事务内持有版本行的锁
+                        self.invalidate_tables(session.written_tables, publish=False)
+                        shared = session.written_tables & QUERY_CACHE_TABLES
+                        if shared:
+                            self._publish_table_versions(shared)
+                        self._run_after_commit(session.after_commit)
+                finally:
+                    session.after_commit = []
+                    if owned:
+                        self._local.session = None
+                        session.close()
+
+    def on_commit(self, callback):
+        """事务提交后执行 callback（回滚则丢弃）；不在事务中时立即执行。用于丢弃进程内缓存等提交后才能做的动作"""
+        session = self._current_session()
+        if session is not None and session.in_transaction:
+            session.after_commit.append(callback)
+        else:
+            self._run_after_commit([callback])
+
+    def _run_after_commit(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"提交后回调执行失败: {str(e)}")
+
+    def invalidate_tables(self, tables, publish=True):
+        """标记表已被写入，使依赖这些表的缓存失效（绕过 execute_* 直接写库时需手动调用）。
+        publish 为真时同时递增跨进程版本戳（处于事务中时推迟到事务提交后）。"""
+        tables = {t.lower() for t in tables if t}
+        if not tables:
+            return
+        for cache in self._tagged_caches:
+            cache.invalidate(tables)
+        session = self._current_session()
+        if session is not None and session.in_transaction:
+            session.written_tables.update(tables)
+            return
+        shared = tables & QUERY_CACHE_TABLES
+        if publish and shared:
+            self._publish_table_versions(shared)
+
+    def _publish_table_versions(self, tables):
+        # 只在事务外调用（单独提交）；失败只记录日志：版本戳是尽力而为的通知，不应影响业务写入
+        scopes = [TABLE_VERSION_PREFIX + t for t in sorted(tables)]
+        sql = (
+            "INSERT INTO cache_versions (scope, version) VALUES {} "
+            "ON DUPLICATE KEY UPDATE version = version + 1"
+        ).format(','.join(['(%s, 1)'] * len(scopes)))
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, scopes)
+                conn.commit()
         except Exception as e:
-            if conn:
+            logger.warning(f"更新表版本戳失败: {str(e)}")
+
+    def _sync_table_versions(self):
+        """按间隔轮询 cache_versions，其他进程写过的表在本进程内同样失效"""
+        if time.monotonic() - self._table_versions_polled < QUERY_CACHE_POLL:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._table_versions_polled = time.monotonic()
+            versions = self.get_versions(TABLE_VERSION_PREFIX + t for t in sorted(QUERY_CACHE_TABLES))
+            if versions is None:
+                return
+            if self._table_versions is not None:
+                changed = {
+                    scope[len(TABLE_VERSION_PREFIX):] for scope, version in versions.items()
+                    if self._table_versions.get(scope) != version
+                }
+                if changed:
+                    for cache in self._tagged_caches:
+                        cache.invalidate(changed)
+            self._table_versions = versions
+        finally:
+            self._poll_lock.release()
+
+    def cache_stats(self):
+        return {'count': self.count_cache.stats(), 'query': self.query_cache.stats()}
+
+    def register_cache(self, cache):
+        """登记一个 TableTaggedCache，使其随 invalidate_tables 一同失效"""
+        if cache not in self._tagged_caches:
+            self._tagged_caches.append(cache)
+        return cache
+
+    def bump_version(self, scope):
+        """递增跨进程版本戳（处于事务中时随事务一起提交）"""
+        return self.execute_update(
+            "INSERT INTO cache_versions (scope, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1",
+            (scope,)
+        )
+
+    def get_versions(self, scopes):
+        """批量读取版本戳，返回 {scope: version}（未记录的 scope 视为 0），查询失败返回 None"""
+        scopes = list(scopes)
+        if not scopes:
+            return {}
+        result = self.execute_query(
+            "SELECT scope, version FROM cache_versions WHERE scope IN ({})".format(','.join(['%s'] * len(scopes))),
+            tuple(scopes)
+        )
+        if not result['success']:
+            return None
+        versions = dict.fromkeys(scopes, 0)
+        versions.update({row['scope']: row['version'] for row in result['data']})
+        return versions
+
+    def _mark_failed(self):
+        session = self._current_session()
+        if session is not None and session.in_transaction:
+            session.rollback_only = True
+
+    def _in_transaction(self):
+        session = self._current_session()
+        return session is not None and session.in_transaction
+
+    def execute_update(self, sql, params=None):
+        in_tx = self._in_transaction()
+        try:
+            with self.connection() as conn:
                 try:
-                    conn.rollback()
+                    with conn.cursor() as cursor:
+                        affected_rows = cursor.execute(sql, params) if params is not None else cursor.execute(sql)
+                    if not in_tx:
+                        conn.commit()
+                    self.invalidate_tables(tables_written_by(sql))
                 except Exception:
-                    pass
+                    if not in_tx:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                    raise
+            return { 'success': True, 'affected_rows': affected_rows, 'last_insert_id': cursor.lastrowid }
+        except Exception as e:
+            self._mark_failed()
             logger.error(f"数据库操作失败: {str(e)}")
             return { 'success': False, 'error': str(e), 'affected_rows': 0 }
-        finally:
-            if conn:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-    def execute_query(self, sql, params=None):
-        conn = None
+
+    def execute_query(self, sql, params=None, tables=None, ttl=None):
+        """执行查询。传入 tables（依赖的表）即启用结果缓存：LRU + TTL，任一依赖表被写入后失效；
+        事务内不读写缓存，保证读到本事务的写入。"""
+        if tables and not self._in_transaction():
+            return self._cached(
+                'query', sql, params, tables, ttl,
+                lambda: self.execute_query(sql, params),
+                lambda result: _copy_rows(result['data']),
+                lambda rows: { 'success': True, 'data': _copy_rows(rows) }
+            )
         try:
-            conn = self.get_connection()
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                cursor.execute(sql, params) if params is not None else cursor.execute(sql)
-                rows = cursor.fetchall()
+            with self.connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    cursor.execute(sql, params) if params is not None else cursor.execute(sql)
+                    rows = cursor.fetchall()
             return { 'success': True, 'data': rows }
         except Exception as e:
+            self._mark_failed()
             logger.error(f"数据库查询失败: {str(e)}")
             return { 'success': False, 'error': str(e), 'data': [] }
-        finally:
-            if conn:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
+
+    def _parallel_executor(self):
+        with self._executor_lock:
+            # fork 出的子进程不继承父进程的线程，需重建线程池
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=PARALLEL_QUERY_WORKERS, thread_name_prefix='db-parallel')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def execute_parallel(self, queries, timeout=None):
+        """并发执行一组相互独立的只读查询，返回与输入对应的结果（dict 输入返回 dict，序列输入返回 list）。
+        queries 的元素为 sql 或 (sql, params)；每个查询在线程池中使用独立的池连接执行，
+        总耗时约为最慢的一个查询。超过 timeout 秒未完成的查询返回 code 为 TIMEOUT 的失败结果。
+        处于事务中时为保证读到本事务的写入，退化为在当前连接上顺序执行。"""
+        keyed = isinstance(queries, dict)
+        items = list(queries.items()) if keyed else list(enumerate(queries))
+        items = [(key, (q, None) if isinstance(q, str) else (q[0], q[1] if len(q) > 1 else None)) for key, q in items]
+        timeout = PARALLEL_QUERY_TIMEOUT if timeout is None else timeout
+        if len(items) <= 1 or self._in_transaction():
+            results = {key: self.execute_query(sql, params) for key, (sql, params) in items}
+        else:
+            executor = self._parallel_executor()
+            futures = {
+                key: executor.submit(self.execute_query, _with_execution_limit(sql, timeout), params)
+                for key, (sql, params) in items
+            }
+            done, _ = wait(futures.values(), timeout=timeout or None)
+            results = {}
+            for key, future in futures.items():
+                if future in done:
+                    results[key] = future.result()
+                else:
+                    future.cancel()
+                    logger.error(f"并行查询超时（{timeout}s）: {dict(items)[key][0].strip()[:80]}")
+                    results[key] = {'success': False, 'error': '查询超时', 'code': 'TIMEOUT', 'data': []}
+        return results if keyed else [results[i] for i in range(len(items))]
+
     def execute_transaction(self, queries):
-        conn = None
+        in_tx = self._in_transaction()
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                results = []
-                for sql, params in queries:
-                    affected_rows = cursor.execute(sql, params) if params else cursor.execute(sql)
-                    results.append({ 'sql': sql, 'affected_rows': affected_rows, 'last_insert_id': cursor.lastrowid })
-            conn.commit()
+            with self.connection() as conn:
+                try:
+                    # 连接默认 autocommit，需显式 BEGIN 才能保证多条语句的原子性
+                    if not in_tx:
+                        conn.begin()
+                    with conn.cursor() as cursor:
+                        results = []
+                        for sql, params in queries:
+                            affected_rows = cursor.execute(sql, params) if params else cursor.execute(sql)
+                            results.append({ 'sql': sql, 'affected_rows': affected_rows, 'last_insert_id': cursor.lastrowid })
+                    if not in_tx:
+                        conn.commit()
+                    self.invalidate_tables(set().union(*(tables_written_by(q[0]) for q in queries)))
+                except Exception:
+                    if not in_tx:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                    raise
             return { 'success': True, 'results': results }
         except Exception as e:
-            if conn:
-                conn.rollback()
+            self._mark_failed()
             logger.error(f"事务执行失败: {str(e)}")
             return { 'success': False, 'error': str(e), 'results': [] }
+
+    def iter_query(self, sql, params=None, batch_size=1000, chunks=False):
+        """流式查询：基于 SSDictCursor 逐批从服务端读取，逐行（chunks=True 时逐批）产出。
+        迭代期间独占一个连接池连接（不复用请求会话连接，看不到当前事务未提交的数据）；
+        消费方提前停止时直接断开该连接，避免读完剩余结果集"""
+        batch_size = max(1, int(batch_size))
+        conn = self._pool.acquire()
+        cursor = None
+        finished = False
+        try:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(sql, params) if params is not None else cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if chunks:
+                    yield rows
+                else:
+                    yield from rows
+            finished = True
+        except Exception as e:
+            logger.error(f"流式查询执行失败: {sql}, 参数: {params}, 错误: {str(e)}")
+            raise
         finally:
-            if conn:
+            if finished:
+                try:
+                    cursor.close()
+                except Exception:
+                    finished = False
+            if finished:
                 conn.close()
-    def execute_paginated_query(self, sql, params=None, page=1, page_size=10):
-        conn = None
+            else:
+                conn.discard()
+
+    def execute_batch(self, sql, rows, chunk_size=500):
+        """批量执行同一条参数化语句。INSERT ... VALUES 会被 executemany 改写为多行 VALUES，
+        每个分块一次往返；所有分块在同一事务中提交（已处于事务中时并入外层事务）"""
+        rows = [tuple(r) for r in rows]
+        if not rows:
+            return { 'success': True, 'affected_rows': 0, 'chunks': [] }
+        chunk_size = max(1, int(chunk_size or len(rows)))
+        in_tx = self._in_transaction()
         try:
-            conn = self.get_connection()
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as count_table"
-                cursor.execute(count_sql, params) if params else cursor.execute(count_sql)
-                total_result = cursor.fetchone()
-                total = total_result['total'] if total_result else 0
-                offset = (page - 1) * page_size
-                paginated_sql = f"{sql} LIMIT %s OFFSET %s"
-                paginated_params = list(params or ()) + [page_size, offset]
-                cursor.execute(paginated_sql, paginated_params)
-                data = cursor.fetchall()
-                return { 'success': True, 'data': data, 'pagination': { 'page': page, 'page_size': page_size, 'total': total, 'total_pages': (total + page_size - 1) // page_size } }
+            with self.connection() as conn:
+                try:
+                    if not in_tx:
+                        conn.begin()
+                    chunks = []
+                    with conn.cursor() as cursor:
+                        for start in range(0, len(rows), chunk_size):
+                            chunks.append(cursor.executemany(sql, rows[start:start + chunk_size]) or 0)
+                    if not in_tx:
+                        conn.commit()
+                    self.invalidate_tables(tables_written_by(sql))
+                except Exception:
+                    if not in_tx:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                    raise
+            return { 'success': True, 'affected_rows': sum(chunks), 'chunks': chunks }
         except Exception as e:
+            self._mark_failed()
+            logger.error(f"批量执行失败: {sql}, 行数: {len(rows)}, 错误: {str(e)}")
+            return { 'success': False, 'error': str(e), 'affected_rows': 0, 'chunks': [] }
+
+    def _estimate_rows(self, cursor, sql, params):
+        """基于 EXPLAIN 估算结果行数：主查询各表 rows * filtered% 的乘积"""
+        cursor.execute(f"EXPLAIN {sql}", params) if params else cursor.execute(f"EXPLAIN {sql}")
+        estimate = None
+        for row in cursor.fetchall():
+            if str(row.get('id')) != '1' or row.get('rows') is None:
+                continue
+            factor = float(row['rows']) * float(row.get('filtered') or 100) / 100
+            estimate = factor if estimate is None else estimate * factor
+        return int(round(estimate)) if estimate is not None else None
+
+    def _count_total(self, cursor, sql, params, count):
+        """返回 (total, exact)；精确计数结果按 SQL+参数缓存，依赖表写入后失效"""
+        exact_key = _cache_key(sql, params)
+        cached = self.count_cache.get(exact_key)
+        if cached is not _MISS:
+            return cached, True
+        snapshot = self.count_cache.snapshot(tables_read_by(sql))
+        if count == 'estimate':
+            estimate_key = 'estimate\x00' + exact_key
+            cached = self.count_cache.get(estimate_key)
+            if cached is not _MISS:
+                return cached, False
+            estimate = self._estimate_rows(cursor, sql, params)
+            if estimate is not None and estimate >= COUNT_ESTIMATE_THRESHOLD:
+                self.count_cache.set(estimate_key, estimate, snapshot)
+                return estimate, False
+        count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as count_table"
+        cursor.execute(count_sql, params) if params else cursor.execute(count_sql)
+        total_result = cursor.fetchone()
+        total = total_result['total'] if total_result else 0
+        self.count_cache.set(exact_key, total, snapshot)
+        return total, True
+
+    def _cached(self, kind, sql, params, tables, ttl, compute, pack, unpack):
+        """查询结果缓存的公共流程：同步跨进程版本 → 命中直接返回 → 否则先取快照再计算并回填"""
+        self._sync_table_versions()
+        key = f"{kind}\x00{_cache_key(sql, params)}"
+        cached = self.query_cache.get(key)
+        if cached is not _MISS:
+            return unpack(cached)
+        # 标签与 SQL 中引用的表取并集，漏标的表同样参与失效
+        snapshot = self.query_cache.snapshot({t.lower() for t in tables} | tables_read_by(sql))
+        result = compute()
+        if result['success']:
+            self.query_cache.set(key, pack(result), snapshot, ttl)
+        return result
+
+    def execute_paginated_query(self, sql, params=None, page=1, page_size=10, keyset=None, cursor=None, count='exact', tables=None, ttl=None):
+        """偏移分页。count: exact 精确总数（带缓存）/ estimate 大表用 EXPLAIN 估算 / none 不计总数；
+        传入 tables 时整页结果按 execute_query 的规则缓存"""
+        if keyset:
+            return self.execute_keyset_query(sql, params, keyset, cursor, page_size)
+        count = count or 'exact'
+        if tables and not self._in_transaction():
+            return self._cached(
+                f'page\x00{page}\x00{page_size}\x00{count}', sql, params, tables, ttl,
+                lambda: self.execute_paginated_query(sql, params, page, page_size, count=count),
+                lambda result: (_copy_rows(result['data']), dict(result['pagination'])),
+                lambda item: { 'success': True, 'data': _copy_rows(item[0]), 'pagination': dict(item[1]) }
+            )
+        try:
+            with self.connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    offset = (page - 1) * page_size
+                    paginated_sql = f"{sql} LIMIT %s OFFSET %s"
+                    if count == 'none':
+                        cursor.execute(paginated_sql, list(params or ()) + [page_size + 1, offset])
+                        data = list(cursor.fetchall())
+                        has_more = len(data) > page_size
+                        return { 'success': True, 'data': data[:page_size], 'pagination': { 'page': page, 'page_size': page_size, 'total': None, 'total_pages': None, 'total_exact': False, 'count_mode': count, 'has_more': has_more } }
+                    total, exact = self._count_total(cursor, sql, params, count)
+                    cursor.execute(paginated_sql, list(params or ()) + [page_size, offset])
+                    data = cursor.fetchall()
+                    return { 'success': True, 'data': data, 'pagination': { 'page': page, 'page_size': page_size, 'total': total, 'total_pages': (total + page_size - 1) // page_size, 'total_exact': exact, 'count_mode': count } }
+        except Exception as e:
+            self._mark_failed()
             logger.error(f"分页查询执行失败: {sql}, 参数: {params}, 错误: {str(e)}")
             return { 'success': False, 'error': str(e), 'data': [], 'pagination': { 'page': page, 'page_size': page_size, 'total': 0, 'total_pages': 0 } }
-        finally:
-            if conn:
-                conn.close()
 
-_db = Database(DB_DSN)
+    def execute_keyset_query(self, sql, params=None, keyset=None, cursor=None, page_size=10):
+        """游标分页：keyset 为 [(结果列名, 'ASC'|'DESC'), ...]，末列须唯一（如 id）。
+        不执行 COUNT，按上一页最后一行的排序键 seek，任意深度的页代价与首页相同。"""
+        pagination = { 'mode': 'cursor', 'page_size': page_size, 'cursor': cursor, 'next_cursor': None, 'has_more': False }
+        try:
+            for column, direction in keyset:
+                if not _KEYSET_COLUMN_RE.match(column) or direction.upper() not in ('ASC', 'DESC'):
+                    raise ValueError(f"非法的排序键: {column} {direction}")
+            try:
+                values = decode_cursor(cursor, len(keyset)) if cursor else None
+            except ValueError as e:
+                return { 'success': False, 'error': str(e), 'code': 'INVALID_CURSOR', 'data': [], 'pagination': pagination }
+            page_sql = f"SELECT * FROM ({sql}) AS keyset_page"
+            page_params = list(params or ())
+            if values is not None:
+                condition, condition_params = _keyset_condition(keyset, values)
+                page_sql += f" WHERE {condition}"
+                page_params.extend(condition_params)
+            order = ', '.join(f"`keyset_page`.`{c}` {d.upper()}" for c, d in keyset)
+            page_sql += f" ORDER BY {order} LIMIT %s"
+            page_params.append(page_size + 1)
+            with self.connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cur:
+                    cur.execute(page_sql, page_params)
+                    rows = cur.fetchall()
+            rows = list(rows)
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                pagination['has_more'] = True
+                pagination['next_cursor'] = encode_cursor([rows[-1][c] for c, _ in keyset])
+            return { 'success': True, 'data': rows, 'pagination': pagination }
+        except Exception as e:
+            self._mark_failed()
+            logger.error(f"游标分页查询执行失败: {sql}, 参数: {params}, 错误: {str(e)}")
+            return { 'success': False, 'error': str(e), 'data': [], 'pagination': pagination }
+
+
+_db = Database(DB_DSN, DB_POOL_CONFIG)
 
 def get_connection():
     return _db.get_connection()
 
+def get_pool_stats():
+    return _db.pool_stats()
+
+def get_cache_stats():
+    return _db.cache_stats()
+
+def init_app(app):
+    _db.init_app(app)
+
+def session():
+    return _db.session()
+
+def transaction():
+    return _db.transaction()
+
+def invalidate_tables(*tables):
+    _db.invalidate_tables(tables)
+
+def on_commit(callback):
+    return _db.on_commit(callback)
+
+def register_cache(cache):
+    return _db.register_cache(cache)
+
+def bump_cache_version(scope):
+    return _db.bump_version(scope)
+
+def get_cache_versions(scopes):
+    return _db.get_versions(scopes)
+
 def execute_update(sql, params=None):
     return _db.execute_update(sql, params)
 
-def execute_query(sql, params=None):
-    return _db.execute_query(sql, params)
+def execute_query(sql, params=None, tables=None, ttl=None):
+    return _db.execute_query(sql, params, tables, ttl)
 
 
 def execute_transaction(queries):
     return _db.execute_transaction(queries)
 
-def execute_paginated_query(sql, params=None, page=1, page_size=10):
-    return _db.execute_paginated_query(sql, params, page, page_size)
+def execute_parallel(queries, timeout=None):
+    return _db.execute_parallel(queries, timeout)
+
+def iter_query(sql, params=None, batch_size=1000, chunks=False):
+    return _db.iter_query(sql, params, batch_size, chunks)
+
+def execute_batch(sql, rows, chunk_size=500):
+    return _db.execute_batch(sql, rows, chunk_size)
+
+def execute_paginated_query(sql, params=None, page=1, page_size=10, keyset=None, cursor=None, count='exact', tables=None, ttl=None):
+    return _db.execute_paginated_query(sql, params, page, page_size, keyset, cursor, count, tables, ttl)
+
+def execute_keyset_query(sql, params=None, keyset=None, cursor=None, page_size=10):
+    return _db.execute_keyset_query(sql, params, keyset, cursor, page_size)
 
 def test_connection():
     """测试数据库连接"""
@@ -152,6 +1056,59 @@ def test_connection():
         logger.error(f"数据库连接失败: {str(e)}")
         return False
 
+# 预约日汇总表（日期 × 实验室 × 用户 × 状态），由 reservations 上的触发器增量维护，
+# 后台任务每晚全量校准（见 app/jobs.py）；随用户/实验室级联删除，与预约的外键级联保持一致
+RESERVATION_DAILY_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS reservation_daily_stats (
+    stat_date DATE NOT NULL,
+    laboratory_id INT NOT NULL,
+    user_id INT NOT NULL,
+    status ENUM('pending', 'confirmed', 'cancelled', 'completed') NOT NULL,
+    reservation_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (stat_date, laboratory_id, user_id, status),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (laboratory_id) REFERENCES laboratories(id) ON DELETE CASCADE,
+    INDEX idx_lab_date (laboratory_id, stat_date),
+    INDEX idx_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+_STATS_INCREMENT = """
+    INSERT INTO reservation_daily_stats (stat_date, laboratory_id, user_id, status, reservation_count)
+    VALUES (NEW.reservation_date, NEW.laboratory_id, NEW.user_id, NEW.status, 1)
+    ON DUPLICATE KEY UPDATE reservation_count = reservation_count + 1;"""
+_STATS_DECREMENT = """
+    UPDATE reservation_daily_stats SET reservation_count = reservation_count - 1
+    WHERE stat_date = OLD.reservation_date AND laboratory_id = OLD.laboratory_id
+      AND user_id = OLD.user_id AND status = OLD.status AND reservation_count > 0;"""
+
+RESERVATION_STATS_TRIGGERS = [
+    ('reservation_stats_after_insert', f"""
+    CREATE TRIGGER reservation_stats_after_insert
+    AFTER INSERT ON reservations
+    FOR EACH ROW
+    BEGIN{_STATS_INCREMENT}
+    END
+    """),
+    ('reservation_stats_after_update', f"""
+    CREATE TRIGGER reservation_stats_after_update
+    AFTER UPDATE ON reservations
+    FOR EACH ROW
+    BEGIN
+        IF NOT (OLD.reservation_date <=> NEW.reservation_date AND OLD.laboratory_id <=> NEW.laboratory_id
+                AND OLD.user_id <=> NEW.user_id AND OLD.status <=> NEW.status) THEN{_STATS_DECREMENT}{_STATS_INCREMENT}
+        END IF;
+    END
+    """),
+    ('reservation_stats_after_delete', f"""
+    CREATE TRIGGER reservation_stats_after_delete
+    AFTER DELETE ON reservations
+    FOR EACH ROW
+    BEGIN{_STATS_DECREMENT}
+    END
+    """)
+]
+
 def create_tables():
     """创建数据库表"""
     
@@ -235,7 +1192,8 @@ def create_tables():
         INDEX idx_laboratory_id (laboratory_id),
         INDEX idx_reservation_date (reservation_date),
         INDEX idx_status (status),
-        INDEX idx_datetime (reservation_date, start_time, end_time)
+        INDEX idx_datetime (reservation_date, start_time, end_time),
+        INDEX idx_lab_date (laboratory_id, reservation_date, start_time)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
     """
     
@@ -290,6 +1248,15 @@ def create_tables():
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
     """
     
+    # 缓存版本戳表：多进程部署时用于通知其他进程本地缓存已失效
+    cache_versions_table = """
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        scope VARCHAR(100) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """
+    
     tables = [
         ("users", users_table),
         ("laboratories", laboratories_table),
@@ -297,7 +1264,9 @@ def create_tables():
         ("reservations", reservations_table),
         ("reservation_equipment", reservation_equipment_table),
         ("courses", courses_table),
-        ("course_students", course_students_table)
+        ("course_students", course_students_table),
+        ("cache_versions", cache_versions_table),
+        ("reservation_daily_stats", RESERVATION_DAILY_STATS_DDL)
     ]
     
     for table_name, table_sql in tables:
@@ -483,7 +1452,8 @@ def create_triggers():
                 'before_equipment_delete',
                 'before_user_delete',
                 'before_laboratory_delete',
-                'after_consumable_usage_insert'
+                'after_consumable_usage_insert',
+                *[name for name, _ in RESERVATION_STATS_TRIGGERS]
             ]:
                 try:
                     cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
@@ -580,6 +1550,9 @@ def create_triggers():
                 """
             ]
 
+            # 预约日汇总表的增量维护触发器
+            trigger_sql_list.extend(stmt for _, stmt in RESERVATION_STATS_TRIGGERS)
+
             for stmt in trigger_sql_list:
                 cursor.execute(stmt)
 
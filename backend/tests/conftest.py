@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：与 run.py 一样把项目根目录与 backend 目录加入模块搜索路径"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.dirname(BACKEND_DIR), BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
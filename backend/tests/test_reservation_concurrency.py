@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+并发预约测试：同一实验室同一时段被数百个请求同时预约时，只能成功一条、只写入一条
+
+需要真实的 MySQL 测试库（DB_* / TAURUS_* 环境变量指定），仅在 RUN_DB_TESTS=1 时执行：
+    RUN_DB_TESTS=1 python -m pytest backend/tests/test_reservation_concurrency.py
+测试自行创建实验室与学生账号，结束后删除。
+"""
+
+import os
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.skipif(os.getenv('RUN_DB_TESTS') != '1', reason='需要测试数据库，设置 RUN_DB_TESTS=1 启用')
+
+CONCURRENT_REQUESTS = int(os.getenv('RESERVATION_STRESS_REQUESTS', '200'))
+
+# 所有请求同时到达，连接池耗尽时需要排队等待，而不是因借连接超时失败
+os.environ.setdefault('DB_POOL_ACQUIRE_TIMEOUT', '120')
+
+
+@pytest.fixture
+def seeded():
+    """创建一间可预约的实验室和一名学生，测试结束后连同其预约一起删除"""
+    from backend.database import execute_query, execute_update
+
+    tag = uuid.uuid4().hex[:12]
+    lab = execute_update(
+        "INSERT INTO laboratories (name, location, capacity, status) VALUES (%s, %s, %s, 'active')",
+        (f'并发测试实验室-{tag}', 'test', 50)
+    )
+    user = execute_update(
+        "INSERT INTO users (username, password, name, email, role, student_id, status) "
+        "VALUES (%s, %s, %s, %s, 'student', %s, 'active')",
+        (f'stress_{tag}', 'x', '并发测试', f'stress_{tag}@example.com', f'S{tag}')
+    )
+    assert lab['success'] and user['success']
+    lab_id, user_id = lab['last_insert_id'], user['last_insert_id']
+    yield lab_id, user_id
+    execute_update("DELETE FROM reservations WHERE laboratory_id = %s", (lab_id,))
+    execute_update("DELETE FROM reservation_daily_stats WHERE laboratory_id = %s", (lab_id,))
+    execute_update("DELETE FROM laboratories WHERE id = %s", (lab_id,))
+    execute_update("DELETE FROM users WHERE id = %s", (user_id,))
+    assert execute_query("SELECT 1 FROM laboratories WHERE id = %s", (lab_id,))['data'] == []
+
+
+def test_concurrent_bookings_for_one_slot_succeed_once(seeded):
+    from backend.app.reservation_stress import run_stress
+
+    lab_id, user_id = seeded
+    report = run_stress(
+        lab_id, user_id, (date.today() + timedelta(days=7)).isoformat(), '10:00', '11:00',
+        requests=CONCURRENT_REQUESTS
+    )
+
+    assert report['success'], report
+    assert report['succeeded'] == 1, report
+    assert report['status_codes'].get(201) == 1, report
+    assert report['inserted'] == 1, report
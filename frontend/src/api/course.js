@@ -27,4 +27,29 @@ export const getCourseReservationsApi = (id, params) => {
 
 export const addStudentsToCourseApi = (id, data) => {
   return http.post(`/courses/${id}/students`, data)
-}
\ No newline at end of file
+}
+
+// 名单导入：file 为 CSV/XLSX 文件，返回逐行导入报告
+export const importCourseStudentsApi = (id, file) => {
+  const formData = new FormData()
+  formData.append('file', file)
+  return http.post(`/courses/${id}/students/import`, formData)
+}
+
+// semester 可选：课程代码在多个学期重复且文件中没有学期列时用于确定课程
+export const importStudentsApi = (file, semester) => {
+  const formData = new FormData()
+  formData.append('file', file)
+  if (semester) formData.append('semester', semester)
+  return http.post('/courses/students/import', formData)
+}
+
+// 按课程课表生成/同步实验室预约（管理员）：data 可省略（同步全部课程），可含 semester、course_ids、from_date、dry_run
+export const generateCourseSessionsApi = (data) => {
+  return http.post('/courses/sessions/generate', data)
+}
+
+// 课程实验室分配求解（管理员）：data 可省略（求解全部课程），可含 semester、course_ids、time_limit、apply
+export const assignCourseLabsApi = (data) => {
+  return http.post('/courses/lab-assignment', data)
+}
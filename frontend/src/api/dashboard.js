@@ -0,0 +1,10 @@
+import { http } from './request'
+
+// 首页看板API：sections 为模块名数组，不传则返回当前角色可见的全部模块
+export const getDashboardApi = (sections, params = {}) => {
+  const query = { ...params }
+  if (sections && sections.length) {
+    query.sections = sections.join(',')
+  }
+  return http.get('/dashboard', query)
+}
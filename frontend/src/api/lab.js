@@ -25,10 +25,20 @@ export const getLabAvailabilityApi = (id, params) => {
   return http.get(`/laboratories/${id}/availability`, params)
 }
 
+// 批量获取多个实验室在日期范围内的占用位图
+export const getLabsAvailabilityApi = (params) => {
+  return http.get('/laboratories/availability', params)
+}
+
 export const getLabEquipmentApi = (id) => {
   return http.get(`/laboratories/${id}/equipment`)
 }
 
 export const getLabReservationsApi = (id, params) => {
   return http.get(`/laboratories/${id}/reservations`, params)
-}
\ No newline at end of file
+}
+
+// 跨实验室查找最早的空闲时段
+export const searchFreeSlotsApi = (params) => {
+  return http.get('/laboratories/free-slots', params)
+}
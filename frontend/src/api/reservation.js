@@ -13,6 +13,11 @@ export const createReservationApi = (data) => {
   return http.post('/reservations', data)
 }
 
+// 系列预约（按周规则或日期列表）
+export const createReservationSeriesApi = (data) => {
+  return http.post('/reservations/series', data)
+}
+
 export const updateReservationApi = (id, data) => {
   return http.put(`/reservations/${id}`, data)
 }
@@ -29,6 +34,11 @@ export const rejectReservationApi = (id, data) => {
   return http.post(`/reservations/${id}/reject`, data)
 }
 
+// 批量审核/拒绝/完成：action 为 approve | reject | complete
+export const bulkReservationActionApi = (action, data) => {
+  return http.post(`/reservations/bulk/${action}`, data)
+}
+
 export const cancelReservationApi = (id, data) => {
   return http.post(`/reservations/${id}/cancel`, data)
 }